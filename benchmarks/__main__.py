@@ -0,0 +1,143 @@
+"""
+Runs the benchmarks and reports JSON, see benchmarks/README.md
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --compare results.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+from benchmarks.bench_core import BENCHMARKS, tear_down
+from pycaw.backend import get_backend
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+# stop repeating a measure after that many seconds
+TIME_BUDGET = 0.5
+
+
+def pycaw_version():
+    try:
+        return metadata.version("pycaw")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def measure(func, system, max_repeat):
+    # COM calls and allocations of a single call
+    system.reset_calls()
+    tracemalloc.start()
+    func()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    com_calls = dict(system.calls)
+
+    timings = []
+    deadline = time.perf_counter() + TIME_BUDGET
+    while len(timings) < max_repeat:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if start > deadline:
+            break
+
+    return {
+        "com_calls": sum(com_calls.values()),
+        "com_calls_by_method": com_calls,
+        "alloc_peak_bytes": alloc_peak,
+        "repeat": len(timings),
+        "wall_time_min": min(timings),
+        "wall_time_mean": sum(timings) / len(timings),
+    }
+
+
+def run(names, sizes, max_repeat):
+    results = []
+    for name in names:
+        for size in sizes:
+            try:
+                func = BENCHMARKS[name](size)
+                result = measure(func, get_backend().system, max_repeat)
+            finally:
+                tear_down()
+            result.update(benchmark=name, size=size)
+            results.append(result)
+            print(
+                f"{name:<28} {size:>6} "
+                f"{result['com_calls']:>8} calls "
+                f"{result['wall_time_min'] * 1e3:>10.3f} ms "
+                f"{result['alloc_peak_bytes'] / 1024:>10.1f} KiB",
+                file=sys.stderr,
+            )
+    return {
+        "pycaw": pycaw_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Returns the regressions of report against baseline."""
+    old = {(r["benchmark"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        previous = old.get((result["benchmark"], result["size"]))
+        if previous is None:
+            continue
+        for key, limit in (
+            ("com_calls", 1),
+            ("wall_time_min", threshold),
+            ("alloc_peak_bytes", threshold),
+        ):
+            if result[key] > previous[key] * limit:
+                regressions.append(
+                    f"{result['benchmark']} size={result['size']} {key}: "
+                    f"{previous[key]} -> {result[key]}"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=sorted(BENCHMARKS),
+        help="benchmark to run, can be repeated (default: all)",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=20, help="max timed repeats")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to compare with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="allowed wall time and allocation ratio against the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    report = run(args.benchmark or list(BENCHMARKS), args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Benchmarks of the enumeration and control hot paths.
+
+Every benchmark is a function taking the number of sessions or devices
+and returning a callable to time, see BENCHMARKS.
+They all run against pycaw.simulation, no audio service needed.
+"""
+
+import warnings
+from unittest import mock
+
+from pycaw.magic import MagicApp, MagicManager  # isort: skip
+from pycaw.backend import get_backend, set_backend
+from pycaw.meter import PeakMeterSampler
+from pycaw.simulation import SimulatedAudioSystem, SimulatedBackend
+from pycaw.utils import AudioUtilities
+
+# filler properties per simulated device,
+# real endpoints usually expose 30 to 50 properties
+DEVICE_PROPERTIES = 30
+# sessions are spread over this many executables
+APP_EXECS = ["app%d.exe" % i for i in range(10)]
+
+
+def _install(system):
+    set_backend(SimulatedBackend(system))
+    return system
+
+
+def _sessions_system(size):
+    system = SimulatedAudioSystem()
+    system.add_device()
+    system.spawn_sessions(size, app_execs=APP_EXECS)
+    return _install(system)
+
+
+def _devices_system(size):
+    system = SimulatedAudioSystem()
+    system.spawn_devices(size, properties=DEVICE_PROPERTIES)
+    return _install(system)
+
+
+def bench_get_all_sessions(size):
+    _sessions_system(size)
+    return AudioUtilities.GetAllSessions
+
+
+def bench_get_all_devices(size):
+    _devices_system(size)
+    return AudioUtilities.GetAllDevices
+
+
+def bench_create_device(size):
+    system = _devices_system(size)
+    device = list(system.devices.values())[-1]
+
+    def create_device():
+        return AudioUtilities.CreateDevice(device).FriendlyName
+
+    return create_device
+
+
+def bench_get_process_session(size):
+    system = _sessions_system(size)
+    # worst case, the last session
+    pid = system.sessions[-1].pid
+
+    def get_process_session():
+        return AudioUtilities.GetProcessSession(pid)
+
+    return get_process_session
+
+
+def bench_registry_get_process_session(size):
+    system = _sessions_system(size)
+    pid = system.sessions[-1].pid
+    AudioUtilities.EnableSessionRegistry()
+
+    def get_process_session():
+        return AudioUtilities.GetProcessSession(pid)
+
+    return get_process_session
+
+
+def bench_apply_session_changes(size):
+    _sessions_system(size)
+    volumes = [0.25, 0.5]
+
+    def apply_session_changes():
+        # a scene switch, every executable gets a new volume
+        volumes.reverse()
+        changes = {app_exec: {"volume": volumes[0]} for app_exec in APP_EXECS}
+        return AudioUtilities.ApplySessionChanges(changes)
+
+    return apply_session_changes
+
+
+def bench_peak_meter_sample(size):
+    _sessions_system(size)
+    sampler = PeakMeterSampler()
+    for session in AudioUtilities.GetAllSessions():
+        sampler.add(session.InstanceIdentifier, session.Meter)
+    # a single tick of the sampling thread
+    return sampler.sample
+
+
+def _magic_app(size):
+    _sessions_system(size)
+    if MagicManager.magic_activated:
+        MagicManager.unregister_all()
+    # start from scratch rather than reactivating a closed MagicManager
+    MagicManager.magic_activated = False
+    with mock.patch("atexit.register"), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        app = MagicApp(APP_EXECS[0])
+    return app
+
+
+def bench_magic_app_volume_get(size):
+    app = _magic_app(size)
+
+    def volume_get():
+        return app.volume
+
+    return volume_get
+
+
+def bench_magic_app_volume_set(size):
+    app = _magic_app(size)
+
+    def volume_set():
+        app.volume = 0.5 if app.volume != 0.5 else 0.25
+
+    return volume_set
+
+
+def bench_magic_session_created(size):
+    _magic_app(size)
+    system = get_backend().system
+    # dozens of MagicApps, as on a terminal server
+    with mock.patch("atexit.register"):
+        for app_exec in APP_EXECS[1:] + ["other%d.exe" % i for i in range(40)]:
+            MagicApp(app_exec)
+
+    def session_created():
+        session = system.add_session(APP_EXECS[0])
+        # picked up on the endpoint worker
+        MagicManager._endpoint_dispatcher.join()
+        session.expire()
+
+    return session_created
+
+
+def tear_down():
+    AudioUtilities.DisableSessionRegistry()
+    if MagicManager.magic_activated:
+        MagicManager.unregister_all()
+    set_backend(None)
+
+
+BENCHMARKS = {
+    "GetAllSessions": bench_get_all_sessions,
+    "GetAllDevices": bench_get_all_devices,
+    "CreateDevice": bench_create_device,
+    "GetProcessSession": bench_get_process_session,
+    "GetProcessSession.registry": bench_registry_get_process_session,
+    "ApplySessionChanges": bench_apply_session_changes,
+    "PeakMeterSampler.sample": bench_peak_meter_sample,
+    "MagicApp.volume.get": bench_magic_app_volume_get,
+    "MagicApp.volume.set": bench_magic_app_volume_set,
+    "MagicManager.OnSessionCreated": bench_magic_session_created,
+}
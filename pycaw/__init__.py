@@ -0,0 +1,3 @@
+from pycaw.instrument import stats
+
+__all__ = ("stats",)
@@ -0,0 +1,397 @@
+"""
+asyncio interface to the callbacks of pycaw.callbacks, as async iterators:
+
+    async with pycaw.aio.session_events(session) as events:
+        async for event in events:
+            if event.type == "simple_volume_changed":
+                print(event.new_volume, event.new_mute)
+
+The COM notification threads only append the events to a bounded queue
+and wake the event loop up with call_soon_threadsafe(), they never wait
+for the consumer. When the queue is full, the overflow policy applies:
+
+- DROP_OLDEST (default), the oldest queued event makes room
+- DROP_NEWEST, the new event is dropped
+- RAISE, the new event is dropped and the iteration raises asyncio.QueueFull
+
+Same as for the callbacks, COM needs to be in MTA (sys.coinit_flags = 0).
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from pycaw.callbacks import (
+    AudioEndpointVolumeCallback,
+    AudioSessionEvents,
+    AudioSessionNotification,
+    MMNotificationClient,
+)
+from pycaw.coalesce import copy_event_context
+from pycaw.utils import AudioDevice, AudioUtilities
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+RAISE = "raise"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, RAISE)
+
+
+def _copy_guid(guid_pointer):
+    # the GUID itself rather than a pointer, None for a NULL pointer
+    copy = copy_event_context(guid_pointer)
+    return copy.contents if copy else None
+
+
+class AudioEvent:
+    """
+    A callback event, type is the name of its pycaw user interface method
+    without "on_" (e.g. "simple_volume_changed"), the arguments of the
+    method are attributes (e.g. new_volume).
+    Pointer arguments are copied, event_context is a GUID or None.
+    """
+
+    __slots__ = ("type", "args")
+
+    def __init__(self, type, **args):
+        self.type = type
+        self.args = args
+
+    def __getattr__(self, name):
+        try:
+            return self.args[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return "<%s %s %r>" % (self.__class__.__name__, self.type, self.args)
+
+
+class _EventQueue:
+    """Bounded queue filled from any thread, drained by an event loop."""
+
+    def __init__(self, loop, maxsize, overflow):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of %s" % (OVERFLOW_POLICIES,))
+        self._loop = loop
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._waiter = None
+        # a wakeup is already scheduled on the loop
+        self._wakeup_pending = False
+        self._overflowed = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, event):
+        with self._lock:
+            if self._closed:
+                return
+            if len(self._events) < self.maxsize:
+                self._events.append(event)
+            else:
+                self.dropped += 1
+                if self.overflow == DROP_NEWEST:
+                    return
+                if self.overflow == DROP_OLDEST:
+                    self._events.popleft()
+                    self._events.append(event)
+                else:
+                    # the consumer is woken up to raise
+                    self._overflowed = True
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup)
+        except RuntimeError:
+            # the loop is closed
+            pass
+
+    def _wakeup(self):
+        with self._lock:
+            self._wakeup_pending = False
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wakeup()
+
+    async def get(self):
+        while True:
+            with self._lock:
+                if self._overflowed:
+                    self._overflowed = False
+                    raise asyncio.QueueFull()
+                if self._events:
+                    return self._events.popleft()
+                if self._closed:
+                    raise StopAsyncIteration
+                waiter = self._waiter = self._loop.create_future()
+            try:
+                await waiter
+            finally:
+                self._waiter = None
+
+
+class EventStream:
+    """
+    Async iterator over the events of a callback, registered on creation
+    and unregistered by close() (or leaving "async with").
+    dropped counts the events lost to the overflow policy.
+    """
+
+    def __init__(self, callback, unregister, queue):
+        self.callback = callback
+        self._unregister = unregister
+        self._queue = queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    @property
+    def closed(self):
+        return self._unregister is None
+
+    def close(self):
+        """Unregisters the callback, the iteration ends once the queue is empty."""
+        if self._unregister is None:
+            return
+        unregister, self._unregister = self._unregister, None
+        try:
+            unregister(self.callback)
+        finally:
+            self._queue.close()
+
+
+class _SessionEvents(AudioSessionEvents):
+    def __init__(self, queue):
+        super().__init__()
+        self._queue = queue
+
+    def on_display_name_changed(self, new_display_name, event_context):
+        self._queue.put(
+            AudioEvent(
+                "display_name_changed",
+                new_display_name=new_display_name,
+                event_context=_copy_guid(event_context),
+            )
+        )
+
+    def on_icon_path_changed(self, new_icon_path, event_context):
+        self._queue.put(
+            AudioEvent(
+                "icon_path_changed",
+                new_icon_path=new_icon_path,
+                event_context=_copy_guid(event_context),
+            )
+        )
+
+    def on_simple_volume_changed(self, new_volume, new_mute, event_context):
+        self._queue.put(
+            AudioEvent(
+                "simple_volume_changed",
+                new_volume=new_volume,
+                new_mute=new_mute,
+                event_context=_copy_guid(event_context),
+            )
+        )
+
+    def on_channel_volume_changed(
+        self, channel_count, new_channel_volume_array, changed_channel, event_context
+    ):
+        self._queue.put(
+            AudioEvent(
+                "channel_volume_changed",
+                channel_count=channel_count,
+                new_channel_volume_array=new_channel_volume_array[:channel_count],
+                changed_channel=changed_channel,
+                event_context=_copy_guid(event_context),
+            )
+        )
+
+    def on_grouping_param_changed(self, new_grouping_param, event_context):
+        self._queue.put(
+            AudioEvent(
+                "grouping_param_changed",
+                new_grouping_param=_copy_guid(new_grouping_param),
+                event_context=_copy_guid(event_context),
+            )
+        )
+
+    def on_state_changed(self, new_state, new_state_id):
+        self._queue.put(
+            AudioEvent("state_changed", new_state=new_state, new_state_id=new_state_id)
+        )
+
+    def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+        self._queue.put(
+            AudioEvent(
+                "session_disconnected",
+                disconnect_reason=disconnect_reason,
+                disconnect_reason_id=disconnect_reason_id,
+            )
+        )
+
+
+class _SessionNotification(AudioSessionNotification):
+    def __init__(self, queue):
+        super().__init__()
+        self._queue = queue
+
+    def on_session_created(self, new_session):
+        self._queue.put(AudioEvent("session_created", new_session=new_session))
+
+
+class _EndpointVolumeCallback(AudioEndpointVolumeCallback):
+    def __init__(self, queue):
+        super().__init__()
+        self._queue = queue
+
+    def on_notify(self, new_volume, new_mute, event_context, channels, channel_volumes):
+        self._queue.put(
+            AudioEvent(
+                "notify",
+                new_volume=new_volume,
+                new_mute=new_mute,
+                event_context=_copy_guid(event_context),
+                channels=channels,
+                channel_volumes=channel_volumes,
+            )
+        )
+
+
+class _NotificationClient(MMNotificationClient):
+    def __init__(self, queue):
+        super().__init__()
+        self._queue = queue
+
+    def on_default_device_changed(
+        self, flow, flow_id, role, role_id, default_device_id
+    ):
+        self._queue.put(
+            AudioEvent(
+                "default_device_changed",
+                flow=flow,
+                flow_id=flow_id,
+                role=role,
+                role_id=role_id,
+                default_device_id=default_device_id,
+            )
+        )
+
+    def on_device_added(self, added_device_id):
+        self._queue.put(AudioEvent("device_added", added_device_id=added_device_id))
+
+    def on_device_removed(self, removed_device_id):
+        self._queue.put(
+            AudioEvent("device_removed", removed_device_id=removed_device_id)
+        )
+
+    def on_device_state_changed(self, device_id, new_state, new_state_id):
+        self._queue.put(
+            AudioEvent(
+                "device_state_changed",
+                device_id=device_id,
+                new_state=new_state,
+                new_state_id=new_state_id,
+            )
+        )
+
+    def on_property_value_changed(self, device_id, property_struct, fmtid, pid):
+        self._queue.put(
+            AudioEvent(
+                "property_value_changed",
+                device_id=device_id,
+                fmtid=str(fmtid).upper(),
+                pid=pid,
+            )
+        )
+
+
+def _stream(callback_class, register, unregister, maxsize, overflow):
+    queue = _EventQueue(asyncio.get_running_loop(), maxsize, overflow)
+    callback = callback_class(queue)
+    register(callback)
+    return EventStream(callback, unregister, queue)
+
+
+def session_events(session, maxsize=256, overflow=DROP_OLDEST):
+    """
+    EventStream of the AudioSessionEvents of session (an AudioSession),
+    to call from a coroutine.
+    """
+    ctl = session._ctl
+    return _stream(
+        _SessionEvents,
+        ctl.RegisterAudioSessionNotification,
+        ctl.UnregisterAudioSessionNotification,
+        maxsize,
+        overflow,
+    )
+
+
+def session_created_events(mgr=None, maxsize=256, overflow=DROP_OLDEST):
+    """
+    EventStream of the new sessions ("session_created") of an
+    IAudioSessionManager2, the speakers one by default.
+    """
+    if mgr is None:
+        mgr = AudioUtilities.GetAudioSessionManager()
+
+    def register(callback):
+        mgr.RegisterSessionNotification(callback)
+        # enables OnSessionCreated, see AudioSessionNotification
+        mgr.GetSessionEnumerator()
+
+    return _stream(
+        _SessionNotification,
+        register,
+        mgr.UnregisterSessionNotification,
+        maxsize,
+        overflow,
+    )
+
+
+def endpoint_volume_events(device, maxsize=256, overflow=DROP_OLDEST):
+    """
+    EventStream of the volume and mute changes ("notify") of an endpoint,
+    device is an AudioDevice or an IAudioEndpointVolume.
+    """
+    volume = device.EndpointVolume if isinstance(device, AudioDevice) else device
+    return _stream(
+        _EndpointVolumeCallback,
+        volume.RegisterControlChangeNotify,
+        volume.UnregisterControlChangeNotify,
+        maxsize,
+        overflow,
+    )
+
+
+def device_events(maxsize=256, overflow=DROP_OLDEST):
+    """EventStream of the MMNotificationClient events of the endpoints."""
+    enumerator = AudioUtilities.GetDeviceEnumerator()
+    return _stream(
+        _NotificationClient,
+        enumerator.RegisterEndpointNotificationCallback,
+        enumerator.UnregisterEndpointNotificationCallback,
+        maxsize,
+        overflow,
+    )
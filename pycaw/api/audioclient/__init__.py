@@ -1,9 +1,10 @@
-from ctypes import HRESULT, POINTER, c_float
+from ctypes import POINTER, c_float
 from ctypes import c_longlong as REFERENCE_TIME
+from ctypes import c_ubyte as BYTE
 from ctypes import c_uint32 as UINT32
-from ctypes.wintypes import BOOL, DWORD, HANDLE
+from ctypes import c_uint64 as UINT64
 
-from comtypes import COMMETHOD, GUID, IUnknown
+from pycaw.compat import BOOL, COMMETHOD, DWORD, GUID, HANDLE, HRESULT, IUnknown
 
 from .depend import WAVEFORMATEX
 
@@ -139,6 +140,63 @@ class IAudioClient(IUnknown):
     )
 
 
+class IAudioCaptureClient(IUnknown):
+    _iid_ = GUID("{C8ADBD64-E71E-48a0-A4DE-185C395CD317}")
+    _methods_ = (
+        # HRESULT GetBuffer(
+        # [out] BYTE **ppData,
+        # [out] UINT32 *pNumFramesToRead,
+        # [out] DWORD *pdwFlags,
+        # [out] UINT64 *pu64DevicePosition,
+        # [out] UINT64 *pu64QPCPosition);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "GetBuffer",
+            (["out"], POINTER(POINTER(BYTE)), "ppData"),
+            (["out"], POINTER(UINT32), "pNumFramesToRead"),
+            (["out"], POINTER(DWORD), "pdwFlags"),
+            (["out"], POINTER(UINT64), "pu64DevicePosition"),
+            (["out"], POINTER(UINT64), "pu64QPCPosition"),
+        ),
+        # HRESULT ReleaseBuffer([in] UINT32 NumFramesRead);
+        COMMETHOD([], HRESULT, "ReleaseBuffer", (["in"], UINT32, "NumFramesRead")),
+        # HRESULT GetNextPacketSize([out] UINT32 *pNumFramesInNextPacket);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "GetNextPacketSize",
+            (["out"], POINTER(UINT32), "pNumFramesInNextPacket"),
+        ),
+    )
+
+
+class IAudioRenderClient(IUnknown):
+    _iid_ = GUID("{F294ACFC-3146-4483-A7BF-ADDCA7C260E2}")
+    _methods_ = (
+        # HRESULT GetBuffer(
+        # [in] UINT32 NumFramesRequested,
+        # [out] BYTE **ppData);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "GetBuffer",
+            (["in"], UINT32, "NumFramesRequested"),
+            (["out"], POINTER(POINTER(BYTE)), "ppData"),
+        ),
+        # HRESULT ReleaseBuffer(
+        # [in] UINT32 NumFramesWritten,
+        # [in] DWORD dwFlags);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "ReleaseBuffer",
+            (["in"], UINT32, "NumFramesWritten"),
+            (["in"], DWORD, "dwFlags"),
+        ),
+    )
+
+
 class IChannelAudioVolume(IUnknown):
     _iid_ = GUID("{1c158861-b533-4b30-b1cf-e853e51c59b8}")
     _methods_ = (
@@ -1,14 +1,36 @@
-from ctypes import Structure
-from ctypes.wintypes import WORD
+from ctypes import Structure, Union
+
+from pycaw.compat import DWORD, GUID, WORD
 
 
 class WAVEFORMATEX(Structure):
+    # mmreg.h declares it with 1 byte packing, sizeof(WAVEFORMATEX) == 18
+    _pack_ = 1
     _fields_ = [
         ("wFormatTag", WORD),
         ("nChannels", WORD),
-        ("nSamplesPerSec", WORD),
-        ("nAvgBytesPerSec", WORD),
+        ("nSamplesPerSec", DWORD),
+        ("nAvgBytesPerSec", DWORD),
         ("nBlockAlign", WORD),
         ("wBitsPerSample", WORD),
         ("cbSize", WORD),
     ]
+
+
+class WAVEFORMATEXTENSIBLE_SAMPLES(Union):
+    _fields_ = [
+        ("wValidBitsPerSample", WORD),
+        ("wSamplesPerBlock", WORD),
+        ("wReserved", WORD),
+    ]
+
+
+class WAVEFORMATEXTENSIBLE(Structure):
+    # Format.cbSize == 22, sizeof(WAVEFORMATEXTENSIBLE) == 40
+    _pack_ = 1
+    _fields_ = [
+        ("Format", WAVEFORMATEX),
+        ("Samples", WAVEFORMATEXTENSIBLE_SAMPLES),
+        ("dwChannelMask", DWORD),
+        ("SubFormat", GUID),
+    ]
@@ -1,7 +1,16 @@
-from ctypes import HRESULT, POINTER, c_float, c_uint32
-from ctypes.wintypes import BOOL, DWORD, INT, LPCWSTR, LPWSTR
+from ctypes import POINTER, c_float, c_uint32
 
-from comtypes import COMMETHOD, GUID, IUnknown
+from pycaw.compat import (
+    BOOL,
+    COMMETHOD,
+    DWORD,
+    GUID,
+    HRESULT,
+    INT,
+    LPCWSTR,
+    LPWSTR,
+    IUnknown,
+)
 
 from ..audioclient import ISimpleAudioVolume
 
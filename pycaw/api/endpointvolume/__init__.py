@@ -1,7 +1,6 @@
-from ctypes import HRESULT, POINTER, c_float
-from ctypes.wintypes import BOOL, DWORD, UINT
+from ctypes import POINTER, c_float
 
-from comtypes import COMMETHOD, GUID, IUnknown
+from pycaw.compat import BOOL, COMMETHOD, DWORD, GUID, HRESULT, UINT, IUnknown
 
 from .depend import PAUDIO_VOLUME_NOTIFICATION_DATA
 
@@ -174,4 +173,29 @@ class IAudioMeterInformation(IUnknown):
     _methods_ = (
         # HRESULT GetPeakValue([out] c_float *pfPeak);
         COMMETHOD([], HRESULT, "GetPeakValue", (["out"], POINTER(c_float), "pfPeak")),
+        # HRESULT GetMeteringChannelCount([out] UINT *pnChannelCount);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "GetMeteringChannelCount",
+            (["out"], POINTER(UINT), "pnChannelCount"),
+        ),
+        # HRESULT GetChannelsPeakValues(
+        # [in] UINT32 u32ChannelCount,
+        # [out] float *afPeakValues);
+        # afPeakValues is the caller allocated array of u32ChannelCount floats
+        COMMETHOD(
+            [],
+            HRESULT,
+            "GetChannelsPeakValues",
+            (["in"], UINT, "u32ChannelCount"),
+            (["in"], POINTER(c_float), "afPeakValues"),
+        ),
+        # HRESULT QueryHardwareSupport([out] DWORD *pdwHardwareSupportMask);
+        COMMETHOD(
+            [],
+            HRESULT,
+            "QueryHardwareSupport",
+            (["out"], POINTER(DWORD), "pdwHardwareSupportMask"),
+        ),
     )
@@ -1,7 +1,6 @@
 from ctypes import POINTER, Structure, c_float
-from ctypes.wintypes import BOOL, UINT
 
-from comtypes import GUID
+from pycaw.compat import BOOL, GUID, UINT
 
 
 class AUDIO_VOLUME_NOTIFICATION_DATA(Structure):
@@ -1,7 +1,15 @@
-from ctypes import HRESULT, POINTER
-from ctypes.wintypes import DWORD, LPCWSTR, LPWSTR, UINT
+from ctypes import POINTER
 
-from comtypes import COMMETHOD, GUID, IUnknown
+from pycaw.compat import (
+    COMMETHOD,
+    DWORD,
+    GUID,
+    HRESULT,
+    LPCWSTR,
+    LPWSTR,
+    UINT,
+    IUnknown,
+)
 
 from .depend import PROPERTYKEY, IPropertyStore
 
@@ -1,7 +1,6 @@
-from ctypes import HRESULT, POINTER
-from ctypes.wintypes import DWORD
+from ctypes import POINTER, byref
 
-from comtypes import COMMETHOD, GUID, IUnknown
+from pycaw.compat import COMMETHOD, DWORD, GUID, HRESULT, IUnknown
 
 from .structures import PROPERTYKEY, PROPVARIANT
 
@@ -45,3 +44,12 @@ class IPropertyStore(IUnknown):
         # HRESULT Commit();
         COMMETHOD([], HRESULT, "Commit"),
     )
+
+    def GetValueInto(self, key, pv):
+        """
+        Same as GetValue, but fills the given PROPVARIANT rather than
+        allocating one, so a single buffer can be reused over many keys.
+        pv must be cleared between calls.
+        """
+        self.__com_GetValue(byref(key), byref(pv))
+        return pv
@@ -1,20 +1,165 @@
-from ctypes import Structure, Union, byref, windll
-from ctypes.wintypes import DWORD, LONG, LPWSTR, ULARGE_INTEGER, VARIANT_BOOL, WORD
+from ctypes import (
+    POINTER,
+    Structure,
+    Union,
+    c_byte,
+    c_char_p,
+    c_double,
+    c_float,
+    c_int,
+    c_longlong,
+    c_short,
+    c_ubyte,
+    c_uint,
+    c_ushort,
+    c_void_p,
+    cast,
+    string_at,
+)
+from datetime import datetime, timedelta, timezone
 
-from comtypes import GUID
-from comtypes.automation import VARTYPE, VT_BOOL, VT_CLSID, VT_LPWSTR, VT_UI4
+from pycaw.compat import (
+    DWORD,
+    FILETIME,
+    GUID,
+    LONG,
+    LPWSTR,
+    ULARGE_INTEGER,
+    ULONG,
+    VARIANT_BOOL,
+    VARTYPE,
+    VT_BLOB,
+    VT_BOOL,
+    VT_BSTR,
+    VT_CLSID,
+    VT_EMPTY,
+    VT_FILETIME,
+    VT_I1,
+    VT_I2,
+    VT_I4,
+    VT_I8,
+    VT_INT,
+    VT_LPSTR,
+    VT_LPWSTR,
+    VT_NULL,
+    VT_R4,
+    VT_R8,
+    VT_UI1,
+    VT_UI2,
+    VT_UI4,
+    VT_UI8,
+    VT_UINT,
+    VT_VECTOR,
+    WORD,
+)
+
+
+class BLOB(Structure):
+    _fields_ = [
+        ("cbSize", ULONG),
+        ("pBlobData", POINTER(c_ubyte)),
+    ]
+
+
+class CALPWSTR(Structure):
+    _fields_ = [
+        ("cElems", ULONG),
+        ("pElems", POINTER(LPWSTR)),
+    ]
+
+
+class CAPROPVARIANT_VECTOR(Structure):
+    # layout shared by all the counted arrays (CAUB, CAUI, CAL, CACLSID...)
+    _fields_ = [
+        ("cElems", ULONG),
+        ("pElems", c_void_p),
+    ]
 
 
 class PROPVARIANT_UNION(Union):
     _fields_ = [
+        ("cVal", c_byte),
+        ("bVal", c_ubyte),
+        ("iVal", c_short),
+        ("uiVal", c_ushort),
         ("lVal", LONG),
+        ("ulVal", ULONG),
+        ("intVal", c_int),
+        ("uintVal", c_uint),
+        ("hVal", c_longlong),
         ("uhVal", ULARGE_INTEGER),
+        ("fltVal", c_float),
+        ("dblVal", c_double),
         ("boolVal", VARIANT_BOOL),
+        ("filetime", FILETIME),
+        ("puuid", POINTER(GUID)),
+        ("pszVal", c_char_p),
         ("pwszVal", LPWSTR),
-        ("puuid", GUID),
+        ("blob", BLOB),
+        ("calpwstr", CALPWSTR),
+        ("ca", CAPROPVARIANT_VECTOR),
     ]
 
 
+# FILETIME counts 100 nanoseconds since 1601-01-01 UTC
+_FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+
+def _decode_filetime(filetime):
+    ticks = (filetime.dwHighDateTime << 32) | filetime.dwLowDateTime
+    return _FILETIME_EPOCH + timedelta(microseconds=ticks // 10)
+
+
+def _decode_bytes(address, size, copy):
+    if not address or not size:
+        return b"" if copy else memoryview(b"")
+    if copy:
+        return string_at(address, size)
+    return memoryview((c_ubyte * size).from_address(address)).cast("B")
+
+
+def _decode_guid(puuid):
+    if not puuid:
+        return None
+    # copy, the memory belongs to the PROPVARIANT
+    return GUID.from_buffer_copy(puuid.contents)
+
+
+# VT_xxx -> union field, for the types needing no decoding
+_SCALARS = {
+    VT_I1: "cVal",
+    VT_UI1: "bVal",
+    VT_I2: "iVal",
+    VT_UI2: "uiVal",
+    VT_I4: "lVal",
+    VT_UI4: "ulVal",
+    VT_INT: "intVal",
+    VT_UINT: "uintVal",
+    VT_I8: "hVal",
+    VT_UI8: "uhVal",
+    VT_R4: "fltVal",
+    VT_R8: "dblVal",
+    VT_LPWSTR: "pwszVal",
+    VT_BSTR: "pwszVal",
+}
+
+# VT_VECTOR | VT_xxx element types, that are plain ctypes
+_VECTOR_ELEMENTS = {
+    VT_I1: c_byte,
+    VT_I2: c_short,
+    VT_UI2: c_ushort,
+    VT_I4: LONG,
+    VT_UI4: ULONG,
+    VT_INT: c_int,
+    VT_UINT: c_uint,
+    VT_I8: c_longlong,
+    VT_UI8: ULARGE_INTEGER,
+    VT_R4: c_float,
+    VT_R8: c_double,
+    VT_BOOL: VARIANT_BOOL,
+}
+
+
 class PROPVARIANT(Structure):
     _fields_ = [
         ("vt", VARTYPE),
@@ -24,24 +169,68 @@ class PROPVARIANT(Structure):
         ("union", PROPVARIANT_UNION),
     ]
 
-    def GetValue(self):
+    def GetValue(self, copy=False):
+        """
+        Decodes the value to a Python object.
+
+        VT_BLOB and VT_VECTOR | VT_UI1 are returned as memoryview over the
+        PROPVARIANT memory, only valid until clear() is called.
+        Pass copy=True to get bytes instead.
+        """
         vt = self.vt
-        if vt == VT_BOOL:
+        field = _SCALARS.get(vt)
+        if field is not None:
+            return getattr(self.union, field)
+        if vt == VT_EMPTY or vt == VT_NULL:
+            return None
+        elif vt == VT_BOOL:
             return self.union.boolVal != 0
+        elif vt == VT_LPSTR:
+            value = self.union.pszVal
+            return None if value is None else value.decode("mbcs")
+        elif vt == VT_CLSID:
+            return _decode_guid(self.union.puuid)
+        elif vt == VT_FILETIME:
+            return _decode_filetime(self.union.filetime)
+        elif vt == VT_BLOB:
+            blob = self.union.blob
+            return _decode_bytes(
+                cast(blob.pBlobData, c_void_p).value, blob.cbSize, copy
+            )
+        elif vt & VT_VECTOR:
+            return self._GetVector(vt & ~VT_VECTOR, copy)
+        return "%s:?" % (vt)
+
+    def _GetVector(self, vt, copy):
+        ca = self.union.ca
+        count = ca.cElems
+        if vt == VT_UI1:
+            return _decode_bytes(ca.pElems, count, copy)
         elif vt == VT_LPWSTR:
-            # return Marshal.PtrToStringUni(union.pwszVal)
-            return self.union.pwszVal
-        elif vt == VT_UI4:
-            return self.union.lVal
+            return self.union.calpwstr.pElems[:count] if count else []
+        elif vt == VT_LPSTR:
+            items = cast(ca.pElems, POINTER(c_char_p))[:count] if count else []
+            return [item.decode("mbcs") for item in items]
         elif vt == VT_CLSID:
-            # TODO
-            # return (Guid)Marshal.PtrToStructure(union.puuid, typeof(Guid))
-            return
-        else:
-            return "%s:?" % (vt)
+            guids = cast(ca.pElems, POINTER(GUID))
+            return [GUID.from_buffer_copy(guids[i]) for i in range(count)]
+        elif vt == VT_FILETIME:
+            filetimes = cast(ca.pElems, POINTER(FILETIME))
+            return [_decode_filetime(filetimes[i]) for i in range(count)]
+        element = _VECTOR_ELEMENTS.get(vt)
+        if element is None:
+            return "%s:?" % (vt | VT_VECTOR)
+        values = cast(ca.pElems, POINTER(element))[:count] if count else []
+        if vt == VT_BOOL:
+            return [value != 0 for value in values]
+        return values
 
     def clear(self):
-        windll.ole32.PropVariantClear(byref(self))
+        # through the backend, which allocated the memory
+        # (PropVariantClear on Windows)
+        from pycaw.backend import get_backend
+
+        get_backend().ClearPropVariant(self)
 
 
 class PROPERTYKEY(Structure):
@@ -0,0 +1,172 @@
+"""
+Backends decide where pycaw gets its Core Audio objects from.
+
+The default ComBackend activates the real Windows audio service objects
+through comtypes, it is the only part of pycaw needing Windows
+(see pycaw.compat). Any other object exposing the same methods can be
+installed with set_backend(), e.g. pycaw.simulation.SimulatedBackend
+to profile and test pycaw without a sound card.
+"""
+
+import ctypes
+from contextlib import contextmanager
+from ctypes import c_void_p
+from ctypes.wintypes import BOOL, DWORD, HANDLE, HWND, LPARAM, LPCWSTR, LPDWORD, LPWSTR
+
+import psutil
+
+from pycaw import compat
+from pycaw.api.mmdeviceapi import IMMDeviceEnumerator
+from pycaw.constants import CLSID_MMDeviceEnumerator
+
+
+class ComBackend:
+    """Talks to the Windows audio service via comtypes."""
+
+    def CreateDeviceEnumerator(self):
+        """Creates a new IMMDeviceEnumerator."""
+        comtypes = compat.comtypes
+        if comtypes is None:
+            raise OSError(
+                "COM is only available on Windows, "
+                "use e.g. pycaw.simulation.SimulatedBackend elsewhere"
+            )
+        return comtypes.CoCreateInstance(
+            CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, comtypes.CLSCTX_INPROC_SERVER
+        )
+
+    def InitializeThread(self):
+        """
+        Initializes COM on a thread started by pycaw (multithreaded apartment,
+        interface pointers of the other MTA threads can be used as is).
+        """
+        comtypes = compat.comtypes
+        if comtypes is not None:
+            comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+
+    def UninitializeThread(self):
+        comtypes = compat.comtypes
+        if comtypes is not None:
+            comtypes.CoUninitialize()
+
+    def _kernel32(self):
+        kernel32 = getattr(self, "_kernel32_dll", None)
+        if kernel32 is None:
+            # own instance, not to change the prototypes of windll.kernel32
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.CreateEventW.restype = HANDLE
+            kernel32.CreateEventW.argtypes = (c_void_p, BOOL, BOOL, LPCWSTR)
+            kernel32.WaitForSingleObject.restype = DWORD
+            kernel32.WaitForSingleObject.argtypes = (HANDLE, DWORD)
+            kernel32.CloseHandle.argtypes = (HANDLE,)
+            self._kernel32_dll = kernel32
+        return kernel32
+
+    def _user32(self):
+        user32 = getattr(self, "_user32_dll", None)
+        if user32 is None:
+            # own instance, not to change the prototypes of windll.user32
+            user32 = ctypes.WinDLL("user32", use_last_error=True)
+            self._enum_windows_proc = ctypes.WINFUNCTYPE(BOOL, HWND, LPARAM)
+            user32.EnumWindows.argtypes = (self._enum_windows_proc, LPARAM)
+            user32.GetWindowThreadProcessId.restype = DWORD
+            user32.GetWindowThreadProcessId.argtypes = (HWND, LPDWORD)
+            user32.GetClassNameW.argtypes = (HWND, LPWSTR, ctypes.c_int)
+            self._user32_dll = user32
+        return user32
+
+    def CreateEvent(self):
+        """Creates an auto-reset event, e.g. for IAudioClient.SetEventHandle."""
+        handle = self._kernel32().CreateEventW(None, False, False, None)
+        if not handle:
+            raise ctypes.WinError(ctypes.get_last_error())
+        return handle
+
+    def WaitForEvent(self, handle, timeout):
+        """Waits up to timeout seconds, returns True if the event was signaled."""
+        milliseconds = int(timeout * 1000)
+        return self._kernel32().WaitForSingleObject(handle, milliseconds) == 0
+
+    def CloseEvent(self, handle):
+        self._kernel32().CloseHandle(handle)
+
+    def FreeMemory(self, memory):
+        """Frees memory allocated by COM, e.g. by IAudioClient.GetMixFormat."""
+        ctypes.windll.ole32.CoTaskMemFree(memory)
+
+    def ClearPropVariant(self, pv):
+        """Frees the memory of a PROPVARIANT filled by COM and empties it."""
+        ctypes.windll.ole32.PropVariantClear(ctypes.byref(pv))
+
+    def GetProcessName(self, pid):
+        """
+        Returns the executable name of pid.
+        Raises psutil.NoSuchProcess if there is no such process.
+        """
+        return psutil.Process(pid).name()
+
+    def GetProcessCreateTime(self, pid):
+        """
+        Returns the creation time of pid, telling apart processes which
+        got the same pid. Raises psutil.NoSuchProcess.
+        """
+        return psutil.Process(pid).create_time()
+
+    def GetProcessExe(self, pid):
+        """Returns the full executable path of pid. Raises psutil.NoSuchProcess."""
+        return psutil.Process(pid).exe()
+
+    def GetParentProcessId(self, pid):
+        """Returns the pid of the parent of pid. Raises psutil.NoSuchProcess."""
+        return psutil.Process(pid).ppid()
+
+    def GetWindowClasses(self, pid):
+        """Returns the class names of the top level windows of pid."""
+        user32 = self._user32()
+        classes = []
+        owner = DWORD()
+        buffer = ctypes.create_unicode_buffer(256)
+
+        def callback(hwnd, lparam):
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(owner))
+            if owner.value == pid and user32.GetClassNameW(hwnd, buffer, len(buffer)):
+                classes.append(buffer.value)
+            return True
+
+        user32.EnumWindows(self._enum_windows_proc(callback), 0)
+        return classes
+
+    def IterProcesses(self):
+        """Yields (pid, name, create_time) of all processes, in one sweep."""
+        for process in psutil.process_iter(["pid", "name", "create_time"]):
+            info = process.info
+            yield info["pid"], info["name"], info["create_time"]
+
+
+_backend = ComBackend()
+
+
+def get_backend():
+    """Returns the backend currently in use."""
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Installs backend for all pycaw calls and returns the previous one.
+    Passing None restores the default ComBackend.
+    """
+    global _backend
+    previous = _backend
+    _backend = ComBackend() if backend is None else backend
+    return previous
+
+
+@contextmanager
+def use_backend(backend):
+    """Temporarily installs backend, e.g. for tests or benchmarks."""
+    previous = set_backend(backend)
+    try:
+        yield backend
+    finally:
+        set_backend(previous)
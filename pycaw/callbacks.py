@@ -1,7 +1,5 @@
 from ctypes import pointer
 
-from comtypes import COMObject
-
 from pycaw.api.audiopolicy import (
     IAudioSessionControl2,
     IAudioSessionEvents,
@@ -9,9 +7,32 @@ from pycaw.api.audiopolicy import (
 )
 from pycaw.api.endpointvolume import IAudioEndpointVolumeCallback
 from pycaw.api.mmdeviceapi import IMMNotificationClient
+from pycaw.coalesce import copy_event_context
+from pycaw.compat import COMObject
+from pycaw.instrument import in_event, instrumented, user_code
 from pycaw.utils import AudioSession
 
 
+def _call(callback, func, *args):
+    """Calls func(*args) now, or queues it on the dispatcher of callback."""
+    func = user_code(func)
+    dispatcher = callback._dispatcher
+    if dispatcher is None:
+        func(*args)
+        return
+    dispatcher.submit(callback, in_event(func), *args)
+
+
+def _keep(callback, guid_pointer):
+    """
+    Copy of a GUID pointer of a notification for a dispatched callback,
+    the pointed memory doesn't outlive the notification.
+    """
+    if callback._dispatcher is None:
+        return guid_pointer
+    return copy_event_context(guid_pointer)
+
+
 class AudioSessionNotification(COMObject):
     """
     Helper for audio session created callbacks.
@@ -43,14 +64,26 @@ class AudioSessionNotification(COMObject):
     def on_session_created(self, new_volume, new_mute, event_context):
         Is fired, when a new audio session is created.
             new_session : pycaw.utils.AudioSession
+
+    Dispatching
+    -----------
+    Pass a pycaw.dispatch.CallbackDispatcher to run on_session_created on
+    its workers, the COM notification returns right away:
+        callback = MyCustomCallback(dispatcher=CallbackDispatcher())
     """
 
     _com_interfaces_ = (IAudioSessionNotification,)
+    _dispatcher = None
+
+    def __init__(self, dispatcher=None):
+        super().__init__()
+        self._dispatcher = dispatcher
 
+    @instrumented("IAudioSessionNotification.OnSessionCreated")
     def OnSessionCreated(self, new_session):
         ctl2 = new_session.QueryInterface(IAudioSessionControl2)
         new_session = AudioSession(ctl2)
-        self.on_session_created(new_session)
+        _call(self, self.on_session_created, new_session)
 
     def on_session_created(self, new_session):
         """pycaw user interface"""
@@ -127,9 +160,29 @@ class AudioSessionEvents(COMObject):
             Mostly on_state_changed == "Expired" is what you are looking for.
             see self.AudioSessionDisconnectReason for disconnect_reason.
             The use is similar to on_state_changed.
+
+    Coalescing
+    ----------
+    Pass a pycaw.coalesce.Coalescer to merge the on_simple_volume_changed
+    storms (e.g. while dragging a slider) into at most two per window:
+        callback = MyCustomCallback(coalescer=Coalescer(window=0.05))
+
+    Dispatching
+    -----------
+    Pass a pycaw.dispatch.CallbackDispatcher to run the methods on its
+    workers, in order, the COM notifications return right away:
+        callback = MyCustomCallback(dispatcher=CallbackDispatcher())
+
+    Statistics
+    ----------
+    Set stats_session (e.g. to the executable name) to count the events
+    of this session in pycaw.stats(), see pycaw.instrument.
     """
 
     _com_interfaces_ = (IAudioSessionEvents,)
+    _coalescer = None
+    _dispatcher = None
+    stats_session = None
 
     # ======= DECODE RETURNED INT VALUE =======
     # see audiosessiontypes.h and audiopolicy.h
@@ -144,32 +197,83 @@ class AudioSessionEvents(COMObject):
         "ExclusiveModeOverride",
     )
 
+    def __init__(self, coalescer=None, dispatcher=None):
+        super().__init__()
+        self._coalescer = coalescer
+        self._dispatcher = dispatcher
+
+    @instrumented("IAudioSessionEvents.OnDisplayNameChanged")
     def OnDisplayNameChanged(self, new_display_name, event_context):
-        self.on_display_name_changed(new_display_name, event_context)
+        _call(
+            self,
+            self.on_display_name_changed,
+            new_display_name,
+            _keep(self, event_context),
+        )
 
+    @instrumented("IAudioSessionEvents.OnIconPathChanged")
     def OnIconPathChanged(self, new_icon_path, event_context):
-        self.on_icon_path_changed(new_icon_path, event_context)
+        _call(
+            self, self.on_icon_path_changed, new_icon_path, _keep(self, event_context)
+        )
 
+    @instrumented("IAudioSessionEvents.OnSimpleVolumeChanged")
     def OnSimpleVolumeChanged(self, new_volume, new_mute, event_context):
-        self.on_simple_volume_changed(new_volume, new_mute, event_context)
+        if self._coalescer is not None:
+            self._coalescer.submit(
+                self,
+                in_event(_call),
+                self,
+                self.on_simple_volume_changed,
+                new_volume,
+                new_mute,
+                copy_event_context(event_context),
+            )
+            return
+        _call(
+            self,
+            self.on_simple_volume_changed,
+            new_volume,
+            new_mute,
+            _keep(self, event_context),
+        )
 
+    @instrumented("IAudioSessionEvents.OnChannelVolumeChanged")
     def OnChannelVolumeChanged(
         self, channel_count, new_channel_volume_array, changed_channel, event_context
     ):
-        self.on_channel_volume_changed(
-            channel_count, new_channel_volume_array, changed_channel, event_context
+        if self._dispatcher is not None:
+            # the array doesn't outlive the notification
+            new_channel_volume_array = new_channel_volume_array[:channel_count]
+        _call(
+            self,
+            self.on_channel_volume_changed,
+            channel_count,
+            new_channel_volume_array,
+            changed_channel,
+            _keep(self, event_context),
         )
 
+    @instrumented("IAudioSessionEvents.OnGroupingParamChanged")
     def OnGroupingParamChanged(self, new_grouping_param, event_context):
-        self.on_grouping_param_changed(new_grouping_param, event_context)
+        _call(
+            self,
+            self.on_grouping_param_changed,
+            _keep(self, new_grouping_param),
+            _keep(self, event_context),
+        )
 
+    @instrumented("IAudioSessionEvents.OnStateChanged")
     def OnStateChanged(self, new_state_id):
         new_state = self.AudioSessionState[new_state_id]
-        self.on_state_changed(new_state, new_state_id)
+        _call(self, self.on_state_changed, new_state, new_state_id)
 
+    @instrumented("IAudioSessionEvents.OnSessionDisconnected")
     def OnSessionDisconnected(self, disconnect_reason_id):
         disconnect_reason = self.AudioSessionDisconnectReason[disconnect_reason_id]
-        self.on_session_disconnected(disconnect_reason, disconnect_reason_id)
+        _call(
+            self, self.on_session_disconnected, disconnect_reason, disconnect_reason_id
+        )
 
     def on_display_name_changed(self, new_display_name, event_context):
         """pycaw user interface"""
@@ -225,10 +329,30 @@ class AudioEndpointVolumeCallback(COMObject):
             channel_volumes : list : float
                 the channel volumes in range(0, 1)
                 len(channel_volumes) == channels
+
+    Coalescing
+    ----------
+    Pass a pycaw.coalesce.Coalescer to merge the on_notify storms
+    (e.g. while dragging a slider) into at most two per window:
+        callback = MyCustomCallback(coalescer=Coalescer(window=0.05))
+
+    Dispatching
+    -----------
+    Pass a pycaw.dispatch.CallbackDispatcher to run on_notify on its
+    workers, in order, the COM notification returns right away:
+        callback = MyCustomCallback(dispatcher=CallbackDispatcher())
     """
 
     _com_interfaces_ = (IAudioEndpointVolumeCallback,)
+    _coalescer = None
+    _dispatcher = None
 
+    def __init__(self, coalescer=None, dispatcher=None):
+        super().__init__()
+        self._coalescer = coalescer
+        self._dispatcher = dispatcher
+
+    @instrumented("IAudioEndpointVolumeCallback.OnNotify")
     def OnNotify(self, pNotify):
         """Fired by Windows, when the audio device volume/mute changed"""
 
@@ -243,10 +367,26 @@ class AudioEndpointVolumeCallback(COMObject):
 
         event_context = pointer(notify_data.guidEventContext)
 
-        self.on_notify(
+        if self._coalescer is not None:
+            self._coalescer.submit(
+                self,
+                in_event(_call),
+                self,
+                self.on_notify,
+                notify_data.fMasterVolume,
+                notify_data.bMuted,
+                copy_event_context(event_context),
+                channels,
+                channel_volumes,
+            )
+            return
+
+        _call(
+            self,
+            self.on_notify,
             notify_data.fMasterVolume,
             notify_data.bMuted,
-            event_context,
+            _keep(self, event_context),
             channels,
             channel_volumes,
         )
@@ -308,33 +448,59 @@ class MMNotificationClient(COMObject):
                 GUID of the changed property.
             pid: int
                 PID of the changed property.
+
+    Dispatching
+    -----------
+    Pass a pycaw.dispatch.CallbackDispatcher to run the methods on its
+    workers, in order, the COM notifications return right away:
+        client = MyCustomClient(dispatcher=CallbackDispatcher())
     """
 
     _com_interfaces_ = (IMMNotificationClient,)
+    _dispatcher = None
 
     DeviceStates = {1: "Active", 2: "Disabled", 4: "NotPresent", 8: "Unplugged"}
     Roles = ["eConsole", "eMultimedia", "eCommunications", "ERole_enum_count"]
     DataFlow = ["eRender", "eCapture", "eAll", "EDataFlow_enum_count"]
 
+    def __init__(self, dispatcher=None):
+        super().__init__()
+        self._dispatcher = dispatcher
+
+    @instrumented("IMMNotificationClient.OnDefaultDeviceChanged")
     def OnDefaultDeviceChanged(self, flow_id, role_id, default_device_id):
         flow = self.DataFlow[flow_id]
         role = self.Roles[role_id]
-        self.on_default_device_changed(flow, flow_id, role, role_id, default_device_id)
+        _call(
+            self,
+            self.on_default_device_changed,
+            flow,
+            flow_id,
+            role,
+            role_id,
+            default_device_id,
+        )
 
+    @instrumented("IMMNotificationClient.OnDeviceAdded")
     def OnDeviceAdded(self, added_device_id):
-        self.on_device_added(added_device_id)
+        _call(self, self.on_device_added, added_device_id)
 
+    @instrumented("IMMNotificationClient.OnDeviceRemoved")
     def OnDeviceRemoved(self, removed_device_id):
-        self.on_device_removed(removed_device_id)
+        _call(self, self.on_device_removed, removed_device_id)
 
+    @instrumented("IMMNotificationClient.OnDeviceStateChanged")
     def OnDeviceStateChanged(self, device_id, new_state_id):
         new_state = self.DeviceStates[new_state_id]
-        self.on_device_state_changed(device_id, new_state, new_state_id)
+        _call(self, self.on_device_state_changed, device_id, new_state, new_state_id)
 
+    @instrumented("IMMNotificationClient.OnPropertyValueChanged")
     def OnPropertyValueChanged(self, device_id, property_struct):
         fmtid = property_struct.fmtid
         pid = property_struct.pid
-        self.on_property_value_changed(device_id, property_struct, fmtid, pid)
+        _call(
+            self, self.on_property_value_changed, device_id, property_struct, fmtid, pid
+        )
 
     def on_default_device_changed(
         self, flow, flow_id, role, role_id, default_device_id
@@ -0,0 +1,154 @@
+"""
+Coalescing of notification storms, see Coalescer.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from ctypes import pointer
+
+from pycaw.backend import get_backend
+from pycaw.compat import GUID
+
+log = logging.getLogger(__name__)
+
+
+def copy_event_context(event_context):
+    """
+    Copies an event_context (pointer to a GUID) of a notification,
+    the pointed memory doesn't outlive the notification.
+    """
+    if not event_context:
+        return event_context
+    return pointer(GUID.from_buffer_copy(bytes(event_context.contents)))
+
+
+class Coalescer:
+    """
+    Merges the events of a same key (a session, an endpoint ...) that come
+    within 'window' seconds of each other:
+    the first one is delivered right away (leading edge), the following
+    ones only update the pending event, delivered once the window is over
+    (trailing edge), which opens a new window.
+    So the latest value is always delivered, at most twice per window.
+
+        coalescer = Coalescer(window=0.05)
+        callback = MyAudioEndpointVolumeCallback(coalescer=coalescer)
+
+    Leading edges are delivered on the notifying thread, trailing edges
+    on the thread of the coalescer (initialized for COM like the callbacks).
+    received, delivered and merged count the events.
+    """
+
+    def __init__(self, window=0.05):
+        self.window = window
+        self._cond = threading.Condition()
+        # key -> [window end, pending (func, args) or None]
+        self._keys = {}
+        # (window end, order, key) of the open windows
+        self._deadlines = []
+        self._order = itertools.count()
+        self._thread = None
+        self.received = 0
+        self.delivered = 0
+        self.merged = 0
+
+    def __len__(self):
+        """Number of keys with an open window"""
+        return len(self._keys)
+
+    def stats(self):
+        with self._cond:
+            pending = sum(entry[1] is not None for entry in self._keys.values())
+            return {
+                "received": self.received,
+                "delivered": self.delivered,
+                "merged": self.merged,
+                "pending": pending,
+            }
+
+    def submit(self, key, func, *args):
+        """Calls func(*args) now, or at the end of the window of key."""
+        with self._cond:
+            self.received += 1
+            entry = self._keys.get(key)
+            if entry is not None:
+                if entry[1] is not None:
+                    self.merged += 1
+                entry[1] = (func, args)
+                return
+            self._open(key, time.monotonic())
+            self.delivered += 1
+        self._deliver(func, args)
+
+    def _open(self, key, now):
+        end = now + self.window
+        self._keys[key] = [end, None]
+        heapq.heappush(self._deadlines, (end, next(self._order), key))
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="Coalescer", daemon=True
+            )
+            self._thread.start()
+        self._cond.notify()
+
+    def _deliver(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            log.exception("coalesced callback %r failed", func)
+
+    def _run(self):
+        me = threading.current_thread()
+        backend = get_backend()
+        backend.InitializeThread()
+        try:
+            while True:
+                with self._cond:
+                    while self._thread is me:
+                        timeout = None
+                        if self._deadlines:
+                            timeout = self._deadlines[0][0] - time.monotonic()
+                            if timeout <= 0:
+                                break
+                        self._cond.wait(timeout)
+                    if self._thread is not me:
+                        # closed
+                        return
+                    _, _, key = heapq.heappop(self._deadlines)
+                    pending = self._keys[key][1]
+                    if pending is None:
+                        # a quiet window, the next event is a leading edge
+                        del self._keys[key]
+                        continue
+                    self._open(key, time.monotonic())
+                    self.delivered += 1
+                self._deliver(*pending)
+        finally:
+            backend.UninitializeThread()
+
+    def flush(self):
+        """Delivers the pending events now, the windows stay open."""
+        with self._cond:
+            pending = []
+            for entry in self._keys.values():
+                if entry[1] is not None:
+                    pending.append(entry[1])
+                    entry[1] = None
+            self.delivered += len(pending)
+        for func, args in pending:
+            self._deliver(func, args)
+
+    def close(self):
+        """Delivers the pending events and stops the thread."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        with self._cond:
+            self._keys.clear()
+            self._deadlines.clear()
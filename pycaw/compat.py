@@ -0,0 +1,170 @@
+"""
+The comtypes and Windows only ctypes names pycaw is built on.
+
+On Windows they are comtypes, _ctypes.COMError and ctypes.wintypes.
+Elsewhere, e.g. on a Linux CI running the tests and the benchmarks against
+pycaw.simulation, stand-ins take their place: the interfaces can be
+declared but not called, and the Windows types keep their Windows sizes
+(ctypes.wintypes follows the C long of the platform, 8 bytes on Linux)
+so the structures keep their layout.
+Only the default pycaw.backend.ComBackend needs the real COM.
+"""
+
+from ctypes import (
+    Structure,
+    addressof,
+    c_int,
+    c_int32,
+    c_short,
+    c_ubyte,
+    c_uint,
+    c_uint16,
+    c_uint32,
+    c_ulonglong,
+    c_ushort,
+    c_void_p,
+    c_wchar_p,
+    memmove,
+)
+from uuid import UUID
+
+try:
+    import comtypes
+except ImportError:
+    # not on Windows, comtypes refuses to import there
+    comtypes = None
+
+if comtypes is not None:
+    from _ctypes import COMError
+    from ctypes import HRESULT
+    from ctypes.wintypes import (
+        BOOL,
+        DWORD,
+        FILETIME,
+        HANDLE,
+        INT,
+        LONG,
+        LPCWSTR,
+        LPWSTR,
+        UINT,
+        ULARGE_INTEGER,
+        ULONG,
+        VARIANT_BOOL,
+        WORD,
+    )
+
+    from comtypes import CLSCTX_ALL, COMMETHOD, GUID, COMObject, IUnknown
+    from comtypes.automation import (
+        VARTYPE,
+        VT_BLOB,
+        VT_BOOL,
+        VT_BSTR,
+        VT_CLSID,
+        VT_EMPTY,
+        VT_FILETIME,
+        VT_I1,
+        VT_I2,
+        VT_I4,
+        VT_I8,
+        VT_INT,
+        VT_LPSTR,
+        VT_LPWSTR,
+        VT_NULL,
+        VT_R4,
+        VT_R8,
+        VT_UI1,
+        VT_UI2,
+        VT_UI4,
+        VT_UI8,
+        VT_UINT,
+        VT_VECTOR,
+    )
+else:
+    HRESULT = c_int32
+    BOOL = LONG = c_int32
+    DWORD = ULONG = c_uint32
+    INT = c_int
+    UINT = c_uint
+    WORD = c_ushort
+    VARIANT_BOOL = c_short
+    ULARGE_INTEGER = c_ulonglong
+    HANDLE = c_void_p
+    LPWSTR = LPCWSTR = c_wchar_p
+
+    class FILETIME(Structure):
+        _fields_ = [("dwLowDateTime", DWORD), ("dwHighDateTime", DWORD)]
+
+    class COMError(Exception):
+        """Mimics _ctypes.COMError."""
+
+        def __init__(self, hresult, text, details):
+            super().__init__(hresult, text, details)
+            self.hresult = hresult
+            self.text = text
+            self.details = details
+
+    class GUID(Structure):
+        """Mimics comtypes.GUID: created from and printed as "{...}"."""
+
+        _fields_ = [
+            ("Data1", c_uint32),
+            ("Data2", c_uint16),
+            ("Data3", c_uint16),
+            ("Data4", c_ubyte * 8),
+        ]
+
+        def __init__(self, name=None):
+            super().__init__()
+            if name is not None:
+                memmove(addressof(self), UUID(name).bytes_le, 16)
+
+        def __str__(self):
+            return "{%s}" % str(UUID(bytes_le=bytes(self))).upper()
+
+        def __repr__(self):
+            return 'GUID("%s")' % self
+
+        def __eq__(self, other):
+            return isinstance(other, GUID) and bytes(self) == bytes(other)
+
+        def __hash__(self):
+            return hash(bytes(self))
+
+    class IUnknown(c_void_p):
+        """Declares the interfaces, their pointers can't be called."""
+
+        _iid_ = GUID("{00000000-0000-0000-C000-000000000046}")
+        _methods_ = ()
+
+    class COMObject:
+        """Base of the callbacks, handed as is to the simulated objects."""
+
+        _com_interfaces_ = ()
+
+    def COMMETHOD(idlflags, restype, name, *argspec):
+        return (idlflags, restype, name) + argspec
+
+    CLSCTX_ALL = 23
+    VARTYPE = c_ushort
+    VT_EMPTY = 0
+    VT_NULL = 1
+    VT_I2 = 2
+    VT_I4 = 3
+    VT_R4 = 4
+    VT_R8 = 5
+    VT_BSTR = 8
+    VT_BOOL = 11
+    VT_I1 = 16
+    VT_UI1 = 17
+    VT_UI2 = 18
+    VT_UI4 = 19
+    VT_I8 = 20
+    VT_UI8 = 21
+    VT_INT = 22
+    VT_UINT = 23
+    VT_LPSTR = 30
+    VT_LPWSTR = 31
+    VT_FILETIME = 64
+    VT_BLOB = 65
+    VT_CLSID = 72
+    VT_VECTOR = 0x1000
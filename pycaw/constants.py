@@ -1,11 +1,25 @@
-from enum import Enum, IntEnum
+from enum import Enum, IntEnum, IntFlag
 
-from comtypes import GUID
+from pycaw.compat import GUID
 
 IID_Empty = GUID("{00000000-0000-0000-0000-000000000000}")
 
 CLSID_MMDeviceEnumerator = GUID("{BCDE0395-E52F-467C-8E3D-C4579291692E}")
 
+# HRESULTs returned by objects of a stopped or restarted audio service
+RPC_E_DISCONNECTED = 0x80010108
+RPC_S_SERVER_UNAVAILABLE = 0x800706BA
+AUDCLNT_E_SERVICE_NOT_RUNNING = 0x88890010
+SERVICE_GONE_HRESULTS = frozenset(
+    (RPC_E_DISCONNECTED, RPC_S_SERVER_UNAVAILABLE, AUDCLNT_E_SERVICE_NOT_RUNNING)
+)
+AUDCLNT_E_UNSUPPORTED_FORMAT = 0x88890008
+AUDCLNT_E_WRONG_ENDPOINT_TYPE = 0x88890003
+AUDCLNT_S_BUFFER_EMPTY = 0x08890001
+
+# REFERENCE_TIME units (100 nanoseconds) per second
+REFTIMES_PER_SEC = 10000000
+
 
 class ERole(Enum):
     eConsole = 0
@@ -36,13 +50,52 @@ class AudioDeviceState(Enum):
     Unplugged = 0x8
 
 
+class EndpointFormFactor(Enum):
+    RemoteNetworkDevice = 0
+    Speakers = 1
+    LineLevel = 2
+    Headphones = 3
+    Microphone = 4
+    Headset = 5
+    Handset = 6
+    UnknownDigitalPassthrough = 7
+    SPDIF = 8
+    DigitalAudioDisplayDevice = 9
+    UnknownFormFactor = 10
+
+
 class STGM(Enum):
     STGM_READ = 0x00000000
 
 
 class AUDCLNT_SHAREMODE(Enum):
-    AUDCLNT_SHAREMODE_SHARED = 0x00000001
-    AUDCLNT_SHAREMODE_EXCLUSIVE = 0x00000002
+    AUDCLNT_SHAREMODE_SHARED = 0x00000000
+    AUDCLNT_SHAREMODE_EXCLUSIVE = 0x00000001
+
+
+class AUDCLNT_STREAMFLAGS(IntFlag):
+    # IAudioClient.Initialize() StreamFlags
+    CROSSPROCESS = 0x00010000
+    LOOPBACK = 0x00020000
+    EVENTCALLBACK = 0x00040000
+    NOPERSIST = 0x00080000
+    RATEADJUST = 0x00100000
+    AUTOCONVERTPCM = 0x80000000
+    SRC_DEFAULT_QUALITY = 0x08000000
+
+
+class AUDCLNT_BUFFERFLAGS(IntFlag):
+    # IAudioCaptureClient.GetBuffer() and IAudioRenderClient.ReleaseBuffer()
+    DATA_DISCONTINUITY = 0x1
+    SILENT = 0x2
+    TIMESTAMP_ERROR = 0x4
+
+
+class ENDPOINT_HARDWARE_SUPPORT(IntFlag):
+    # IAudioMeterInformation.QueryHardwareSupport() mask
+    VOLUME = 0x00000001
+    MUTE = 0x00000002
+    METER = 0x00000004
 
 
 class AudioSessionState(IntEnum):
@@ -0,0 +1,191 @@
+"""
+Runs the user callbacks off the COM notification threads, see CallbackDispatcher.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from pycaw.backend import get_backend
+
+log = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_OLDEST, BLOCK)
+
+
+class CallbackDispatcher:
+    """
+    Queues the callbacks and runs them on a pool of worker threads, so that
+    the COM notification methods return right away.
+
+    The callbacks of a same source (a session, an endpoint, a callback
+    object ...) run one at a time, in the order they were submitted,
+    different sources run in parallel.
+
+    At most maxsize callbacks are queued, when full:
+    - DROP_OLDEST (default), the oldest queued callback of the submitting
+      source is dropped, or of the source with the most queued ones
+    - BLOCK, the notifying thread waits for room (back pressure),
+      submissions from the workers themselves never wait, a submission
+      still waiting when the dispatcher gets closed raises RuntimeError
+
+        dispatcher = CallbackDispatcher(workers=2)
+        callback = MyAudioEndpointVolumeCallback(dispatcher=dispatcher)
+        ...
+        dispatcher.metrics()  # {"depth": 0, "dropped": 0, ...}
+
+    The workers are initialized for COM like the callbacks.
+    """
+
+    def __init__(self, workers=2, maxsize=1024, overflow=DROP_OLDEST):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of %s" % (OVERFLOW_POLICIES,))
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self._cond = threading.Condition()
+        # source -> deque of (func, args)
+        self._queues = {}
+        # sources with queued callbacks, none of them running
+        self._ready = deque()
+        # sources whose callback is running
+        self._running = set()
+        self._threads = []
+        self._local = threading.local()
+        self._closed = False
+        self.depth = 0
+        self.max_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "depth": self.depth,
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "sources": len(self._queues),
+                "workers": len(self._threads),
+            }
+
+    def submit(self, source, func, *args):
+        """Queues func(*args), after the queued callbacks of source."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("closed CallbackDispatcher")
+            if self.depth >= self.maxsize:
+                if self.overflow == DROP_OLDEST:
+                    self._drop_oldest(source)
+                elif not getattr(self._local, "worker", False):
+                    while self.depth >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        # closed while waiting for room
+                        raise RuntimeError("closed CallbackDispatcher")
+            queue = self._queues.get(source)
+            if queue is None:
+                queue = self._queues[source] = deque()
+            if not queue and source not in self._running:
+                self._ready.append(source)
+            queue.append((func, args))
+            self.depth += 1
+            self.submitted += 1
+            if self.depth > self.max_depth:
+                self.max_depth = self.depth
+            if len(self._threads) < self.workers:
+                self._start_worker()
+            self._cond.notify_all()
+
+    def _drop_oldest(self, source):
+        queue = self._queues.get(source)
+        if not queue:
+            source, queue = max(self._queues.items(), key=lambda item: len(item[1]))
+        queue.popleft()
+        self.depth -= 1
+        self.dropped += 1
+        if not queue and source not in self._running:
+            # no longer ready, a later submit mustn't queue it twice
+            self._ready.remove(source)
+            del self._queues[source]
+
+    def _start_worker(self):
+        thread = threading.Thread(
+            target=self._run,
+            name="CallbackDispatcher-%d" % len(self._threads),
+            daemon=True,
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _run(self):
+        self._local.worker = True
+        backend = get_backend()
+        backend.InitializeThread()
+        try:
+            while True:
+                with self._cond:
+                    while not self._ready and not self._closed:
+                        self._cond.wait()
+                    if not self._ready:
+                        # closed and drained
+                        return
+                    source = self._ready.popleft()
+                    queue = self._queues.get(source)
+                    if not queue:
+                        # emptied by drops
+                        self._queues.pop(source, None)
+                        continue
+                    func, args = queue.popleft()
+                    self.depth -= 1
+                    self._running.add(source)
+                    self._cond.notify_all()
+                failed = False
+                try:
+                    func(*args)
+                except Exception:
+                    failed = True
+                    log.exception("dispatched callback %r failed", func)
+                with self._cond:
+                    self._running.discard(source)
+                    self.completed += 1
+                    self.errors += failed
+                    if queue:
+                        self._ready.append(source)
+                    else:
+                        del self._queues[source]
+                    self._cond.notify_all()
+        finally:
+            backend.UninitializeThread()
+
+    def join(self, timeout=None):
+        """Waits until all the queued callbacks ran, False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.depth or self._running:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """Runs the queued callbacks and stops the workers."""
+        with self._cond:
+            self._closed = True
+            threads, self._threads = self._threads, []
+            self._cond.notify_all()
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join()
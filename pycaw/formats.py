@@ -0,0 +1,139 @@
+"""
+Wave formats of the endpoints and streams, see AudioFormat.
+"""
+
+from ctypes import POINTER, c_ubyte, c_void_p, cast, sizeof, string_at
+
+from pycaw.api.audioclient.depend import WAVEFORMATEX, WAVEFORMATEXTENSIBLE
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> NumPy dtype
+_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): "u1",
+    (WAVE_FORMAT_PCM, 16): "<i2",
+    (WAVE_FORMAT_PCM, 32): "<i4",
+    (WAVE_FORMAT_IEEE_FLOAT, 32): "<f4",
+    (WAVE_FORMAT_IEEE_FLOAT, 64): "<f8",
+}
+
+
+class AudioFormat:
+    """
+    Copy of a WAVEFORMATEX, including the cbSize extra bytes
+    (WAVEFORMATEXTENSIBLE), describing the frames of a stream.
+
+    Formats are compared and hashed by their bytes.
+    """
+
+    def __init__(self, raw):
+        self.raw = bytes(raw)
+        self._buffer = (c_ubyte * len(self.raw)).from_buffer_copy(self.raw)
+        self.waveformat = WAVEFORMATEX.from_buffer(self._buffer)
+
+    def __repr__(self):
+        return "<%s tag=0x%04x channels=%d rate=%d bits=%d>" % (
+            self.__class__.__name__,
+            self.format_tag,
+            self.channels,
+            self.sample_rate,
+            self.bits_per_sample,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, AudioFormat):
+            return NotImplemented
+        return self.raw == other.raw
+
+    def __hash__(self):
+        return hash(self.raw)
+
+    @classmethod
+    def from_pointer(cls, pointer):
+        """Copies the WAVEFORMATEX pointer points to, e.g. from GetMixFormat."""
+        address = cast(pointer, c_void_p).value
+        header = WAVEFORMATEX.from_address(address)
+        return cls(string_at(address, sizeof(WAVEFORMATEX) + header.cbSize))
+
+    @classmethod
+    def create(cls, channels, sample_rate, bits_per_sample=16, format_tag=None):
+        """
+        A plain WAVEFORMATEX, PCM by default or IEEE float for 64 bits,
+        e.g. to ask IsFormatSupported.
+        """
+        if format_tag is None:
+            format_tag = WAVE_FORMAT_IEEE_FLOAT
+            if bits_per_sample != 64:
+                format_tag = WAVE_FORMAT_PCM
+        block_align = channels * bits_per_sample // 8
+        waveformat = WAVEFORMATEX(
+            wFormatTag=format_tag,
+            nChannels=channels,
+            nSamplesPerSec=sample_rate,
+            nAvgBytesPerSec=sample_rate * block_align,
+            nBlockAlign=block_align,
+            wBitsPerSample=bits_per_sample,
+            cbSize=0,
+        )
+        return cls(bytes(waveformat))
+
+    @property
+    def channels(self):
+        return self.waveformat.nChannels
+
+    @property
+    def sample_rate(self):
+        return self.waveformat.nSamplesPerSec
+
+    @property
+    def bits_per_sample(self):
+        """Container size of the samples, see valid_bits_per_sample"""
+        return self.waveformat.wBitsPerSample
+
+    @property
+    def block_align(self):
+        """Bytes per frame"""
+        return self.waveformat.nBlockAlign
+
+    @property
+    def extensible(self):
+        """The WAVEFORMATEXTENSIBLE, None for a plain WAVEFORMATEX"""
+        if self.waveformat.wFormatTag != WAVE_FORMAT_EXTENSIBLE:
+            return None
+        if len(self.raw) < sizeof(WAVEFORMATEXTENSIBLE):
+            return None
+        return WAVEFORMATEXTENSIBLE.from_buffer(self._buffer)
+
+    @property
+    def format_tag(self):
+        """wFormatTag, the one of the SubFormat for WAVE_FORMAT_EXTENSIBLE"""
+        extensible = self.extensible
+        if extensible is None:
+            return self.waveformat.wFormatTag
+        # KSDATAFORMAT_SUBTYPE_xxx GUIDs start with the format tag
+        return extensible.SubFormat.Data1 & 0xFFFF
+
+    @property
+    def valid_bits_per_sample(self):
+        """Bits of precision of the samples, e.g. 24 in 32 bits containers"""
+        extensible = self.extensible
+        if extensible is None:
+            return self.bits_per_sample
+        return extensible.Samples.wValidBitsPerSample
+
+    @property
+    def channel_mask(self):
+        """Speaker positions of the channels (SPEAKER_xxx), 0 if unspecified"""
+        extensible = self.extensible
+        return 0 if extensible is None else extensible.dwChannelMask
+
+    @property
+    def dtype(self):
+        """NumPy dtype of the samples, None if NumPy has none (e.g. 24 bits)"""
+        return _DTYPES.get((self.format_tag, self.bits_per_sample))
+
+    def pointer(self):
+        """POINTER(WAVEFORMATEX) to this format, e.g. for IAudioClient.Initialize"""
+        return cast(self._buffer, POINTER(WAVEFORMATEX))
@@ -0,0 +1,184 @@
+"""
+Opt-in instrumentation of the COM callback entry points:
+
+    pycaw.instrument.enable()
+    ...
+    pycaw.stats()
+
+counts the events per type ("IAudioSessionEvents.OnSimpleVolumeChanged" ...)
+and per session, with histograms of the time spent in pycaw and in the user
+callbacks. Disabled (the default), an entry point only checks a flag.
+User code called outside of any event (e.g. the MagicApp session_callback
+when the MagicApp is created) is counted under DIRECT.
+"""
+
+import functools
+import threading
+import time
+
+# event of the user code called outside of the COM callbacks
+DIRECT = "direct"
+
+enabled = False
+
+_local = threading.local()
+_lock = threading.Lock()
+# event -> [count, pycaw Histogram, user Histogram]
+_events = {}
+# session -> {event: count}
+_sessions = {}
+
+
+class Histogram:
+    """
+    Histogram of durations, bucket i counts those under 2**i microseconds,
+    the last one the longer ones.
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    BUCKETS = 24
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        index = int(seconds * 1e6).bit_length()
+        self.buckets[min(index, self.BUCKETS - 1)] += 1
+
+    def snapshot(self):
+        """count, total, mean and max in seconds, buckets upper bound (us) -> count"""
+        last = self.BUCKETS - 1
+        buckets = {}
+        for index, count in enumerate(self.buckets):
+            if count:
+                buckets[float("inf") if index == last else 2**index] = count
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _sessions.clear()
+
+
+def stats():
+    """Snapshot of the counters and histograms, plain dicts."""
+    with _lock:
+        return {
+            "enabled": enabled,
+            "events": {
+                event: {
+                    "count": count,
+                    "pycaw": pycaw_time.snapshot(),
+                    "user": user_time.snapshot(),
+                }
+                for event, (count, pycaw_time, user_time) in _events.items()
+            },
+            "sessions": {
+                session: dict(counts) for session, counts in _sessions.items()
+            },
+        }
+
+
+def _entry(event):
+    # under _lock
+    entry = _events.get(event)
+    if entry is None:
+        entry = _events[event] = [0, Histogram(), Histogram()]
+    return entry
+
+
+def instrumented(event):
+    """
+    Decorator of the COM callback entry points, the session of the event
+    is the stats_session attribute of the callback object, if any.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            if not enabled:
+                return method(self, *args)
+            previous = getattr(_local, "event", None), getattr(_local, "user", 0.0)
+            _local.event, _local.user = event, 0.0
+            start = time.perf_counter()
+            try:
+                return method(self, *args)
+            finally:
+                elapsed = time.perf_counter() - start
+                user = _local.user
+                _local.event, _local.user = previous
+                session = getattr(self, "stats_session", None)
+                with _lock:
+                    entry = _entry(event)
+                    entry[0] += 1
+                    entry[1].add(elapsed - user)
+                    if session is not None:
+                        counts = _sessions.setdefault(session, {})
+                        counts[event] = counts.get(event, 0) + 1
+
+        return wrapper
+
+    return decorator
+
+
+def user_code(func):
+    """func, timed as user code of the current event when enabled."""
+    if not enabled:
+        return func
+    return functools.partial(_run_user_code, func)
+
+
+def _run_user_code(func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        _local.user = getattr(_local, "user", 0.0) + elapsed
+        event = getattr(_local, "event", None) or DIRECT
+        with _lock:
+            _entry(event)[2].add(elapsed)
+
+
+def in_event(func):
+    """
+    func, running in the current event when enabled, for the callbacks
+    deferred to another thread (dispatcher, coalescer).
+    """
+    if not enabled:
+        return func
+    return functools.partial(_run_in_event, getattr(_local, "event", None), func)
+
+
+def _run_in_event(event, func, *args):
+    previous = getattr(_local, "event", None), getattr(_local, "user", 0.0)
+    _local.event, _local.user = event, 0.0
+    try:
+        return func(*args)
+    finally:
+        _local.event, _local.user = previous
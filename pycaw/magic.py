@@ -32,19 +32,18 @@ isort:skip_file
 """
 
 import atexit
+import functools
 import logging
 import sys
+import threading
+import time
 import warnings
 
 # ____ COM WITH MULTITHREADED APARTMENT ____
 sys.coinit_flags = 0  # noqa: E402
 
 # flake8: noqa: E402
-import psutil
-
 from ctypes import pointer
-from _ctypes import COMError
-from comtypes import GUID, COMObject
 
 from pycaw.api.audioclient import ISimpleAudioVolume
 from pycaw.api.audiopolicy import (
@@ -52,7 +51,15 @@ from pycaw.api.audiopolicy import (
     IAudioSessionEvents,
     IAudioSessionNotification,
 )
-from pycaw.constants import AudioSessionState
+from pycaw.api.mmdeviceapi import IMMEndpoint
+from pycaw.callbacks import MMNotificationClient
+from pycaw.coalesce import Coalescer, copy_event_context
+from pycaw.compat import GUID, COMError, COMObject
+from pycaw.constants import DEVICE_STATE, AudioSessionState, EDataFlow
+from pycaw.dispatch import DROP_OLDEST, CallbackDispatcher
+from pycaw.instrument import Histogram, in_event, instrumented, user_code
+from pycaw.matchers import Pattern, SessionMatcher, SessionProcess
+from pycaw.processes import get_process_name_cache
 from pycaw.utils import AudioUtilities
 
 log = logging.getLogger(__name__)
@@ -60,8 +67,20 @@ log = logging.getLogger(__name__)
 
 __all__ = ("MagicManager", "MagicApp", "MagicSession")
 
+# highest state first, see MagicApp.state
+_STATES_DESCENDING = tuple(sorted(AudioSessionState, reverse=True))
+# changer of the aggregate changes caused by sessions coming and going
+_NO_CHANGER = pointer(GUID())
+# see AudioSessionEvents.AudioSessionDisconnectReason
+_DISCONNECT_REASON_SERVER_SHUTDOWN = 1
+# DeviceRemoval, ServerShutdown and FormatChanged disconnect all the
+# sessions of the endpoint, the other reasons only one session
+_ENDPOINT_DISCONNECT_REASONS = (0, _DISCONNECT_REASON_SERVER_SHUTDOWN, 2)
+# the endpoint of the sessions disconnected by an audio service restart
+_ALL_ENDPOINTS = object()
+
 
-class MagicManager(COMObject):
+class MagicManager:
     """
     The 'MagicManager' handles the magic.
 
@@ -80,6 +99,10 @@ class MagicManager(COMObject):
             MagicApp({"firefox.exe", "vlc.exe"})
         When an app name has multiple audio sessions,
         they will be automatically 'merged'
+        Multiple MagicApps can control the same sessions, each one gets
+        the callbacks.
+        Besides exact names, app_execs can hold pycaw.matchers patterns:
+            MagicApp({"firefox.exe", Glob("chrome*.exe"), Parent("steam.exe")})
 
         Note that when using MagicApp in multi session mode, that getting the
         volume will result in getting the volume of the loudest session.
@@ -91,10 +114,34 @@ class MagicManager(COMObject):
     -   unregister all (still active) sessions from callback at shutdown
 
     -   OnSessionCreated is fired by Windows everytime a new session registers
+
+    -   watches the sessions of every active render endpoint (speakers,
+        headsets, HDMI, virtual cables ...), and of the capture endpoints
+        too if 'capture' is set before the activation. Endpoints get
+        watched or dropped as they are added, removed, enabled or disabled.
+
+    -   rebinds the sessions when they get disconnected (device removed,
+        format changed, audio service restarted ...): those of the
+        endpoint are torn down at once and it's enumerated again, the
+        MagicApps get the new sessions. See reconnect_stats().
+
+    -   optionally coalesces the volume and mute callbacks storms,
+        see enable_coalescing()
+
+    -   optionally runs the callbacks off the COM notification threads,
+        see enable_dispatcher()
     """
 
-    _com_interfaces_ = (IAudioSessionNotification,)
     magic_activated = False
+    # also watch the capture endpoints, set before the activation
+    capture = False
+    # reconnections to a restarted audio service, seconds in between
+    reconnect_attempts = 20
+    reconnect_delay = 0.5
+    # pycaw.coalesce.Coalescer of the volume and mute callbacks, if enabled
+    coalescer = None
+    # pycaw.dispatch.CallbackDispatcher of the callbacks, if enabled
+    dispatcher = None
 
     @classmethod
     def str(cls):
@@ -141,11 +188,37 @@ class MagicManager(COMObject):
         # dict with idd -> magic_root_session -> _MagicRootSession
         cls.magic_root_sessions = {}
         cls.expired_magic_root_sessions = set()
+        # device_id -> _MagicEndpoint, the watched endpoints
+        cls.endpoints = {}
+        # device_id -> {iid} of the active magic_root_sessions
+        cls.iids_by_device = {}
+        # session instance identifier -> iid of the active
+        # magic_root_sessions, a session both notified and enumerated
+        # while its endpoint is opened is only added once
+        cls.iid_by_instance = {}
+        # endpoints being torn down and enumerated again,
+        # _ALL_ENDPOINTS when the audio service restarted
+        cls._rebinding = set()
+        cls._rebinding_lock = threading.Lock()
+        # threading.Timer of the next reconnection attempt, if any
+        cls._reconnect_timer = None
+        # time from a device or disconnection notification to the
+        # sessions of the endpoint being enumerated again, per endpoint
+        cls.reconnect_latency = Histogram()
         # pycaw internal instance identifier
         cls.iid_count = 0
+        # guards iid_count, magic_root_sessions and the iids indexes,
+        # sessions come and go on the COM threads and the endpoint worker
+        cls._sessions_lock = threading.RLock()
 
         # set of MagicApp instances
         cls.magic_apps = set()
+        # app_exec -> [MagicApp] which get the sessions of app_exec
+        cls.magic_apps_by_exec = {}
+        # app_exec -> {iid} of the active magic_root_sessions
+        cls.iids_by_exec = {}
+        # pycaw.matchers patterns of the MagicApps
+        cls.session_matcher = SessionMatcher()
 
         # if registered via MagicManager.magic_session()
         # will hold the MagicSession and additional args + kwargs
@@ -155,54 +228,283 @@ class MagicManager(COMObject):
         cls.magic_sessions = {}
 
         try:
-            cls._mgr = AudioUtilities.GetAudioSessionManager()
-            log.debug("<MagicManager/> got manager")
+            cls._watch_endpoints()
         except COMError:
+            log.exception("<MagicManager/> cannot watch the endpoints")
+        if not cls.endpoints:
+            cls._unwatch_endpoints()
+            cls._release_sessions()
             cls.magic_activated = False
             warn = "<MagicManager/> No speaker connected"
             log.warning(warn)
             raise ValueError(warn)
 
-        # RegisterSessionNotification needs an instance not a class
-        cls._callback_magic_manager = cls()
-        cls._mgr.RegisterSessionNotification(cls._callback_magic_manager)
+        # register clean up mechanism, when script is closed.
+        atexit.register(cls.clean_up)
+
+        log.info(cls.str())
+
+    @classmethod
+    def reconnect_stats(cls):
+        """
+        Snapshot of reconnect_latency: count, total, mean and max in
+        seconds, buckets, see pycaw.instrument.Histogram.snapshot()
+        """
+        return cls.reconnect_latency.snapshot()
+
+    @classmethod
+    def _flows(cls):
+        if cls.capture:
+            return (EDataFlow.eRender.value, EDataFlow.eCapture.value)
+        return (EDataFlow.eRender.value,)
+
+    @classmethod
+    def _watch_endpoints(cls):
+        # the device notifications are handled on a worker:
+        # IMMNotificationClient methods must not call the enumerator,
+        # and unregistering from a session notification isn't allowed
+        cls._endpoint_dispatcher = CallbackDispatcher(workers=1)
+        cls._device_notification = _MagicDeviceNotification(cls)
+        cls._register_endpoints()
+
+    @classmethod
+    def _register_endpoints(cls, since=None):
+        # the device notifications come first, not to miss a device
+        # plugged in while enumerating
+        cls._enumerator = AudioUtilities.GetDeviceEnumerator()
+        cls._enumerator.RegisterEndpointNotificationCallback(cls._device_notification)
+        for flow in cls._flows():
+            collection = cls._enumerator.EnumAudioEndpoints(
+                flow, DEVICE_STATE.ACTIVE.value
+            )
+            for i in range(collection.GetCount()):
+                cls._open_endpoint(collection.Item(i), since)
+
+    @classmethod
+    def _unregister_endpoints(cls):
+        try:
+            cls._enumerator.UnregisterEndpointNotificationCallback(
+                cls._device_notification
+            )
+        except COMError:
+            # e.g. the audio service restarted
+            pass
+        cls._enumerator = None
+
+    @classmethod
+    def _unwatch_endpoints(cls):
+        timer = getattr(cls, "_reconnect_timer", None)
+        if timer is not None:
+            timer.cancel()
+            cls._reconnect_timer = None
+        dispatcher = getattr(cls, "_endpoint_dispatcher", None)
+        if dispatcher is not None:
+            # runs the device changes received so far
+            dispatcher.close()
+            cls._endpoint_dispatcher = None
+        if getattr(cls, "_enumerator", None) is not None:
+            cls._unregister_endpoints()
+        while cls.endpoints:
+            _, endpoint = cls.endpoints.popitem()
+            endpoint.unregister_notification()
+
+    @classmethod
+    def _schedule(cls, func, *args):
+        """
+        Runs func(*args, since) on the endpoint worker, args are e.g. a
+        device_id or an iid, since is the time.perf_counter() of the
+        notification, see reconnect_latency.
+        """
+        dispatcher = getattr(cls, "_endpoint_dispatcher", None)
+        if dispatcher is None:
+            return
+        try:
+            dispatcher.submit(cls, func, *args, time.perf_counter())
+        except RuntimeError:
+            # closed meanwhile, by unregister_all()
+            pass
+
+    @classmethod
+    def _open_endpoint(cls, dev, since=None):
+        """Watches the sessions of the IMMDevice dev."""
+        device_id = dev.GetId()
+        if device_id in cls.endpoints:
+            return
+        endpoint = _MagicEndpoint(cls, device_id, AudioUtilities.GetSessionManager(dev))
+        cls.endpoints[device_id] = endpoint
+        endpoint.register_notification()
         # has to get called -
         # to make IAudioSessionNotification::OnSessionCreated working
-        sessionEnumerator = cls._mgr.GetSessionEnumerator()
+        sessionEnumerator = endpoint.mgr.GetSessionEnumerator()
 
-        log.debug("<MagicManager/> registered and activated session notification")
+        log.debug(f"<MagicManager/> watching endpoint {device_id}")
 
         # Scan for running session and add them to session_manager
 
         # get all active sessions
         count = sessionEnumerator.GetCount()
-        log.info(f"{count} sessions already active")
-
-        # add sessions to session_manager
-        log.debug("adding sessions manually")
+        log.info(f"{count} sessions already active on {device_id}")
 
+        # one sweep over the processes rather than one lookup per session
+        get_process_name_cache().prefetch(count)
         for i in range(count):
             ctl = sessionEnumerator.GetSession(i)
-            cls.OnSessionCreated(ctl)
+            cls.OnSessionCreated(ctl, device_id)
 
-        # register clean up mechanism, when script is closed.
-        atexit.register(cls.clean_up)
+        if since is not None:
+            cls.reconnect_latency.add(time.perf_counter() - since)
 
-        log.info(cls.str())
+    @classmethod
+    def _close_endpoint(cls, device_id, since=None):
+        """Drops the endpoint device_id and its sessions."""
+        endpoint = cls.endpoints.pop(device_id, None)
+        if endpoint is None:
+            return
+        endpoint.unregister_notification()
+        log.debug(f"<MagicManager/> dropped endpoint {device_id}")
+        for iid in list(cls.iids_by_device.get(device_id, ())):
+            cls.remove_session(iid)
+
+    @classmethod
+    def _update_endpoint(cls, device_id, since=None):
+        # a device was added, its state changed or it became the default
+        if not cls.magic_activated:
+            return
+        try:
+            dev = AudioUtilities._CallDeviceEnumerator("GetDevice", device_id)
+            flow = dev.QueryInterface(IMMEndpoint).GetDataFlow()
+            active = dev.GetState() == DEVICE_STATE.ACTIVE.value
+        except COMError:
+            # gone meanwhile
+            active = False
+        if active and flow in cls._flows():
+            cls._open_endpoint(dev, since)
+        else:
+            cls._close_endpoint(device_id)
+
+    @classmethod
+    def _session_disconnected(cls, magic_root_session, disconnect_reason_id):
+        if magic_root_session.iid not in cls.magic_root_sessions:
+            # torn down already
+            return
+        if disconnect_reason_id not in _ENDPOINT_DISCONNECT_REASONS:
+            # e.g. an exclusive mode stream took over, only this session
+            cls._schedule(cls._drop_session, magic_root_session.iid)
+            return
+        if disconnect_reason_id == _DISCONNECT_REASON_SERVER_SHUTDOWN:
+            device_id = _ALL_ENDPOINTS
+        else:
+            device_id = magic_root_session.device_id
+        # all the sessions of the endpoint get disconnected, on several
+        # COM threads, the first one schedules the teardown of all of them
+        with cls._rebinding_lock:
+            if device_id in cls._rebinding:
+                return
+            cls._rebinding.add(device_id)
+        cls._schedule(cls._rebind, device_id)
+
+    @classmethod
+    def _session_created(cls, ctl, device_id, since):
+        # the endpoint might have been dropped since the notification,
+        # and the session expired, it wouldn't be notified anymore
+        if not cls.magic_activated or device_id not in cls.endpoints:
+            return
+        if ctl.GetState() == AudioSessionState.Expired.value:
+            return
+        cls.OnSessionCreated(ctl, device_id)
+
+    @classmethod
+    def _drop_session(cls, iid, since):
+        if cls.magic_activated and iid in cls.magic_root_sessions:
+            cls.remove_session(iid)
+
+    @classmethod
+    def _rebind(cls, device_id, since):
+        """
+        Tears down the sessions of the endpoint device_id and enumerates
+        it again, if still active. All of them when the audio service
+        restarted (_ALL_ENDPOINTS).
+        """
+        try:
+            if not cls.magic_activated:
+                return
+            if device_id is _ALL_ENDPOINTS:
+                cls._close_endpoints()
+                cls._unregister_endpoints()
+                cls._reconnect(since)
+                return
+            cls._close_endpoint(device_id)
+            cls._update_endpoint(device_id, since)
+        finally:
+            with cls._rebinding_lock:
+                cls._rebinding.discard(device_id)
+
+    @classmethod
+    def _reconnect(cls, since, attempt=0):
+        # the audio service restarted, the endpoints and the enumerator
+        # are gone, the new service might not be up yet
+        cls._reconnect_timer = None
+        AudioUtilities.InvalidateDeviceEnumerator()
+        try:
+            cls._register_endpoints(since)
+            return
+        except COMError:
+            log.warning(f"<MagicManager/> reconnection attempt {attempt} failed")
+            if cls._enumerator is not None:
+                cls._unregister_endpoints()
+            cls._close_endpoints()
+        if attempt + 1 >= cls.reconnect_attempts:
+            log.error("<MagicManager/> could not reconnect to the audio service")
+            return
+        # retried later, not to hold the endpoint worker in between
+        cls._reconnect_timer = threading.Timer(
+            cls.reconnect_delay, cls._schedule, (cls._retry_reconnect, since, attempt)
+        )
+        cls._reconnect_timer.daemon = True
+        cls._reconnect_timer.start()
 
     @classmethod
-    def OnSessionCreated(cls, ctl):
+    def _retry_reconnect(cls, since, attempt, retried):
+        # since is the time of the disconnection, for reconnect_latency
+        if cls.magic_activated and cls._enumerator is None:
+            cls._reconnect(since, attempt + 1)
+
+    @classmethod
+    def _close_endpoints(cls):
+        # a failing endpoint doesn't keep the others
+        for device_id in list(cls.endpoints):
+            try:
+                cls._close_endpoint(device_id)
+            except COMError:
+                log.exception(f"<MagicManager/> cannot drop endpoint {device_id}")
+
+    @classmethod
+    @instrumented("IAudioSessionNotification.OnSessionCreated")
+    def OnSessionCreated(cls, ctl, device_id=None):
         """Is fired, when a new audio session is created/found."""
         log.debug(":: new session")
 
         # create a pycaw internal instance identifier
-        iid = cls.iid_count
-        cls.iid_count += 1
+        with cls._sessions_lock:
+            iid = cls.iid_count
+            cls.iid_count += 1
 
         # create a new magic_root_session
-        magic_root_session = _MagicRootSession(ctl, iid, cls)
-
-        cls.magic_root_sessions[iid] = magic_root_session
+        magic_root_session = _MagicRootSession(ctl, iid, cls, device_id)
+
+        with cls._sessions_lock:
+            instance = magic_root_session.instance_identifier
+            duplicate = instance in cls.iid_by_instance
+            if not duplicate:
+                cls.iid_by_instance[instance] = iid
+                cls.magic_root_sessions[iid] = magic_root_session
+                cls.iids_by_exec.setdefault(magic_root_session.app_exec, set()).add(iid)
+                cls.iids_by_device.setdefault(device_id, set()).add(iid)
+        if duplicate:
+            # notified while its endpoint was enumerated
+            log.debug(f":: already watching {magic_root_session}")
+            magic_root_session.unregister_notification()
+            return
 
         if cls.magic_apps:
             # add exe to matching magic app
@@ -218,6 +520,44 @@ class MagicManager(COMObject):
 
         log.info(cls.str())
 
+    @classmethod
+    def enable_coalescing(cls, window=0.05):
+        """
+        Opt-in, merges the volume and mute callbacks of each session that
+        come within window seconds into the first and the latest ones,
+        see pycaw.coalesce.Coalescer. Returns the Coalescer (for its counters).
+        The getters are always up to date, only the callbacks are merged.
+        """
+        cls.disable_coalescing()
+        cls.coalescer = Coalescer(window)
+        return cls.coalescer
+
+    @classmethod
+    def disable_coalescing(cls):
+        """Delivers the pending callbacks and stops coalescing."""
+        coalescer, cls.coalescer = cls.coalescer, None
+        if coalescer is not None:
+            coalescer.close()
+
+    @classmethod
+    def enable_dispatcher(cls, workers=2, maxsize=1024, overflow=DROP_OLDEST):
+        """
+        Opt-in, runs the volume, mute, state and session callbacks on a
+        pool of workers, in order for each session,
+        see pycaw.dispatch.CallbackDispatcher. Returns the dispatcher
+        (for its metrics).
+        """
+        cls.disable_dispatcher()
+        cls.dispatcher = CallbackDispatcher(workers, maxsize, overflow)
+        return cls.dispatcher
+
+    @classmethod
+    def disable_dispatcher(cls):
+        """Runs the queued callbacks and stops the workers."""
+        dispatcher, cls.dispatcher = cls.dispatcher, None
+        if dispatcher is not None:
+            dispatcher.close()
+
     @classmethod
     def magic_session(cls, MagicSessionClass, *args, **kwargs):
         """
@@ -249,40 +589,58 @@ class MagicManager(COMObject):
             cls.activate_magic()
         log.info(f"searching matching active sessions for: {magic_app}")
         for app_exec in app_execs:
-            for iid, magic_root_session in cls.magic_root_sessions.items():
-                # and not magic_root_session.magic_app
-                # will prohibit multiple magic_apps to use the same
-                # magic_root_session
-                if (
-                    magic_root_session.app_exec == app_exec
-                    and not magic_root_session.magic_app
-                ):
-                    log.info(f"{magic_root_session} matched {magic_app}.")
-                    magic_app.add_magic_root_session(iid, magic_root_session)
+            if isinstance(app_exec, Pattern):
+                cls._add_pattern(magic_app, app_exec)
+                continue
+            cls.magic_apps_by_exec.setdefault(app_exec, []).append(magic_app)
+            # a snapshot, as add_magic_root_session can run callbacks
+            with cls._sessions_lock:
+                matching = [
+                    (iid, cls.magic_root_sessions[iid])
+                    for iid in cls.iids_by_exec.get(app_exec, ())
+                ]
+            for iid, magic_root_session in matching:
+                log.info(f"{magic_root_session} matched {magic_app}.")
+                magic_app.add_magic_root_session(iid, magic_root_session)
 
         # keep reference to magic_app to check later
         # if new session should be added to this magic_app
         cls.magic_apps.add(magic_app)
         log.info(f"{magic_app} added to watchlist. {cls.str()}")
 
+    @classmethod
+    def _add_pattern(cls, magic_app, pattern):
+        cls.session_matcher.add(pattern, magic_app)
+        # list() as add_magic_root_session can run callbacks
+        for iid, magic_root_session in list(cls.magic_root_sessions.items()):
+            if pattern.matches(magic_root_session.process):
+                log.info(f"{magic_root_session} matched {magic_app}.")
+                magic_app.add_magic_root_session(iid, magic_root_session)
+
     @classmethod
     def _match_sess_to_mapp(cls, magic_root_session, iid):
         log.info(f"searching matching magic_app for: {magic_root_session}")
-        new_app_exec = magic_root_session.app_exec
-        for magic_app in cls.magic_apps:
-            for app_exec in magic_app.app_execs:
-                if app_exec == new_app_exec:
-                    log.info(f"Match {magic_root_session} " f"{magic_app}")
-                    magic_app.add_magic_root_session(iid, magic_root_session)
-                    # return will prohibit multiple magic_apps
-                    # to use the same magic_root_session
-                    return
+        magic_apps = cls.magic_apps_by_exec.get(magic_root_session.app_exec, ())
+        if cls.session_matcher:
+            # the patterns, in one go
+            magic_apps = list(magic_apps)
+            magic_apps += cls.session_matcher.match(magic_root_session.process)
+        for magic_app in magic_apps:
+            log.info(f"Match {magic_root_session} " f"{magic_app}")
+            magic_app.add_magic_root_session(iid, magic_root_session)
 
     @classmethod
     def remove_session(cls, iid, magic_app=None):
-        """magic_root_session will get removed because it is expired"""
-        # pop(iid, None) must not be necessary
-        magic_root_session = cls.magic_root_sessions.pop(iid)
+        """
+        magic_root_session will get removed because it is expired,
+        from all its MagicApps (magic_app is ignored, kept for compatibility)
+        """
+        # an Expired state change can race the teardown of its endpoint
+        with cls._sessions_lock:
+            magic_root_session = cls.magic_root_sessions.pop(iid, None)
+            if magic_root_session is None:
+                return
+            cls._unindex(magic_root_session)
 
         log.info(f":: removed {magic_root_session}")
 
@@ -293,27 +651,37 @@ class MagicManager(COMObject):
         # (magic_root_session -> _MagicRootSession -> IAudioSessionEvents)
         magic_root_session.unregister_notification()
 
-        # delete iid also from magic_app or magic_session
+        # delete iid also from the magic_apps and magic_sessions
         if cls.MagicSessionConfigured:
             # pop session from magic sessions dict
-            del_magic_sessions = cls.magic_sessions.pop(iid)
+            cls.magic_sessions.pop(iid, None)
 
-            # remove circular references
-            magic_root_session.magic_session = None
-            del_magic_sessions.magic_root_session = None
+        # remove circular references
+        for magic_session in magic_root_session.magic_sessions:
+            magic_session.magic_root_session = None
 
-        # try to remove session from the magic_app dict which is in possession
-        if magic_app:
+        for magic_app in magic_root_session.magic_apps:
             # pop(iid, None) must not be necessary
-            magic_app.magic_root_sessions.pop(iid)
-
-            # remove circular references
-            magic_root_session.magic_app = None
-
+            magic_app.remove_magic_root_session(iid)
             log.info(f":: :: removed {magic_root_session} from {magic_app}")
 
+        magic_root_session.unsubscribe_all()
+
         log.info(cls.str())
 
+    @classmethod
+    def _unindex(cls, magic_root_session):
+        cls.iid_by_instance.pop(magic_root_session.instance_identifier, None)
+        for index, key in (
+            (cls.iids_by_exec, magic_root_session.app_exec),
+            (cls.iids_by_device, magic_root_session.device_id),
+        ):
+            iids = index.get(key)
+            if iids is not None:
+                iids.discard(magic_root_session.iid)
+                if not iids:
+                    del index[key]
+
     @classmethod
     def empty_trash(cls):
         while cls.expired_magic_root_sessions:
@@ -329,34 +697,48 @@ class MagicManager(COMObject):
 
     @classmethod
     def clean_up(cls):
+        if not cls.magic_activated:
+            # e.g. unregister_all() was called already
+            return
         log.info(":: reverse spell")
-        cls._mgr.UnregisterSessionNotification(cls._callback_magic_manager)
-        log.info(f":: :: unregistered {cls.str()}")
         cls.unregister_all()
 
     @classmethod
-    def unregister_all(cls):
-        # since cls.magic_root_sessions can always change (multithreading)
-        # instead of a for loop I present you the while loop:
-        # while cls.magic_root_sessions contains any items,
-        # they get popped and unregistered
+    def _release_sessions(cls):
         log.debug(f"unregister {len(cls.magic_root_sessions)} sessions.")
         while cls.magic_root_sessions:
             # ________ REMOVES 1 ITEM FROM LIST ________
 
-            _, session = cls.magic_root_sessions.popitem()
+            with cls._sessions_lock:
+                _, session = cls.magic_root_sessions.popitem()
+                cls._unindex(session)
             session.unregister_notification()
             log.info(f":: :: :: unregistered {session}")
 
+    @classmethod
+    def unregister_all(cls):
+        # since cls.magic_root_sessions can always change (multithreading)
+        # instead of a for loop I present you the while loop:
+        # while cls.magic_root_sessions contains any items,
+        # they get popped and unregistered
+        cls._unwatch_endpoints()
+        log.info(f":: :: unregistered the endpoints {cls.str()}")
+        cls._release_sessions()
+
         # XXX remove old session:
         # this is the only place where it works,
         # since it is user controlled and not
         # in a windows COM callback.
         cls.empty_trash()
 
+        cls.disable_coalescing()
+        cls.disable_dispatcher()
+
         log.info(f"Bye {cls.str()}")
 
         del cls.magic_apps
+        del cls.magic_apps_by_exec
+        del cls.session_matcher
         del cls.magic_sessions
 
         cls.magic_activated = None
@@ -397,9 +779,15 @@ class _MagicAudioControl:
     # handle incorrect input or raise exception.
     # also handle failing com calls
     # (failing in terms of the retrieved value is not 'S_OK')
-    #   it will happen, when the speaker is gets disconnected!
-    #   can be also fixed by implementing OnSessionDisconnected
-    #   since OnSessionDisconnected will notify if the Speaker is unplugged.
+    #   it can still happen, when the speaker gets disconnected,
+    #   until the MagicManager rebinds the sessions (OnSessionDisconnected)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in _MagicRootSession.CALLBACKS or name == "aggregate_callbacks":
+            # the magic_root_sessions precompute the callbacks
+            for magic_root_session in self._subscribed_root_sessions():
+                magic_root_session.update_subscribers()
 
     def toggle_mute(self):
         new_mute = not self.mute
@@ -421,6 +809,15 @@ class MagicApp(_MagicAudioControl):
     When instantiated with at least one app_execs name,
     will be able to get/ set volume etc, also if the
     session is created after initialize.
+
+    The volume, mute and state of the sessions are aggregated as they
+    change (loudest volume, any muted, highest state), reading them
+    doesn't go through the sessions.
+
+    With aggregate_callbacks=True, the volume, mute and state callbacks
+    get the aggregated values, only when they change, rather than the
+    values of every session. Sessions coming and going count as changes,
+    the changer is then the null GUID.
     """
 
     guid = pointer(GUID("{E0BD1A40-9624-44FC-A607-2ED4F00B1CC4}"))
@@ -434,9 +831,10 @@ class MagicApp(_MagicAudioControl):
         advanced_mute_callback=None,
         state_callback=None,
         session_callback=None,
+        aggregate_callbacks=False,
     ):
         # normalize app_execs
-        if type(app_execs) == str:
+        if isinstance(app_execs, (str, Pattern)):
             # if string directly to set: {'a', 'b', 'c'}
             app_execs = (app_execs,)
         self.app_execs = set(app_execs)
@@ -444,6 +842,18 @@ class MagicApp(_MagicAudioControl):
         # latest dict of matching sessions
         self.magic_root_sessions = {}
 
+        self.aggregate_callbacks = aggregate_callbacks
+
+        # aggregate of the sessions, updated by their events,
+        # which come from several COM threads
+        self._lock = threading.Lock()
+        # iid -> [state, mute, volume] of the sessions, as counted
+        self._counted = {}
+        # number of sessions per AudioSessionState
+        self._states = [0] * len(AudioSessionState)
+        self._muted = 0
+        self._volume = None
+
         # callbacks
         self.volume_callback = volume_callback
         self.mute_callback = mute_callback
@@ -456,18 +866,127 @@ class MagicApp(_MagicAudioControl):
         log.info(str(self))
         MagicManager.add_magic_app(self, app_execs)
 
+    def _subscribed_root_sessions(self):
+        return list(getattr(self, "magic_root_sessions", {}).values())
+
     def add_magic_root_session(self, iid, magic_root_session):
         """called by MagicManager, when a new matching session is found"""
-        self.magic_root_sessions[iid] = magic_root_session
+        if iid in self.magic_root_sessions:
+            return
         # tells the magic_root_session to create a connection
         # for callbacks.
         magic_root_session.use_magic_app(self)
 
+        with self._lock:
+            if iid in self.magic_root_sessions:
+                return
+            before = self._aggregate()
+            self.magic_root_sessions[iid] = magic_root_session
+            # its values from now on, the events before are left out
+            state = magic_root_session.state
+            mute = bool(magic_root_session.mute)
+            volume = magic_root_session.volume
+            self._counted[iid] = [state, mute, volume]
+            self._states[state] += 1
+            self._muted += mute
+            if self._volume is None or volume > self._volume:
+                self._volume = volume
+            after = self._aggregate()
+        self._aggregate_after(before, after, magic_root_session, _NO_CHANGER)
+
         log.info(f"Added {magic_root_session} to {self}.")
 
         # session callback is implemented here:
         if self.session_callback:
-            self.session_callback(magic_root_session)
+            magic_root_session._run_callback(
+                user_code(self.session_callback), magic_root_session
+            )
+
+    def remove_magic_root_session(self, iid):
+        """called by MagicManager, when a session expired"""
+        with self._lock:
+            before = self._aggregate()
+            magic_root_session = self.magic_root_sessions.pop(iid)
+            state, mute, volume = self._counted.pop(iid)
+            self._states[state] -= 1
+            self._muted -= mute
+            if volume == self._volume:
+                self._update_volume()
+            after = self._aggregate()
+        self._aggregate_after(before, after, magic_root_session, _NO_CHANGER)
+        return magic_root_session
+
+    def _update_volume(self):
+        # under _lock, only when the loudest session got quieter or left
+        volume = None
+        for _, _, session_volume in self._counted.values():
+            if volume is None or session_volume > volume:
+                volume = session_volume
+        self._volume = volume
+
+    def _volume_changed(self, new, magic_root_session, event_context):
+        with self._lock:
+            counted = self._counted.get(magic_root_session.iid)
+            if counted is None:
+                # not added yet, or gone
+                return
+            before = self._aggregate()
+            old, counted[2] = counted[2], new
+            if new >= self._volume:
+                self._volume = new
+            elif old == self._volume:
+                self._update_volume()
+            after = self._aggregate()
+        self._aggregate_after(before, after, magic_root_session, event_context)
+
+    def _mute_changed(self, new, magic_root_session, event_context):
+        with self._lock:
+            counted = self._counted.get(magic_root_session.iid)
+            if counted is None:
+                return
+            before = self._aggregate()
+            new = bool(new)
+            self._muted += new - counted[1]
+            counted[1] = new
+            after = self._aggregate()
+        self._aggregate_after(before, after, magic_root_session, event_context)
+
+    def _state_changed(self, new, magic_root_session):
+        with self._lock:
+            counted = self._counted.get(magic_root_session.iid)
+            if counted is None:
+                return
+            before = self._aggregate()
+            self._states[counted[0]] -= 1
+            self._states[new] += 1
+            counted[0] = new
+            after = self._aggregate()
+        self._aggregate_after(before, after, magic_root_session, _NO_CHANGER)
+
+    def _aggregate(self):
+        # under _lock, None without aggregate_callbacks
+        if not self.aggregate_callbacks:
+            return None
+        return self._volume, self._mute(), self._state()
+
+    def _aggregate_after(self, before, after, magic_root_session, event_context):
+        # callbacks of the aggregated values which changed,
+        # not for the first session nor once the last one is gone
+        if before is None or after is None or before[0] is None or after[0] is None:
+            return
+        (volume, mute, state), (new_volume, new_mute, new_state) = before, after
+        if new_volume != volume:
+            magic_root_session._dispatch_callbacks(
+                "volume_callback", event_context, new_volume, self
+            )
+        if new_mute != mute:
+            magic_root_session._dispatch_callbacks(
+                "mute_callback", event_context, new_mute, self
+            )
+        if new_state != state and self.state_callback:
+            magic_root_session._run_callback(
+                user_code(self.state_callback), new_state, source=self
+            )
 
     def __str__(self):
         return (
@@ -478,14 +997,22 @@ class MagicApp(_MagicAudioControl):
 
     # easy control:
     @property
-    @for_session_in_sessions
-    def state(self, magic_root_session):
-        return magic_root_session.state
+    def state(self):
+        """The highest state of the sessions, None without session"""
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        states = self._states
+        for state in _STATES_DESCENDING:
+            if states[state]:
+                return state
+        return None
 
     @property
-    @for_session_in_sessions
-    def volume(self, magic_root_session):
-        return magic_root_session.volume
+    def volume(self):
+        """The loudest volume of the sessions, None without session"""
+        return self._volume
 
     @volume.setter
     @for_session_in_sessions
@@ -493,9 +1020,15 @@ class MagicApp(_MagicAudioControl):
         magic_root_session._sav.SetMasterVolume(volume, self.guid)
 
     @property
-    @for_session_in_sessions
-    def mute(self, magic_root_session):
-        return magic_root_session.mute
+    def mute(self):
+        """1 if a session is muted, None without session"""
+        with self._lock:
+            return self._mute()
+
+    def _mute(self):
+        if not self._counted:
+            return None
+        return 1 if self._muted else 0
 
     @mute.setter
     @for_session_in_sessions
@@ -539,6 +1072,10 @@ class MagicSession(_MagicAudioControl):
 
         log.info(str(self))
 
+    def _subscribed_root_sessions(self):
+        magic_root_session = getattr(self, "magic_root_session", None)
+        return [] if magic_root_session is None else [magic_root_session]
+
     @classmethod
     def initialize(cls, new_magic_root_session, *args, **kwargs):
         """
@@ -596,7 +1133,7 @@ class MagicSession(_MagicAudioControl):
 class _MagicGuidCompare:
     """
     Helper that is passed when 'advanced_xxx_callback=True'
-    see _MagicRootSession._send_callback()
+    see _MagicRootSession._send_callbacks()
     """
 
     def __init__(self, master_guid, changer_guid):
@@ -627,15 +1164,34 @@ class _MagicRootSession(COMObject):
 
     _com_interfaces_ = (IAudioSessionEvents,)
 
-    def __init__(self, ctl, iid, magic_manager):
+    # callbacks of the MagicApps and MagicSessions
+    CALLBACKS = (
+        "volume_callback",
+        "advanced_volume_callback",
+        "mute_callback",
+        "advanced_mute_callback",
+        "state_callback",
+    )
+
+    def __init__(self, ctl, iid, magic_manager, device_id=None):
         self._ctl2 = ctl.QueryInterface(IAudioSessionControl2)
+        # endpoint of the session
+        self.device_id = device_id
         self.app_exec = self._get_app_exec()
+        # unique to the session, unlike the pid or the iid
+        self.instance_identifier = self._ctl2.GetSessionInstanceIdentifier()
+        # attributes for the pycaw.matchers patterns, looked up on demand
+        self.process = SessionProcess(self.pid, self.app_exec)
         self._sav = None
         self.magic_manager = magic_manager
         self.iid = iid
+        # label of the session in pycaw.stats()
+        self.stats_session = f"{self.app_exec}#{iid}"
 
-        self.magic_app = None
-        self.magic_session = None
+        # subscribers, any number of MagicApps and MagicSessions
+        self.magic_apps = []
+        self.magic_sessions = []
+        self.update_subscribers()
 
         self.volume = None
         self.mute = None
@@ -652,32 +1208,60 @@ class _MagicRootSession(COMObject):
     def __str__(self):
         return f"<{self.__class__.__name__} app='{self.app_exec}'/>"
 
-    # only one magic_app at the time is able to
-    # control and view this magic_root_session.
-    # a second magic_app is blocked via the MagicManager ...
-    # see:
-    # MagicManager.add_magic_app() -> if not magic_root_session.magic_app
-    # MagicManager._match_sess_to_mapp() -> return if match
-
-    # TODO Feature:
-    # allow multiple magic_app for one magic_root_session?
-    # If multiple magic_app would be allowed:
-    # Looping through multiple magic_app and checking for
-    # callbacks in each would cost lots of time right?
-    # any solution?
-    #
-    # or it could use this sessions without callbacks.
-    #
-    # also the session remove handle wouldnt work.
+    @property
+    def magic_app(self):
+        """The first MagicApp, None if none"""
+        return self.magic_apps[0] if self.magic_apps else None
+
+    @property
+    def magic_session(self):
+        """The first MagicSession, None if none"""
+        return self.magic_sessions[0] if self.magic_sessions else None
 
     def use_magic_app(self, magic_app):
-        self.magic_app = magic_app
+        if magic_app not in self.magic_apps:
+            self.magic_apps.append(magic_app)
+            self.update_subscribers()
         self._activate()
 
     def use_magic_session(self, magic_session):
-        self.magic_session = magic_session
+        if magic_session not in self.magic_sessions:
+            self.magic_sessions.append(magic_session)
+            self.update_subscribers()
         self._activate()
 
+    def unsubscribe_all(self):
+        self.magic_apps = []
+        self.magic_sessions = []
+        self.update_subscribers()
+
+    def update_subscribers(self):
+        """
+        Precomputes the callbacks of the subscribers per event type,
+        so that the notifications don't look them up:
+            "volume_callback" / "mute_callback" ->
+                [(master guid, callback, advanced callback)]
+            "state_callback" -> [callback]
+        Called when a subscriber or one of its callbacks changes.
+        MagicApps with aggregate_callbacks aren't part of them.
+        """
+        subscribers = {"volume_callback": [], "mute_callback": [], "state_callback": []}
+        for master in self.magic_apps + self.magic_sessions:
+            if getattr(master, "aggregate_callbacks", False):
+                # called back by MagicApp._aggregate_after()
+                continue
+            for callback in ("volume_callback", "mute_callback"):
+                master_callback = getattr(master, callback, None)
+                master_advanced_callback = getattr(master, "advanced_" + callback, None)
+                if master_callback or master_advanced_callback:
+                    subscribers[callback].append(
+                        (master.guid, master_callback, master_advanced_callback)
+                    )
+            state_callback = getattr(master, "state_callback", None)
+            if state_callback:
+                subscribers["state_callback"].append(state_callback)
+        self._subscribers = subscribers
+
     def _activate(self):
         # activates this magic_root_session.
         # callbacks wont be "ignored", and volume and mute
@@ -689,6 +1273,7 @@ class _MagicRootSession(COMObject):
 
             self._activated = True
 
+    @instrumented("IAudioSessionEvents.OnSimpleVolumeChanged")
     def OnSimpleVolumeChanged(self, new_volume, new_mute, event_context):
         """Is fired, when the audio session volume/mute changed."""
         log.debug(
@@ -706,36 +1291,69 @@ class _MagicRootSession(COMObject):
             # self.volume will keep the none state
             # until self._activate()
             self.volume = new_volume
+            for magic_app in self.magic_apps:
+                magic_app._volume_changed(new_volume, self, event_context)
 
             # send callbacks, if callback exists
-            self._send_callback(
-                self.magic_app, "volume_callback", event_context, new_volume
-            )
-
-            self._send_callback(
-                self.magic_session, "volume_callback", event_context, new_volume
-            )
+            self._dispatch_callbacks("volume_callback", event_context, new_volume)
             return
         # check old mute vs new:
         if self.mute != new_mute:
             # self.mute will keep the none state
             # until self._activate()
             self.mute = new_mute
+            for magic_app in self.magic_apps:
+                magic_app._mute_changed(new_mute, self, event_context)
 
             # send callbacks, if callback exists
-            self._send_callback(
-                self.magic_app, "mute_callback", event_context, new_mute
-            )
+            self._dispatch_callbacks("mute_callback", event_context, new_mute)
+            return
 
-            self._send_callback(
-                self.magic_session, "mute_callback", event_context, new_mute
+    def _dispatch_callbacks(self, callback, event_context, value, magic_app=None):
+        # to the subscribers, or to the aggregate callbacks of magic_app
+        source = self.iid if magic_app is None else magic_app
+        coalescer = self.magic_manager.coalescer
+        if coalescer is None:
+            if self.magic_manager.dispatcher is not None:
+                event_context = copy_event_context(event_context)
+            self._run_callback(
+                self._send_callbacks,
+                callback,
+                event_context,
+                value,
+                magic_app,
+                source=source,
             )
             return
+        # one window per session (or aggregate) and per callback,
+        # a mute change doesn't hide a volume change
+        coalescer.submit(
+            (source, callback),
+            in_event(functools.partial(self._run_callback, source=source)),
+            self._send_callbacks,
+            callback,
+            copy_event_context(event_context),
+            value,
+            magic_app,
+        )
 
-    @staticmethod
-    def _send_callback(master, callback, changer_guid, value):
+    def _run_callback(self, func, *args, source=None):
+        """
+        Calls func(*args) now, or on the dispatcher, after the previous ones
+        of source (this session by default).
         """
-        Send callbacks, if callback exists.
+        dispatcher = self.magic_manager.dispatcher
+        if dispatcher is None:
+            func(*args)
+            return
+        if source is None:
+            source = self.iid
+        dispatcher.submit(source, in_event(func), *args)
+
+    def _send_callbacks(self, callback, changer_guid, value, magic_app=None):
+        """
+        Send callbacks to the subscribers, see update_subscribers(),
+        or to the aggregate callbacks of magic_app.
 
         The default is, that callbacks which are made
         by MagicApp or MagicSession get filtered out
@@ -751,47 +1369,44 @@ class _MagicRootSession(COMObject):
         if the changer guid is external.
         """
 
-        # get the callback method from the master.
-        # will be None if the user didnt hook into it
-        # or if master = None
-
-        if master is None:
-            return
-
-        master_advanced_callback = getattr(master, "advanced_" + callback)
-        master_callback = getattr(master, callback)
-
-        # TODO: Does this safe resources, since _MagicGuidCompare is not
-        # always instantiated?
-        if master_callback is None and master_advanced_callback is None:
-            return
-
-        # create a new _MagicGuidCompare which will compare
-        # changer_guid and master.guid
-        compare = _MagicGuidCompare(master.guid, changer_guid)
-
-        if master_advanced_callback:
-            master_advanced_callback(value, compare)
-            # TODO:
-            # return or allow also simple callback?
-
-        if master_callback and compare:
-            # if the the callback is not caused by master.guid
-            # then send simple callback
-            master_callback(value)
-
+        if magic_app is None:
+            # only the masters which hooked into the callback
+            subscribers = self._subscribers[callback]
+        else:
+            subscribers = (
+                (
+                    magic_app.guid,
+                    getattr(magic_app, callback),
+                    getattr(magic_app, "advanced_" + callback),
+                ),
+            )
+        for master_guid, master_callback, master_advanced_callback in subscribers:
+            # create a new _MagicGuidCompare which will compare
+            # changer_guid and master.guid
+            compare = _MagicGuidCompare(master_guid, changer_guid)
+
+            if master_advanced_callback:
+                user_code(master_advanced_callback)(value, compare)
+                # TODO:
+                # return or allow also simple callback?
+
+            if master_callback and compare:
+                # if the the callback is not caused by master.guid
+                # then send simple callback
+                user_code(master_callback)(value)
+
+    @instrumented("IAudioSessionEvents.OnStateChanged")
     def OnStateChanged(self, new_state_id):
         """Is fired, when the audio session state changed."""
-        self.state = AudioSessionState(new_state_id)
+        new_state = self.state = AudioSessionState(new_state_id)
+        for magic_app in self.magic_apps:
+            magic_app._state_changed(new_state, self)
 
         # send callbacks, if defined
-        if self.magic_app and self.magic_app.state_callback:
-            self.magic_app.state_callback(self.state)
+        for state_callback in self._subscribers["state_callback"]:
+            self._run_callback(user_code(state_callback), new_state)
 
-        if self.magic_session and self.magic_session.state_callback:
-            self.magic_session.state_callback(self.state)
-
-        if self.state == AudioSessionState.Expired:
+        if new_state == AudioSessionState.Expired:
             """
             calling the MagicManager to remove this magic_root_session.
 
@@ -806,7 +1421,7 @@ class _MagicRootSession(COMObject):
             # ... but that would only work if empty_trash()
             # is triggered by the user and not via a callback
 
-            self.magic_manager.remove_session(self.iid, self.magic_app)
+            self.magic_manager.remove_session(self.iid)
 
             # XXX remove old session:
             # would crash the app:
@@ -819,15 +1434,8 @@ class _MagicRootSession(COMObject):
         self.pid = self._ctl2.GetProcessId()
 
         if self.pid != 0:
-            # try:
-            return psutil.Process(self.pid).name()
-            # except psutil.NoSuchProcess:
-            # for some reason GetProcessId returned an non existing pid
-
-            # TODO:
-            # i didnt wrote the initial try, except psutil.NoSuchProcess:
-            # but that should not happen right?
-            # i never had an issue with a non existing process (besides the 0)
+            # None if GetProcessId returned a non existing pid
+            return get_process_name_cache().get(self.pid)
 
         # System Sound:
         # self._ctl2.GetDisplayName() returns:
@@ -851,12 +1459,84 @@ class _MagicRootSession(COMObject):
             log.critical(warn)
             raise ValueError(warn)
 
-    # TODO: Feature
-    # implement:
-    # def OnSessionDisconnected(self, disconnect_reason_id): pass
+    @instrumented("IAudioSessionEvents.OnSessionDisconnected")
+    def OnSessionDisconnected(self, disconnect_reason_id):
+        """
+        Is fired, when the audio session got disconnected (device removed,
+        audio service restarted ...), the MagicManager rebinds it.
+        """
+        log.info(f":: disconnected {self} reason: {disconnect_reason_id}")
+        self.magic_manager._session_disconnected(self, disconnect_reason_id)
 
     def register_notification(self):
         self._ctl2.RegisterAudioSessionNotification(self)
 
     def unregister_notification(self):
-        self._ctl2.UnregisterAudioSessionNotification(self)
+        try:
+            self._ctl2.UnregisterAudioSessionNotification(self)
+        except COMError:
+            # e.g. the audio service restarted
+            pass
+
+
+class _MagicEndpoint(COMObject):
+    """Session notifications of one endpoint, see MagicManager.endpoints"""
+
+    _com_interfaces_ = (IAudioSessionNotification,)
+
+    def __init__(self, magic_manager, device_id, mgr):
+        super().__init__()
+        self.magic_manager = magic_manager
+        self.device_id = device_id
+        # IAudioSessionManager2 of the endpoint
+        self.mgr = mgr
+
+    def __str__(self):
+        return f"<{self.__class__.__name__} device_id='{self.device_id}'/>"
+
+    def OnSessionCreated(self, ctl):
+        # on the endpoint worker, in order with the enumerations and the
+        # teardowns of the endpoints, with its own reference on the
+        # session as ctl is released when this returns
+        ctl2 = ctl.QueryInterface(IAudioSessionControl2)
+        self.magic_manager._schedule(
+            self.magic_manager._session_created, ctl2, self.device_id
+        )
+
+    def register_notification(self):
+        self.mgr.RegisterSessionNotification(self)
+
+    def unregister_notification(self):
+        try:
+            self.mgr.UnregisterSessionNotification(self)
+        except COMError:
+            # e.g. the device is gone
+            pass
+
+
+class _MagicDeviceNotification(MMNotificationClient):
+    """Follows the endpoints for the MagicManager, on its endpoint worker."""
+
+    def __init__(self, magic_manager):
+        super().__init__()
+        self.magic_manager = magic_manager
+
+    def on_default_device_changed(
+        self, flow, flow_id, role, role_id, default_device_id
+    ):
+        if default_device_id:
+            # only the new endpoint, if not watched yet
+            manager = self.magic_manager
+            manager._schedule(manager._update_endpoint, default_device_id)
+
+    def on_device_added(self, added_device_id):
+        manager = self.magic_manager
+        manager._schedule(manager._update_endpoint, added_device_id)
+
+    def on_device_removed(self, removed_device_id):
+        manager = self.magic_manager
+        manager._schedule(manager._close_endpoint, removed_device_id)
+
+    def on_device_state_changed(self, device_id, new_state, new_state_id):
+        manager = self.magic_manager
+        manager._schedule(manager._update_endpoint, device_id)
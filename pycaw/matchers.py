@@ -0,0 +1,210 @@
+"""
+Patterns matching the processes of the sessions, e.g. for MagicApp:
+
+    MagicApp({"firefox.exe", Glob("chrome*.exe"), Regex(r"game_v\\d+\\.exe")})
+
+- Glob, the executable name, case insensitive (fnmatch syntax)
+- Regex, the executable name, full match
+- ExePath, glob of the full executable path
+- Parent, glob of the executable name of the parent process
+- WindowClass, glob of the class of a top level window of the process
+
+SessionMatcher compiles the patterns into one regex per attribute.
+"""
+
+import fnmatch
+import re
+
+import psutil
+
+from pycaw.backend import get_backend
+from pycaw.processes import get_process_name_cache
+
+# group references, by number or by name, which don't survive
+# the combination of the patterns
+_GROUP_REFERENCE = re.compile(r"(?:^|[^\\])(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(")
+
+NAME = "name"
+PATH = "path"
+PARENT = "parent"
+WINDOW_CLASS = "window_class"
+
+
+class Pattern:
+    """Base of the patterns, matching one attribute (kind) of a process."""
+
+    kind = None
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = re.compile(self._translate(pattern))
+
+    def _translate(self, pattern):
+        return "(?i:%s)" % fnmatch.translate(pattern)
+
+    def __repr__(self):
+        return "%s(%r)" % (self.__class__.__name__, self.pattern)
+
+    def __eq__(self, other):
+        if not isinstance(other, Pattern):
+            return NotImplemented
+        return (self.__class__, self.pattern) == (other.__class__, other.pattern)
+
+    def __hash__(self):
+        return hash((self.__class__, self.pattern))
+
+    def matches(self, process):
+        """True if an attribute of process (a SessionProcess) matches."""
+        for value in process.values(self.kind):
+            if self.regex.fullmatch(value):
+                return True
+        return False
+
+
+class Glob(Pattern):
+    kind = NAME
+
+
+class Regex(Pattern):
+    kind = NAME
+
+    def _translate(self, pattern):
+        return pattern
+
+
+class ExePath(Pattern):
+    kind = PATH
+
+
+class Parent(Pattern):
+    kind = PARENT
+
+
+class WindowClass(Pattern):
+    kind = WINDOW_CLASS
+
+
+class SessionProcess:
+    """
+    The process of a session, its attributes are only looked up when a
+    pattern needs them. Processes gone meanwhile match nothing.
+    """
+
+    def __init__(self, pid, name):
+        self.pid = pid
+        self.name = name
+        self._values = {NAME: () if name is None else (name,)}
+
+    def values(self, kind):
+        values = self._values.get(kind)
+        if values is None:
+            try:
+                values = self._lookup(kind)
+            except psutil.Error:
+                values = ()
+            self._values[kind] = values
+        return values
+
+    def _lookup(self, kind):
+        if not self.pid:
+            # system sounds
+            return ()
+        backend = get_backend()
+        if kind == PATH:
+            return (backend.GetProcessExe(self.pid),)
+        if kind == PARENT:
+            parent_pid = backend.GetParentProcessId(self.pid)
+            name = get_process_name_cache().get(parent_pid) if parent_pid else None
+            return () if name is None else (name,)
+        if kind == WINDOW_CLASS:
+            return tuple(backend.GetWindowClasses(self.pid))
+        raise ValueError("unknown kind %r" % kind)
+
+
+class SessionMatcher:
+    """
+    The patterns of several targets (e.g. MagicApps), compiled into a
+    single regex per kind, an optional lookahead per pattern capturing
+    into its own named group: one match tells all the patterns a value
+    matches, whatever their number.
+    The targets of the matching values are cached, sessions of the same
+    executable resolve in a dict lookup.
+    Patterns referencing groups (e.g. Regex(r"(a)\\1")) aren't combined,
+    their group numbers would shift, each of them gets tested.
+    """
+
+    # cached values, before clearing the cache
+    maxsize = 4096
+
+    def __init__(self):
+        # kind -> [(Pattern, target)]
+        self._patterns = {}
+        # kind -> (combined regex, [(group name, position of the pattern)]),
+        # (None, []) if the patterns don't combine
+        self._combined = {}
+        # kind -> [(position, Pattern)] left out of the combined regex
+        self._separate = {}
+        # (kind, value) -> targets
+        self._cache = {}
+
+    def __len__(self):
+        return sum(len(patterns) for patterns in self._patterns.values())
+
+    def add(self, pattern, target):
+        patterns = self._patterns.setdefault(pattern.kind, [])
+        patterns.append((pattern, target))
+        combinable = []
+        separate = []
+        for i, (p, t) in enumerate(patterns):
+            if _GROUP_REFERENCE.search(p.regex.pattern):
+                separate.append(i)
+            else:
+                combinable.append(i)
+        # the group of pattern i is _i, whatever the groups of the others
+        groups = [("_%d" % i, i) for i in combinable]
+        try:
+            combined = re.compile(
+                "".join(
+                    r"(?:(?=(?P<%s>(?:%s))\Z))?" % (name, patterns[i][0].regex.pattern)
+                    for name, i in groups
+                )
+            )
+        except re.error:
+            # e.g. global inline flags or clashing group names,
+            # each pattern gets tested
+            combined, groups = None, []
+            separate = range(len(patterns))
+        self._combined[pattern.kind] = (combined, groups)
+        self._separate[pattern.kind] = [(i, patterns[i][0]) for i in separate]
+        self._cache.clear()
+
+    def match(self, process):
+        """The targets of the patterns process (a SessionProcess) matches."""
+        targets = []
+        for kind in self._combined:
+            for value in process.values(kind):
+                key = (kind, value)
+                hits = self._cache.get(key)
+                if hits is None:
+                    hits = self._resolve(kind, value)
+                    if len(self._cache) >= self.maxsize:
+                        self._cache.clear()
+                    self._cache[key] = hits
+                for target in hits:
+                    if target not in targets:
+                        targets.append(target)
+        return targets
+
+    def _resolve(self, kind, value):
+        patterns = self._patterns[kind]
+        combined, groups = self._combined[kind]
+        matched = []
+        if groups:
+            # only the groups of the patterns value fully matches are set
+            values = combined.match(value).groupdict()
+            matched = [i for name, i in groups if values[name] is not None]
+        for i, pattern in self._separate[kind]:
+            if pattern.regex.fullmatch(value):
+                matched.append(i)
+        # in the order of the patterns
+        return tuple(patterns[i][1] for i in sorted(matched))
@@ -0,0 +1,266 @@
+"""
+Peak meters of endpoints and sessions, see AudioMeter and PeakMeterSampler.
+
+NumPy is optional for AudioMeter, without it the peaks are returned as
+ctypes arrays. PeakMeterSampler requires it.
+"""
+
+import threading
+import time
+from ctypes import c_float
+
+from pycaw.api.endpointvolume import IAudioMeterInformation
+from pycaw.backend import get_backend
+from pycaw.compat import CLSCTX_ALL, COMError
+from pycaw.constants import ENDPOINT_HARDWARE_SUPPORT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class AudioMeter:
+    """
+    Wraps an IAudioMeterInformation, of an endpoint (AudioDevice.Meter)
+    or of a session (AudioSession.Meter).
+
+    read() gets the peaks of all the channels with a single
+    GetChannelsPeakValues call, into the same preallocated buffer each time:
+
+        meter = AudioUtilities.CreateDevice(AudioUtilities.GetSpeakers()).Meter
+        peaks = meter.read()  # numpy.float32 array, one value per channel
+
+    The returned array is a view over that buffer, overwritten by the next
+    read(), copy it to keep the values.
+    """
+
+    def __init__(self, meter_information):
+        self._meter = meter_information
+        self.channels = meter_information.GetMeteringChannelCount()
+        self._buffer = (c_float * self.channels)()
+        if numpy is not None:
+            self._peaks = numpy.frombuffer(self._buffer, dtype=numpy.float32)
+        else:
+            self._peaks = self._buffer
+
+    def __repr__(self):
+        return "<%s channels=%d>" % (self.__class__.__name__, self.channels)
+
+    @classmethod
+    def from_device(cls, dev):
+        """Activates the meter of an IMMDevice."""
+        iface = dev.Activate(IAudioMeterInformation._iid_, CLSCTX_ALL, None)
+        return cls(iface.QueryInterface(IAudioMeterInformation))
+
+    @property
+    def MeterInformation(self):
+        """The wrapped IAudioMeterInformation"""
+        return self._meter
+
+    @property
+    def buffer(self):
+        """The ctypes c_float array read() writes to"""
+        return self._buffer
+
+    def read(self):
+        """
+        Returns the peak of every channel, in range(0, 1).
+        A numpy.float32 view when NumPy is installed, else the ctypes array.
+        """
+        self._meter.GetChannelsPeakValues(self.channels, self._buffer)
+        return self._peaks
+
+    @property
+    def peak(self):
+        """Peak of the loudest channel, in range(0, 1)"""
+        return self._meter.GetPeakValue()
+
+    @property
+    def hardware_support(self):
+        """ENDPOINT_HARDWARE_SUPPORT flags"""
+        return ENDPOINT_HARDWARE_SUPPORT(self._meter.QueryHardwareSupport())
+
+
+class _MeterRing:
+    """Ring buffer of the last peaks of a meter, one row per sample."""
+
+    def __init__(self, meter, capacity):
+        self.meter = meter
+        self.data = numpy.zeros((capacity, meter.channels), dtype=numpy.float32)
+        # next row to write and number of valid rows
+        self.index = 0
+        self.count = 0
+        self.error = None
+        # the readers don't see a row being written
+        self.lock = threading.Lock()
+
+    def sample(self):
+        peaks = self.meter.read()
+        with self.lock:
+            self.data[self.index] = peaks
+            self.index = (self.index + 1) % len(self.data)
+            if self.count < len(self.data):
+                self.count += 1
+
+    def latest(self):
+        """The last row as a copy, None until the first sample."""
+        with self.lock:
+            if not self.count:
+                return None
+            return self.data[self.index - 1].copy()
+
+    def window(self, samples):
+        """The last samples rows, oldest first, as a copy."""
+        with self.lock:
+            end = self.index
+            start = end - min(samples, self.count)
+            if start >= 0:
+                return self.data[start:end].copy()
+            return numpy.concatenate((self.data[start:], self.data[:end]))
+
+
+class PeakMeterSampler:
+    """
+    Polls many AudioMeter at a fixed rate from a single thread, into
+    per source NumPy ring buffers of 'history' seconds.
+
+        sampler = PeakMeterSampler(rate=60)
+        sampler.add("speakers", device.Meter)
+        for session in AudioUtilities.GetAllSessions():
+            sampler.add(session.InstanceIdentifier, session.Meter)
+        sampler.start()
+        ...
+        sampler.summary("speakers", seconds=0.5)  # {"min": .., "max": .., "rms": ..}
+        sampler.stop()
+
+    Same as for the callbacks, COM needs to be in MTA (sys.coinit_flags = 0)
+    so that the meters can be used from the sampling thread.
+    A source failing with COMError (e.g. an expired session) is no longer
+    polled, see errors().
+    """
+
+    def __init__(self, rate=30.0, history=2.0):
+        if numpy is None:
+            raise ImportError("PeakMeterSampler requires NumPy (pycaw[numpy])")
+        self.rate = rate
+        self.capacity = max(1, int(round(rate * history)))
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        # ticks skipped because a poll took longer than the period
+        self.overruns = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __len__(self):
+        return len(self._sources)
+
+    def add(self, key, meter):
+        """Adds meter (an AudioMeter), under key."""
+        with self._lock:
+            self._sources[key] = _MeterRing(meter, self.capacity)
+
+    def remove(self, key):
+        with self._lock:
+            self._sources.pop(key, None)
+
+    def sample(self):
+        """Polls every source once, the sampling thread calls it at each tick."""
+        with self._lock:
+            sources = list(self._sources.values())
+        for source in sources:
+            if source.error is not None:
+                continue
+            try:
+                source.sample()
+            except COMError as exc:
+                source.error = exc
+
+    def errors(self):
+        """Returns {key: COMError} of the sources no longer polled."""
+        return {
+            key: source.error
+            for key, source in list(self._sources.items())
+            if source.error is not None
+        }
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="PeakMeterSampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        backend = get_backend()
+        backend.InitializeThread()
+        try:
+            period = 1.0 / self.rate
+            deadline = time.perf_counter()
+            while not self._stop_event.is_set():
+                self.sample()
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay < 0:
+                    # too slow, drops the missed ticks rather than bursting
+                    missed = int(-delay // period) + 1
+                    self.overruns += missed
+                    deadline += missed * period
+                    delay += missed * period
+                self._stop_event.wait(delay)
+        finally:
+            backend.UninitializeThread()
+
+    def _samples(self, seconds):
+        if seconds is None:
+            return self.capacity
+        return max(1, int(round(seconds * self.rate)))
+
+    def latest(self, key):
+        """The last peaks of key, one per channel, None until the first sample."""
+        return self._sources[key].latest()
+
+    def window(self, key, seconds=None):
+        """
+        The peaks of the last seconds (all the history by default),
+        a (samples, channels) array, oldest first.
+        """
+        return self._sources[key].window(self._samples(seconds))
+
+    def summary(self, key, seconds=None):
+        """
+        Per channel "min", "max" and "rms" of the peaks of the last seconds,
+        None until the first sample.
+        """
+        window = self.window(key, seconds)
+        if not len(window):
+            return None
+        return {
+            "min": window.min(axis=0),
+            "max": window.max(axis=0),
+            "rms": numpy.sqrt(numpy.mean(numpy.square(window), axis=0)),
+        }
+
+    def summaries(self, seconds=None):
+        """summary() of every source, by key."""
+        return {key: self.summary(key, seconds) for key in list(self._sources)}
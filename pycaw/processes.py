@@ -0,0 +1,141 @@
+"""
+Shared cache of the executable names of processes, see ProcessNameCache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import psutil
+
+from pycaw.backend import get_backend
+
+
+class ProcessNameCache:
+    """
+    Bounded LRU cache of process names, keyed by (pid, create_time)
+    so that a pid reused by a new process isn't given the old name.
+
+    An entry checked less than 'max_age' seconds ago is trusted as is,
+    older ones are checked against the current create time of the pid,
+    which is cheaper than getting the name again.
+    Pids without process (psutil.NoSuchProcess) are remembered for
+    'negative_ttl' seconds.
+
+    warm() fills the cache from a single sweep over all the processes,
+    rather than one lookup per pid, e.g. before resolving many sessions.
+    """
+
+    # below that many lookups, prefetch() doesn't sweep
+    sweep_threshold = 16
+
+    def __init__(self, maxsize=1024, max_age=2.0, negative_ttl=5.0):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._backend = None
+        # (pid, create_time) -> name
+        self._names = OrderedDict()
+        # pid -> [create_time, checked_at] of its latest entry in _names
+        self._pids = {}
+        # pid -> expiry time, of the pids without process
+        self._missing = OrderedDict()
+
+    def __len__(self):
+        return len(self._names)
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+            self._pids.clear()
+            self._missing.clear()
+
+    def _check_backend(self, backend):
+        # names of another backend are meaningless
+        if backend is not self._backend:
+            self._names.clear()
+            self._pids.clear()
+            self._missing.clear()
+            self._backend = backend
+
+    def _store(self, pid, create_time, name, now):
+        key = (pid, create_time)
+        self._names[key] = name
+        self._names.move_to_end(key)
+        self._pids[pid] = [create_time, now]
+        self._missing.pop(pid, None)
+        while len(self._names) > self.maxsize:
+            (old_pid, old_create_time), _ = self._names.popitem(last=False)
+            latest = self._pids.get(old_pid)
+            if latest is not None and latest[0] == old_create_time:
+                del self._pids[old_pid]
+
+    def _store_missing(self, pid, now):
+        self._pids.pop(pid, None)
+        self._missing[pid] = now + self.negative_ttl
+        self._missing.move_to_end(pid)
+        while len(self._missing) > self.maxsize:
+            self._missing.popitem(last=False)
+
+    def get(self, pid):
+        """Returns the executable name of pid, None if there is no such process."""
+        backend = get_backend()
+        now = time.monotonic()
+        with self._lock:
+            self._check_backend(backend)
+            expiry = self._missing.get(pid)
+            if expiry is not None:
+                if expiry > now:
+                    return None
+                del self._missing[pid]
+            latest = self._pids.get(pid)
+            if latest is not None and now - latest[1] < self.max_age:
+                key = (pid, latest[0])
+                self._names.move_to_end(key)
+                return self._names[key]
+        try:
+            create_time = backend.GetProcessCreateTime(pid)
+            with self._lock:
+                key = (pid, create_time)
+                if key in self._names:
+                    self._pids[pid] = [create_time, now]
+                    self._names.move_to_end(key)
+                    return self._names[key]
+            name = backend.GetProcessName(pid)
+        except psutil.NoSuchProcess:
+            with self._lock:
+                self._store_missing(pid, now)
+            return None
+        with self._lock:
+            self._store(pid, create_time, name, now)
+        return name
+
+    def warm(self):
+        """Caches the names of all the running processes, in a single sweep."""
+        backend = get_backend()
+        now = time.monotonic()
+        processes = list(backend.IterProcesses())
+        with self._lock:
+            self._check_backend(backend)
+            # the sweep is authoritative, forget about the missing pids
+            self._missing.clear()
+            for pid, name, create_time in processes:
+                if name is not None:
+                    self._store(pid, create_time, name, now)
+
+    def prefetch(self, count):
+        """
+        To call before resolving the names of count pids,
+        warms the cache if a sweep is cheaper than count lookups.
+        """
+        if count >= self.sweep_threshold:
+            self.warm()
+
+
+_cache = ProcessNameCache()
+
+
+def get_process_name_cache():
+    """Returns the ProcessNameCache shared by pycaw.utils and pycaw.magic."""
+    return _cache
@@ -0,0 +1,76 @@
+"""
+Well-known property keys of audio endpoint devices,
+see functiondiscoverykeys_devpkey.h and mmdeviceapi.h
+
+The keys are precomputed, hashable PropertyKey(fmtid, pid) tuples,
+to be used with AudioDevice.properties:
+
+    device.properties[PKEY_Device_FriendlyName]
+"""
+
+from collections import namedtuple
+from uuid import UUID
+
+
+class PropertyKey(namedtuple("PropertyKey", "fmtid pid")):
+    """
+    Hashable counterpart of the PROPERTYKEY structure.
+    fmtid is the upper case "{...}" string of the format GUID.
+    str() gives the same "{fmtid} pid" format as str(PROPERTYKEY).
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return "%s %s" % (self.fmtid, self.pid)
+
+    @classmethod
+    def from_string(cls, name):
+        """Parses the "{fmtid} pid" format, ValueError if it isn't."""
+        fmtid, pid = name.rsplit(" ", 1)
+        if not (fmtid.startswith("{") and fmtid.endswith("}")):
+            raise ValueError("not a {fmtid} pid property key: %r" % name)
+        # the canonical form, ValueError on a malformed GUID
+        return cls("{%s}" % str(UUID(fmtid)).upper(), int(pid))
+
+    @classmethod
+    def from_struct(cls, pk):
+        """Converts a PROPERTYKEY (or any object with fmtid and pid)."""
+        return cls(str(pk.fmtid).upper(), pk.pid)
+
+
+FMTID_Device = "{A45C254E-DF1C-4EFD-8020-67D146A850E0}"
+FMTID_DeviceInterface = "{026E516E-B814-414B-83CD-856D6FEF4822}"
+FMTID_DeviceClass = "{259ABFFC-50A7-47CE-AF08-68C9A7D73366}"
+FMTID_DeviceContainer = "{8C7ED206-3F8A-4827-B3AB-AE9E1FAEFC6C}"
+FMTID_AudioEndpoint = "{1DA5D803-D492-4EDD-8C23-E0C0FFEE7F0E}"
+FMTID_AudioEngineDeviceFormat = "{F19F064D-082C-4E27-BC73-6882A1BB8E4C}"
+FMTID_AudioEngineOEMFormat = "{E4870E26-3CC5-4CD2-BA46-CA0A9A70ED04}"
+
+PKEY_Device_DeviceDesc = PropertyKey(FMTID_Device, 2)
+PKEY_Device_FriendlyName = PropertyKey(FMTID_Device, 14)
+PKEY_Device_EnumeratorName = PropertyKey(FMTID_Device, 24)
+PKEY_Device_ContainerId = PropertyKey(FMTID_DeviceContainer, 2)
+PKEY_DeviceInterface_FriendlyName = PropertyKey(FMTID_DeviceInterface, 2)
+PKEY_DeviceClass_IconPath = PropertyKey(FMTID_DeviceClass, 12)
+
+PKEY_AudioEndpoint_FormFactor = PropertyKey(FMTID_AudioEndpoint, 0)
+PKEY_AudioEndpoint_ControlPanelPageProvider = PropertyKey(FMTID_AudioEndpoint, 1)
+PKEY_AudioEndpoint_Association = PropertyKey(FMTID_AudioEndpoint, 2)
+PKEY_AudioEndpoint_PhysicalSpeakers = PropertyKey(FMTID_AudioEndpoint, 3)
+PKEY_AudioEndpoint_GUID = PropertyKey(FMTID_AudioEndpoint, 4)
+PKEY_AudioEndpoint_Disable_SysFx = PropertyKey(FMTID_AudioEndpoint, 5)
+PKEY_AudioEndpoint_FullRangeSpeakers = PropertyKey(FMTID_AudioEndpoint, 6)
+PKEY_AudioEndpoint_Supports_EventDriven_Mode = PropertyKey(FMTID_AudioEndpoint, 7)
+PKEY_AudioEndpoint_JackSubType = PropertyKey(FMTID_AudioEndpoint, 8)
+
+PKEY_AudioEngine_DeviceFormat = PropertyKey(FMTID_AudioEngineDeviceFormat, 0)
+PKEY_AudioEngine_OEMFormat = PropertyKey(FMTID_AudioEngineOEMFormat, 3)
+
+# the DEVPKEY_ names of devpkey.h
+DEVPKEY_Device_DeviceDesc = PKEY_Device_DeviceDesc
+DEVPKEY_Device_FriendlyName = PKEY_Device_FriendlyName
+DEVPKEY_Device_EnumeratorName = PKEY_Device_EnumeratorName
+DEVPKEY_Device_ContainerId = PKEY_Device_ContainerId
+DEVPKEY_DeviceInterface_FriendlyName = PKEY_DeviceInterface_FriendlyName
+DEVPKEY_DeviceClass_IconPath = PKEY_DeviceClass_IconPath
@@ -8,8 +8,13 @@ Python wrapper around the Core Audio Windows API.
 # flake8: noqa
 # yes, the imports are unused
 
-from pycaw.api.audioclient import IAudioClient, ISimpleAudioVolume
-from pycaw.api.audioclient.depend import WAVEFORMATEX
+from pycaw.api.audioclient import (
+    IAudioCaptureClient,
+    IAudioClient,
+    IAudioRenderClient,
+    ISimpleAudioVolume,
+)
+from pycaw.api.audioclient.depend import WAVEFORMATEX, WAVEFORMATEXTENSIBLE
 from pycaw.api.audiopolicy import (
     IAudioSessionControl,
     IAudioSessionControl2,
@@ -0,0 +1,176 @@
+"""
+Live index of the audio sessions, kept up to date by Core Audio callbacks.
+"""
+
+import threading
+
+from pycaw.api.audiopolicy import IAudioSessionControl2
+from pycaw.callbacks import AudioSessionEvents, AudioSessionNotification
+from pycaw.compat import COMError
+from pycaw.processes import get_process_name_cache
+from pycaw.utils import AudioSession, AudioUtilities, _process_name
+
+AUDIO_SESSION_STATE_EXPIRED = 2
+
+
+class _RegistrySessionNotification(AudioSessionNotification):
+    def __init__(self, registry):
+        super().__init__()
+        self._registry = registry
+
+    def on_session_created(self, new_session):
+        self._registry._add(new_session)
+
+
+class _RegistrySessionEvents(AudioSessionEvents):
+    def __init__(self, registry, instance_identifier):
+        super().__init__()
+        self._registry = registry
+        self._instance_identifier = instance_identifier
+
+    def on_state_changed(self, new_state, new_state_id):
+        if new_state_id == AUDIO_SESSION_STATE_EXPIRED:
+            self._registry._remove(self._instance_identifier)
+
+    def on_session_disconnected(self, disconnect_reason, disconnect_reason_id):
+        self._registry._remove(self._instance_identifier)
+
+
+class AudioSessionRegistry:
+    """
+    Index of the sessions of an IAudioSessionManager2 (the default speakers
+    by default), by pid, by executable name and by instance identifier.
+
+    The sessions are enumerated once by start(), then the registry follows
+    OnSessionCreated and OnStateChanged (Expired) notifications, so lookups
+    are dict lookups rather than a full enumeration.
+
+    Same as for AudioSessionNotification, COM needs to be in MTA
+    (sys.coinit_flags = 0) for the notifications to be delivered.
+
+        registry = AudioSessionRegistry()
+        registry.start()
+        registry.get_by_exe("chrome.exe")
+        registry.stop()
+
+    All the lookups return a list of AudioSession, empty if nothing matches.
+    """
+
+    def __init__(self, mgr=None):
+        self._mgr = mgr
+        self._notification = None
+        self._lock = threading.Lock()
+        # instance identifier -> (AudioSession, pid, exe, events)
+        self._sessions = {}
+        # pid -> {instance identifier: AudioSession}, same for exe names
+        self._by_pid = {}
+        self._by_exe = {}
+        # events of removed sessions, unregistering from within the
+        # notification isn't allowed, they are unregistered by the next lookup
+        self._retired = []
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def started(self):
+        return self._notification is not None
+
+    def start(self):
+        if self.started:
+            return self
+        if self._mgr is None:
+            self._mgr = AudioUtilities.GetAudioSessionManager()
+        if self._mgr is None:
+            return self
+        self._notification = _RegistrySessionNotification(self)
+        self._mgr.RegisterSessionNotification(self._notification)
+        # seeds the index, it's also what enables the OnSessionCreated events
+        enumerator = self._mgr.GetSessionEnumerator()
+        count = enumerator.GetCount()
+        get_process_name_cache().prefetch(count)
+        for i in range(count):
+            ctl = enumerator.GetSession(i)
+            if ctl is None:
+                continue
+            ctl2 = ctl.QueryInterface(IAudioSessionControl2)
+            if ctl2 is not None:
+                self._add(AudioSession(ctl2))
+        return self
+
+    def stop(self):
+        if not self.started:
+            return
+        self._mgr.UnregisterSessionNotification(self._notification)
+        self._notification = None
+        with self._lock:
+            entries = list(self._sessions.values())
+            retired, self._retired = self._retired, []
+            self._sessions.clear()
+            self._by_pid.clear()
+            self._by_exe.clear()
+        for session, _, _, events in entries:
+            session._ctl.UnregisterAudioSessionNotification(events)
+        for session, events in retired:
+            session._ctl.UnregisterAudioSessionNotification(events)
+
+    def _add(self, session):
+        iid = session.InstanceIdentifier
+        pid = session.ProcessId
+        exe = _process_name(pid)
+        events = _RegistrySessionEvents(self, iid)
+        with self._lock:
+            if iid in self._sessions:
+                return
+            self._sessions[iid] = (session, pid, exe, events)
+            self._by_pid.setdefault(pid, {})[iid] = session
+            if exe is not None:
+                self._by_exe.setdefault(exe, {})[iid] = session
+        session._ctl.RegisterAudioSessionNotification(events)
+
+    def _remove(self, iid):
+        with self._lock:
+            entry = self._sessions.pop(iid, None)
+            if entry is None:
+                return
+            session, pid, exe, events = entry
+            self._discard(self._by_pid, pid, iid)
+            self._discard(self._by_exe, exe, iid)
+            self._retired.append((session, events))
+
+    @staticmethod
+    def _discard(index, key, iid):
+        sessions = index.get(key)
+        if sessions is not None:
+            sessions.pop(iid, None)
+            if not sessions:
+                del index[key]
+
+    def _flush_retired(self):
+        if not self._retired:
+            return
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for session, events in retired:
+            try:
+                session._ctl.UnregisterAudioSessionNotification(events)
+            except COMError:
+                # e.g. the audio service restarted
+                pass
+
+    def get_by_pid(self, pid):
+        self._flush_retired()
+        return list(self._by_pid.get(pid, {}).values())
+
+    def get_by_exe(self, exe):
+        self._flush_retired()
+        return list(self._by_exe.get(exe, {}).values())
+
+    def get_by_instance_identifier(self, iid):
+        self._flush_retired()
+        entry = self._sessions.get(iid)
+        return [] if entry is None else [entry[0]]
+
+    def sessions(self):
+        self._flush_retired()
+        return [entry[0] for entry in list(self._sessions.values())]
@@ -0,0 +1,1435 @@
+"""
+In-memory simulation of the Windows Core Audio objects used by pycaw.
+
+The simulated objects expose the same methods as the comtypes interface
+pointers (IMMDeviceEnumerator, IMMDevice, IAudioSessionManager2,
+IAudioSessionControl2, ISimpleAudioVolume, ...) and fire the same
+notification callbacks, so the regular pycaw code paths can be run,
+tested and benchmarked without an audio service, on any platform:
+
+    from pycaw.backend import use_backend
+    from pycaw.simulation import SimulatedAudioSystem, SimulatedBackend
+    from pycaw.utils import AudioUtilities
+
+    system = SimulatedAudioSystem()
+    system.spawn_sessions(1000)
+    with use_backend(SimulatedBackend(system)):
+        sessions = AudioUtilities.GetAllSessions()
+    print(system.calls["GetSession"])
+
+Note
+----
+This module does not need comtypes, values that are GUIDs on Windows
+(property key format ids, event contexts) are plain strings or 16 byte
+ctypes arrays here. Property keys are pycaw.propkeys.PropertyKey tuples.
+Notifications are delivered synchronously on the thread triggering them,
+Windows delivers them on one of its own threads.
+"""
+
+import struct
+import time
+import uuid
+from collections import Counter, deque
+from ctypes import (
+    POINTER,
+    Structure,
+    addressof,
+    c_float,
+    c_ubyte,
+    c_uint,
+    c_ulong,
+    c_void_p,
+    c_wchar_p,
+    cast,
+    create_unicode_buffer,
+    memset,
+    pointer,
+    sizeof,
+    string_at,
+)
+from functools import wraps
+from threading import Event, RLock
+
+import psutil
+
+from pycaw.compat import (
+    GUID,
+    VT_BLOB,
+    VT_BOOL,
+    VT_CLSID,
+    VT_EMPTY,
+    VT_I4,
+    VT_I8,
+    VT_LPWSTR,
+    VT_R8,
+    VT_UI4,
+    VT_UI8,
+    COMError,
+)
+from pycaw.propkeys import (
+    PKEY_AudioEndpoint_FormFactor,
+    PKEY_AudioEngine_DeviceFormat,
+    PKEY_Device_DeviceDesc,
+    PKEY_Device_FriendlyName,
+    PKEY_DeviceInterface_FriendlyName,
+    PropertyKey,
+)
+
+S_OK = 0
+S_FALSE = 1
+E_NOINTERFACE = -0x7FFFBFFE  # 0x80004002
+E_INVALIDARG = -0x7FF8FFA9  # 0x80070057
+E_NOTFOUND = -0x7FF8FB70  # 0x80070490
+RPC_E_DISCONNECTED = -0x7FFEFEF8  # 0x80010108
+
+# see audiosessiontypes.h, mmdeviceapi.h
+AUDIO_SESSION_STATE_INACTIVE = 0
+AUDIO_SESSION_STATE_ACTIVE = 1
+AUDIO_SESSION_STATE_EXPIRED = 2
+DEVICE_STATE_ACTIVE = 0x1
+E_RENDER = 0
+E_CAPTURE = 1
+E_ALL = 2
+ROLES = (0, 1, 2)
+
+IID_IUnknown = "{00000000-0000-0000-C000-000000000046}"
+IID_IMMDevice = "{D666063F-1587-4E43-81F1-B948E807363F}"
+IID_IMMEndpoint = "{1BE09788-6894-4089-8586-9A2A6C265AC5}"
+IID_IAudioSessionManager = "{BFA971F1-4D5E-40BB-935E-967039BFBEE4}"
+IID_IAudioSessionManager2 = "{77AA99A0-1BD6-484F-8BC7-2C654C9A9B6F}"
+IID_IAudioSessionControl = "{F4B1A599-7266-4319-A8CA-E70ACB11E8CD}"
+IID_IAudioSessionControl2 = "{BFB7FF88-7239-4FC9-8FA2-07C950BE9C6D}"
+IID_ISimpleAudioVolume = "{87CE5498-68D6-44E5-9215-6DA47EF883D8}"
+IID_IChannelAudioVolume = "{1C158861-B533-4B30-B1CF-E853E51C59B8}"
+IID_IAudioEndpointVolume = "{5CDF2C82-841E-4546-9722-0CF74078229A}"
+IID_IAudioMeterInformation = "{C02216F6-8C67-4B5B-9D00-D008E73E0064}"
+IID_IAudioClient = "{1CB9AD4C-DBFA-4C32-B178-C2F568A703B2}"
+IID_IAudioCaptureClient = "{C8ADBD64-E71E-48A0-A4DE-185C395CD317}"
+IID_IAudioRenderClient = "{F294ACFC-3146-4483-A7BF-ADDCA7C260E2}"
+
+AUDCLNT_E_NOT_INITIALIZED = -0x7776FFFF  # 0x88890001
+AUDCLNT_E_ALREADY_INITIALIZED = -0x7776FFFE  # 0x88890002
+AUDCLNT_E_WRONG_ENDPOINT_TYPE = -0x7776FFFD  # 0x88890003
+AUDCLNT_E_BUFFER_TOO_LARGE = -0x7776FFFA  # 0x88890006
+AUDCLNT_E_OUT_OF_ORDER = -0x7776FFF9  # 0x88890007
+AUDCLNT_E_UNSUPPORTED_FORMAT = -0x7776FFF8  # 0x88890008
+AUDCLNT_E_INVALID_SIZE = -0x7776FFEF  # 0x88890011
+AUDCLNT_E_EVENTHANDLE_NOT_EXPECTED = -0x7776FFEC  # 0x88890014
+AUDCLNT_SHAREMODE_SHARED = 0
+AUDCLNT_STREAMFLAGS_LOOPBACK = 0x00020000
+AUDCLNT_STREAMFLAGS_EVENTCALLBACK = 0x00040000
+AUDCLNT_STREAMFLAGS_AUTOCONVERTPCM = 0x80000000
+AUDCLNT_BUFFERFLAGS_SILENT = 0x2
+
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+KSDATAFORMAT_SUBTYPE_PCM = "{00000001-0000-0010-8000-00AA00389B71}"
+KSDATAFORMAT_SUBTYPE_IEEE_FLOAT = "{00000003-0000-0010-8000-00AA00389B71}"
+# 100 nanoseconds units
+DEFAULT_DEVICE_PERIOD = 100000
+MINIMUM_DEVICE_PERIOD = 30000
+
+
+class _GUIDBytes(Structure):
+    # same layout as a GUID, used for event contexts
+    _fields_ = [("Data", c_ubyte * 16)]
+
+
+class SIMULATED_VOLUME_NOTIFICATION_DATA(Structure):
+    # same layout as AUDIO_VOLUME_NOTIFICATION_DATA
+    _fields_ = [
+        ("guidEventContext", _GUIDBytes),
+        ("bMuted", c_ulong),
+        ("fMasterVolume", c_float),
+        ("nChannels", c_uint),
+        ("afChannelVolumes", c_float * 8),
+    ]
+
+
+def _null_context():
+    return pointer(_GUIDBytes())
+
+
+def _iid_key(iid):
+    return str(iid).upper()
+
+
+def _fill_propvariant(pv, value):
+    """
+    Encodes value into the PROPVARIANT pv, like a property store.
+    Returns the objects owning the memory pv points to, if any.
+    """
+    memory = None
+    union = pv.union
+    if value is None:
+        pv.vt = VT_EMPTY
+    elif isinstance(value, bool):
+        pv.vt = VT_BOOL
+        union.boolVal = -1 if value else 0
+    elif isinstance(value, int):
+        if 0 <= value <= 0xFFFFFFFF:
+            pv.vt = VT_UI4
+            union.ulVal = value
+        elif -0x80000000 <= value < 0:
+            pv.vt = VT_I4
+            union.lVal = value
+        elif value < 0:
+            pv.vt = VT_I8
+            union.hVal = value
+        else:
+            pv.vt = VT_UI8
+            union.uhVal = value
+    elif isinstance(value, float):
+        pv.vt = VT_R8
+        union.dblVal = value
+    elif isinstance(value, str):
+        memory = create_unicode_buffer(value)
+        pv.vt = VT_LPWSTR
+        union.pwszVal = cast(memory, c_wchar_p)
+    elif isinstance(value, bytes):
+        memory = (c_ubyte * len(value)).from_buffer_copy(value)
+        pv.vt = VT_BLOB
+        union.blob.cbSize = len(value)
+        union.blob.pBlobData = cast(memory, POINTER(c_ubyte))
+    elif isinstance(value, GUID):
+        memory = GUID.from_buffer_copy(value)
+        pv.vt = VT_CLSID
+        union.puuid = pointer(memory)
+    else:
+        raise TypeError("cannot store %r in a PROPVARIANT" % (value,))
+    return memory
+
+
+def _com_method(func):
+    """
+    Counts every call in SimulatedAudioSystem.calls, like a COM call.
+    The objects of a restarted audio service (with a _service_generation)
+    fail with RPC_E_DISCONNECTED.
+    """
+
+    @wraps(func)
+    def wrapper(self, *args):
+        self._system.calls[func.__name__] += 1
+        generation = getattr(self, "_service_generation", None)
+        if generation is not None and generation != self._system._service_generation:
+            raise COMError(
+                RPC_E_DISCONNECTED, "The object invoked has disconnected", None
+            )
+        return func(self, *args)
+
+    return wrapper
+
+
+class _SimulatedUnknown:
+    _supported_ = frozenset()
+    # attributes holding the objects implementing more interfaces
+    _delegates_ = ()
+
+    @_com_method
+    def QueryInterface(self, interface, iid=None):
+        key = _iid_key(interface._iid_)
+        if key in self._supported_:
+            return self
+        for name in self._delegates_:
+            delegate = getattr(self, name)
+            if key in delegate._supported_:
+                return delegate
+        raise COMError(E_NOINTERFACE, "No such interface supported", None)
+
+    def AddRef(self):
+        return 1
+
+    def Release(self):
+        return 0
+
+
+class SimulatedPropVariant:
+    """Stands in for PROPVARIANT as returned by IPropertyStore.GetValue."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def GetValue(self, copy=False):
+        if isinstance(self.value, bytes) and not copy:
+            return memoryview(self.value)
+        return self.value
+
+    def clear(self):
+        self.value = None
+
+
+class SimulatedPropertyStore(_SimulatedUnknown):
+    def __init__(self, system, properties):
+        self._system = system
+        self._properties = properties
+
+    @_com_method
+    def GetCount(self):
+        return len(self._properties)
+
+    @_com_method
+    def GetAt(self, index):
+        return list(self._properties)[index]
+
+    @_com_method
+    def GetValue(self, key):
+        # real keys are PROPERTYKEY structures
+        key = PropertyKey.from_struct(key)
+        return SimulatedPropVariant(self._properties.get(key))
+
+    def GetValueInto(self, key, pv):
+        # same COM call as GetValue, into pv rather than a new PROPVARIANT,
+        # its memory is released by SimulatedBackend.ClearPropVariant()
+        value = self.GetValue(key).value
+        memory = _fill_propvariant(pv, value)
+        self._system._propvariant_memory[addressof(pv)] = memory
+        return pv
+
+    @_com_method
+    def SetValue(self, key, value):
+        raise COMError(-0x7FFCFFFB, "Access denied", None)  # STG_E_ACCESSDENIED
+
+    @_com_method
+    def Commit(self):
+        return S_OK
+
+
+class SimulatedMeter(_SimulatedUnknown):
+    """IAudioMeterInformation of a SimulatedDevice or SimulatedSession."""
+
+    _supported_ = frozenset({IID_IUnknown, IID_IAudioMeterInformation})
+
+    def __init__(self, system, channels=2):
+        self._system = system
+        # set them to simulate a signal
+        self.peaks = [0.0] * channels
+
+    @_com_method
+    def GetPeakValue(self):
+        return max(self.peaks)
+
+    @_com_method
+    def GetMeteringChannelCount(self):
+        return len(self.peaks)
+
+    @_com_method
+    def GetChannelsPeakValues(self, channel_count, peak_values):
+        if channel_count != len(self.peaks):
+            raise COMError(E_INVALIDARG, "Invalid channel count", None)
+        for i, peak in enumerate(self.peaks):
+            peak_values[i] = peak
+
+    @_com_method
+    def QueryHardwareSupport(self):
+        # no hardware metering
+        return 0
+
+
+class SimulatedEndpointVolume(_SimulatedUnknown):
+    """IAudioEndpointVolume of a SimulatedDevice."""
+
+    _supported_ = frozenset({IID_IUnknown, IID_IAudioEndpointVolume})
+
+    min_db = -65.25
+    max_db = 0.0
+    increment_db = 0.03125
+
+    def __init__(self, system, channels=2):
+        self._system = system
+        self._callbacks = []
+        self.volume = 1.0
+        self.mute = False
+        self.channel_volumes = [1.0] * channels
+
+    def _notify(self, event_context):
+        data = SIMULATED_VOLUME_NOTIFICATION_DATA()
+        if event_context:
+            data.guidEventContext.Data[:] = bytes(event_context.contents)
+        data.bMuted = self.mute
+        data.fMasterVolume = self.volume
+        data.nChannels = len(self.channel_volumes)
+        for i, volume in enumerate(self.channel_volumes[:8]):
+            data.afChannelVolumes[i] = volume
+        notify = pointer(data)
+        for callback in list(self._callbacks):
+            callback.OnNotify(notify)
+
+    def _to_db(self, level):
+        return self.min_db + (self.max_db - self.min_db) * level
+
+    def _to_scalar(self, level_db):
+        level = (level_db - self.min_db) / (self.max_db - self.min_db)
+        return max(0.0, min(1.0, level))
+
+    @_com_method
+    def RegisterControlChangeNotify(self, callback):
+        self._callbacks.append(callback)
+
+    @_com_method
+    def UnregisterControlChangeNotify(self, callback):
+        self._callbacks.remove(callback)
+
+    @_com_method
+    def GetChannelCount(self):
+        return len(self.channel_volumes)
+
+    @_com_method
+    def SetMasterVolumeLevel(self, level_db, event_context):
+        self.volume = self._to_scalar(level_db)
+        self._notify(event_context)
+
+    @_com_method
+    def SetMasterVolumeLevelScalar(self, level, event_context):
+        self.volume = level
+        self._notify(event_context)
+
+    @_com_method
+    def GetMasterVolumeLevel(self):
+        return self._to_db(self.volume)
+
+    @_com_method
+    def GetMasterVolumeLevelScalar(self):
+        return self.volume
+
+    @_com_method
+    def SetChannelVolumeLevel(self, channel, level_db, event_context):
+        self.channel_volumes[channel] = self._to_scalar(level_db)
+        self._notify(event_context)
+
+    @_com_method
+    def SetChannelVolumeLevelScalar(self, channel, level, event_context):
+        self.channel_volumes[channel] = level
+        self._notify(event_context)
+
+    @_com_method
+    def GetChannelVolumeLevel(self, channel):
+        return self._to_db(self.channel_volumes[channel])
+
+    @_com_method
+    def GetChannelVolumeLevelScalar(self, channel):
+        return self.channel_volumes[channel]
+
+    @_com_method
+    def SetMute(self, mute, event_context):
+        self.mute = bool(mute)
+        self._notify(event_context)
+
+    @_com_method
+    def GetMute(self):
+        return int(self.mute)
+
+    @_com_method
+    def GetVolumeStepInfo(self):
+        steps = 100
+        return round(self.volume * (steps - 1)), steps
+
+    @_com_method
+    def VolumeStepUp(self, event_context):
+        self.volume = min(1.0, self.volume + 0.01)
+        self._notify(event_context)
+
+    @_com_method
+    def VolumeStepDown(self, event_context):
+        self.volume = max(0.0, self.volume - 0.01)
+        self._notify(event_context)
+
+    @_com_method
+    def QueryHardwareSupport(self):
+        return 0
+
+    @_com_method
+    def GetVolumeRange(self):
+        return self.min_db, self.max_db, self.increment_db
+
+
+class SimulatedSession(_SimulatedUnknown):
+    """
+    An audio session, implements IAudioSessionControl2,
+    ISimpleAudioVolume and IChannelAudioVolume.
+    """
+
+    _supported_ = frozenset(
+        {
+            IID_IUnknown,
+            IID_IAudioSessionControl,
+            IID_IAudioSessionControl2,
+            IID_ISimpleAudioVolume,
+            IID_IChannelAudioVolume,
+        }
+    )
+    _delegates_ = ("meter",)
+
+    def __init__(self, system, device, pid, app_exec, index, channels=2):
+        self._system = system
+        self.meter = SimulatedMeter(system, channels)
+        self.device = device
+        self.pid = pid
+        self.app_exec = app_exec
+        self.state = AUDIO_SESSION_STATE_ACTIVE
+        self.display_name = ""
+        self.icon_path = ""
+        self.grouping_param = None
+        self.volume = 1.0
+        self.mute = False
+        self.channel_volumes = [1.0] * channels
+        self.identifier = (
+            f"{device.id}|\\Device\\HarddiskVolume1\\{app_exec}"
+            "%b{00000000-0000-0000-0000-000000000000}"
+        )
+        self.instance_identifier = f"{self.identifier}|{index}%b{pid}"
+        self._callbacks = []
+        # disconnected by an audio service restart
+        self._service_generation = system._service_generation
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} app='{self.app_exec}' pid='{self.pid}'/>"
+
+    def _notify(self, name, *args):
+        for callback in list(self._callbacks):
+            getattr(callback, name)(*args)
+
+    # ____ simulation controls ____
+
+    def set_state(self, state):
+        """Changes the session state and fires OnStateChanged."""
+        self.state = state
+        self._notify("OnStateChanged", state)
+        if state == AUDIO_SESSION_STATE_EXPIRED:
+            self.device.session_manager._sessions.remove(self)
+
+    def expire(self):
+        self.set_state(AUDIO_SESSION_STATE_EXPIRED)
+
+    def disconnect(self, reason=0):
+        """Fires OnSessionDisconnected, reason 0 is DisconnectReasonDeviceRemoval."""
+        self._notify("OnSessionDisconnected", reason)
+
+    # ____ IAudioSessionControl ____
+
+    @_com_method
+    def GetState(self):
+        return self.state
+
+    @_com_method
+    def GetDisplayName(self):
+        return self.display_name
+
+    @_com_method
+    def SetDisplayName(self, value, event_context):
+        self.display_name = value
+        self._notify("OnDisplayNameChanged", value, event_context or _null_context())
+
+    @_com_method
+    def GetIconPath(self):
+        return self.icon_path
+
+    @_com_method
+    def SetIconPath(self, value, event_context):
+        self.icon_path = value
+        self._notify("OnIconPathChanged", value, event_context or _null_context())
+
+    @_com_method
+    def GetGroupingParam(self):
+        return self.grouping_param
+
+    @_com_method
+    def SetGroupingParam(self, grouping, event_context):
+        self.grouping_param = grouping
+        self._notify(
+            "OnGroupingParamChanged", grouping, event_context or _null_context()
+        )
+
+    @_com_method
+    def RegisterAudioSessionNotification(self, callback):
+        self._callbacks.append(callback)
+
+    @_com_method
+    def UnregisterAudioSessionNotification(self, callback):
+        self._callbacks.remove(callback)
+
+    # ____ IAudioSessionControl2 ____
+
+    @_com_method
+    def GetSessionIdentifier(self):
+        return self.identifier
+
+    @_com_method
+    def GetSessionInstanceIdentifier(self):
+        return self.instance_identifier
+
+    @_com_method
+    def GetProcessId(self):
+        return self.pid
+
+    @_com_method
+    def IsSystemSoundsSession(self):
+        return S_OK if self.pid == 0 else S_FALSE
+
+    @_com_method
+    def SetDuckingPreferences(self, opt_out):
+        return S_OK
+
+    # ____ ISimpleAudioVolume ____
+
+    @_com_method
+    def SetMasterVolume(self, level, event_context):
+        self.volume = level
+        self._notify(
+            "OnSimpleVolumeChanged",
+            level,
+            int(self.mute),
+            event_context or _null_context(),
+        )
+
+    @_com_method
+    def GetMasterVolume(self):
+        return self.volume
+
+    @_com_method
+    def SetMute(self, mute, event_context):
+        self.mute = bool(mute)
+        self._notify(
+            "OnSimpleVolumeChanged",
+            self.volume,
+            int(self.mute),
+            event_context or _null_context(),
+        )
+
+    @_com_method
+    def GetMute(self):
+        return int(self.mute)
+
+    # ____ IChannelAudioVolume ____
+
+    @_com_method
+    def GetChannelCount(self):
+        return len(self.channel_volumes)
+
+    @_com_method
+    def SetChannelVolume(self, index, level, event_context):
+        self.channel_volumes[index] = level
+        volumes = (c_float * 8)(*self.channel_volumes[:8])
+        self._notify(
+            "OnChannelVolumeChanged",
+            len(self.channel_volumes),
+            volumes,
+            index,
+            event_context or _null_context(),
+        )
+
+    @_com_method
+    def GetChannelVolume(self, index):
+        return self.channel_volumes[index]
+
+
+class SimulatedSessionEnumerator(_SimulatedUnknown):
+    def __init__(self, system, sessions):
+        self._system = system
+        self._sessions = sessions
+
+    @_com_method
+    def GetCount(self):
+        return len(self._sessions)
+
+    @_com_method
+    def GetSession(self, index):
+        return self._sessions[index]
+
+
+class SimulatedSessionManager(_SimulatedUnknown):
+    """IAudioSessionManager2 of a SimulatedDevice."""
+
+    _supported_ = frozenset(
+        {IID_IUnknown, IID_IAudioSessionManager, IID_IAudioSessionManager2}
+    )
+
+    def __init__(self, system, device):
+        self._system = system
+        self.device = device
+        self._sessions = []
+        self._callbacks = []
+        # disconnected by an audio service restart
+        self._service_generation = system._service_generation
+
+    def _add(self, session):
+        self._sessions.append(session)
+        for callback in list(self._callbacks):
+            callback.OnSessionCreated(session)
+
+    @_com_method
+    def GetSessionEnumerator(self):
+        # a snapshot, like the real enumerator
+        return SimulatedSessionEnumerator(self._system, list(self._sessions))
+
+    @_com_method
+    def RegisterSessionNotification(self, callback):
+        self._callbacks.append(callback)
+
+    @_com_method
+    def UnregisterSessionNotification(self, callback):
+        self._callbacks.remove(callback)
+
+    @_com_method
+    def RegisterDuckNotification(self, session_id, callback):
+        return S_OK
+
+    @_com_method
+    def UnregisterDuckNotification(self, callback):
+        return S_OK
+
+
+def _wave_format_bytes(wave_format):
+    """Bytes of a WAVEFORMATEX pointer, with its cbSize extra bytes."""
+    address = cast(wave_format, c_void_p).value
+    # sizeof(WAVEFORMATEX) + cbSize
+    size = 18 + struct.unpack_from("<H", string_at(address + 16, 2))[0]
+    return string_at(address, size)
+
+
+def _wave_format_extensible(channels, sample_rate, bits_per_sample, subformat):
+    block_align = bits_per_sample // 8 * channels
+    return struct.pack(
+        "<HHIIHHHHI16s",
+        WAVE_FORMAT_EXTENSIBLE,
+        channels,
+        sample_rate,
+        sample_rate * block_align,
+        block_align,
+        bits_per_sample,
+        22,
+        bits_per_sample,
+        (1 << channels) - 1,
+        uuid.UUID(subformat).bytes_le,
+    )
+
+
+def simulated_mix_format(channels=2, sample_rate=48000):
+    """
+    Bytes of the WAVEFORMATEXTENSIBLE of a shared mode mix format,
+    32 bits float samples like Windows.
+    """
+    return _wave_format_extensible(
+        channels, sample_rate, 32, KSDATAFORMAT_SUBTYPE_IEEE_FLOAT
+    )
+
+
+def simulated_device_format(channels=2, sample_rate=48000, bits_per_sample=16):
+    """
+    Bytes of the WAVEFORMATEXTENSIBLE of a PCM device format,
+    the PKEY_AudioEngine_DeviceFormat blob.
+    """
+    return _wave_format_extensible(
+        channels, sample_rate, bits_per_sample, KSDATAFORMAT_SUBTYPE_PCM
+    )
+
+
+class SimulatedCaptureClient(_SimulatedUnknown):
+    """
+    IAudioCaptureClient of a SimulatedAudioClient, returns the packets
+    given to push().
+    """
+
+    _supported_ = frozenset({IID_IUnknown, IID_IAudioCaptureClient})
+
+    def __init__(self, system, client):
+        self._system = system
+        self._client = client
+        self._packets = deque()
+        # buffer returned by GetBuffer, until ReleaseBuffer
+        self._current = None
+        self.device_position = 0
+
+    def push(self, data, flags=0):
+        """
+        Queues a packet of synthetic audio (bytes-like, e.g. a NumPy array,
+        in the format of the stream) and signals the stream event.
+        """
+        data = memoryview(data).cast("B").tobytes()
+        frames = len(data) // self._client.block_align
+        self._packets.append((data, frames, flags))
+        self._client._signal()
+
+    @_com_method
+    def GetBuffer(self):
+        if self._current is not None:
+            raise COMError(AUDCLNT_E_OUT_OF_ORDER, "Buffer not released", None)
+        qpc_position = time.perf_counter_ns() // 100
+        if not self._packets:
+            # AUDCLNT_S_BUFFER_EMPTY
+            return POINTER(c_ubyte)(), 0, 0, self.device_position, qpc_position
+        data, frames, flags = self._packets[0]
+        buffer = (c_ubyte * len(data)).from_buffer_copy(data)
+        self._current = (buffer, frames)
+        return (
+            cast(buffer, POINTER(c_ubyte)),
+            frames,
+            flags,
+            self.device_position,
+            qpc_position,
+        )
+
+    @_com_method
+    def ReleaseBuffer(self, frames_read):
+        if self._current is None:
+            raise COMError(AUDCLNT_E_OUT_OF_ORDER, "No buffer", None)
+        if frames_read not in (0, self._current[1]):
+            raise COMError(AUDCLNT_E_INVALID_SIZE, "Invalid size", None)
+        self._current = None
+        if frames_read:
+            self._packets.popleft()
+            self.device_position += frames_read
+
+    @_com_method
+    def GetNextPacketSize(self):
+        return self._packets[0][1] if self._packets else 0
+
+
+class SimulatedRenderClient(_SimulatedUnknown):
+    """
+    IAudioRenderClient of a SimulatedAudioClient, the frames written
+    stay queued (the padding) until SimulatedAudioClient.process() plays
+    them into rendered.
+    """
+
+    _supported_ = frozenset({IID_IUnknown, IID_IAudioRenderClient})
+
+    def __init__(self, system, client):
+        self._system = system
+        self._client = client
+        self._lock = RLock()
+        self.queued = bytearray()
+        self.rendered = bytearray()
+        # buffer returned by GetBuffer, until ReleaseBuffer
+        self._current = None
+
+    @property
+    def padding(self):
+        return len(self.queued) // self._client.block_align
+
+    @_com_method
+    def GetBuffer(self, frames):
+        if self._current is not None:
+            raise COMError(AUDCLNT_E_OUT_OF_ORDER, "Buffer not released", None)
+        if self.padding + frames > self._client.buffer_frames:
+            raise COMError(AUDCLNT_E_BUFFER_TOO_LARGE, "Buffer too large", None)
+        buffer = (c_ubyte * (frames * self._client.block_align))()
+        self._current = (buffer, frames)
+        return cast(buffer, POINTER(c_ubyte))
+
+    @_com_method
+    def ReleaseBuffer(self, frames_written, flags):
+        if self._current is None:
+            raise COMError(AUDCLNT_E_OUT_OF_ORDER, "No buffer", None)
+        buffer, frames = self._current
+        if frames_written > frames:
+            raise COMError(AUDCLNT_E_INVALID_SIZE, "Invalid size", None)
+        self._current = None
+        size = frames_written * self._client.block_align
+        with self._lock:
+            if flags & AUDCLNT_BUFFERFLAGS_SILENT:
+                self.queued += bytes(size)
+            else:
+                self.queued += bytes(buffer)[:size]
+
+    def _play(self, frames):
+        size = min(frames * self._client.block_align, len(self.queued))
+        with self._lock:
+            self.rendered += self.queued[:size]
+            del self.queued[:size]
+        return size // self._client.block_align
+
+
+class SimulatedAudioClient(_SimulatedUnknown):
+    """IAudioClient, a new one for every IMMDevice.Activate."""
+
+    _supported_ = frozenset({IID_IUnknown, IID_IAudioClient})
+
+    def __init__(self, system, device):
+        self._system = system
+        self.device = device
+        self.flags = 0
+        # bytes of the WAVEFORMATEX given to Initialize
+        self.format = None
+        self.buffer_frames = 0
+        self.event = None
+        self.started = False
+        self.capture_client = SimulatedCaptureClient(system, self)
+        self.render_client = SimulatedRenderClient(system, self)
+        self._mix_format = None
+        self._closest_match = None
+
+    @property
+    def block_align(self):
+        return struct.unpack_from("<H", self.format, 12)[0]
+
+    @property
+    def sample_rate(self):
+        return struct.unpack_from("<I", self.format, 4)[0]
+
+    @property
+    def period_frames(self):
+        return DEFAULT_DEVICE_PERIOD * self.sample_rate // 10000000
+
+    def process(self, frames=None):
+        """
+        Plays up to frames (one device period by default) of the render
+        buffer, like the audio engine does every period, and signals the
+        stream event. Returns the frames played, fewer is an underrun.
+        """
+        if frames is None:
+            frames = self.period_frames
+        played = self.render_client._play(frames)
+        self._signal()
+        return played
+
+    def _signal(self):
+        if self.event is not None:
+            self.event.set()
+
+    def _check_initialized(self):
+        if self.format is None:
+            raise COMError(AUDCLNT_E_NOT_INITIALIZED, "Not initialized", None)
+
+    @_com_method
+    def Initialize(
+        self, share_mode, flags, buffer_duration, periodicity, wave_format, session_guid
+    ):
+        if self.format is not None:
+            raise COMError(AUDCLNT_E_ALREADY_INITIALIZED, "Already initialized", None)
+        if flags & AUDCLNT_STREAMFLAGS_LOOPBACK and self.device.flow != E_RENDER:
+            raise COMError(AUDCLNT_E_WRONG_ENDPOINT_TYPE, "Wrong endpoint type", None)
+        raw = _wave_format_bytes(wave_format)
+        if share_mode == AUDCLNT_SHAREMODE_SHARED:
+            mix_format = self.device.mix_format
+            # without AUTOCONVERTPCM, channels and rate are the mix ones
+            if not flags & AUDCLNT_STREAMFLAGS_AUTOCONVERTPCM and (
+                raw[2:8] != mix_format[2:8]
+            ):
+                raise COMError(AUDCLNT_E_UNSUPPORTED_FORMAT, "Unsupported", None)
+        elif raw != self.device.device_format:
+            raise COMError(AUDCLNT_E_UNSUPPORTED_FORMAT, "Unsupported", None)
+        self.format = raw
+        self.flags = flags
+        duration = max(buffer_duration, DEFAULT_DEVICE_PERIOD)
+        self.buffer_frames = duration * self.sample_rate // 10000000
+
+    @_com_method
+    def GetBufferSize(self):
+        self._check_initialized()
+        return self.buffer_frames
+
+    @_com_method
+    def GetStreamLatency(self):
+        self._check_initialized()
+        return DEFAULT_DEVICE_PERIOD
+
+    @_com_method
+    def GetCurrentPadding(self):
+        self._check_initialized()
+        if self.device.flow == E_RENDER and not (
+            self.flags & AUDCLNT_STREAMFLAGS_LOOPBACK
+        ):
+            return self.render_client.padding
+        return sum(packet[1] for packet in self.capture_client._packets)
+
+    @_com_method
+    def GetMixFormat(self):
+        # kept alive, the caller frees it with CoTaskMemFree
+        self._mix_format = (c_ubyte * len(self.device.mix_format)).from_buffer_copy(
+            self.device.mix_format
+        )
+        return cast(self._mix_format, POINTER(c_ubyte))
+
+    @_com_method
+    def IsFormatSupported(self, share_mode, wave_format):
+        raw = _wave_format_bytes(wave_format)
+        if share_mode == AUDCLNT_SHAREMODE_SHARED:
+            if raw == self.device.mix_format:
+                return POINTER(c_ubyte)()
+            # S_FALSE, the closest match is the mix format
+            self._closest_match = (c_ubyte * len(self.device.mix_format))(
+                *self.device.mix_format
+            )
+            return cast(self._closest_match, POINTER(c_ubyte))
+        if raw == self.device.device_format:
+            return POINTER(c_ubyte)()
+        raise COMError(AUDCLNT_E_UNSUPPORTED_FORMAT, "Unsupported", None)
+
+    @_com_method
+    def GetDevicePeriod(self):
+        return DEFAULT_DEVICE_PERIOD, MINIMUM_DEVICE_PERIOD
+
+    @_com_method
+    def Start(self):
+        self._check_initialized()
+        self.started = True
+
+    @_com_method
+    def Stop(self):
+        self._check_initialized()
+        self.started = False
+
+    @_com_method
+    def Reset(self):
+        self._check_initialized()
+        self.capture_client._packets.clear()
+        self.render_client.queued.clear()
+
+    @_com_method
+    def SetEventHandle(self, event):
+        self._check_initialized()
+        if not self.flags & AUDCLNT_STREAMFLAGS_EVENTCALLBACK:
+            raise COMError(AUDCLNT_E_EVENTHANDLE_NOT_EXPECTED, "No event", None)
+        self.event = event
+
+    @_com_method
+    def GetService(self, iid):
+        self._check_initialized()
+        if _iid_key(iid) == IID_IAudioCaptureClient:
+            if self.device.flow == E_RENDER and not (
+                self.flags & AUDCLNT_STREAMFLAGS_LOOPBACK
+            ):
+                raise COMError(
+                    AUDCLNT_E_WRONG_ENDPOINT_TYPE, "Wrong endpoint type", None
+                )
+            return self.capture_client
+        if _iid_key(iid) == IID_IAudioRenderClient:
+            if self.device.flow != E_RENDER:
+                raise COMError(
+                    AUDCLNT_E_WRONG_ENDPOINT_TYPE, "Wrong endpoint type", None
+                )
+            return self.render_client
+        raise COMError(E_NOINTERFACE, "No such interface supported", None)
+
+
+class SimulatedDevice(_SimulatedUnknown):
+    """An audio endpoint, implements IMMDevice and IMMEndpoint."""
+
+    _supported_ = frozenset({IID_IUnknown, IID_IMMDevice, IID_IMMEndpoint})
+
+    def __init__(self, system, device_id, flow, state, properties):
+        self._system = system
+        self.id = device_id
+        self.flow = flow
+        self.state = state
+        self.properties = properties
+        self.session_manager = SimulatedSessionManager(system, self)
+        self.endpoint_volume = SimulatedEndpointVolume(system)
+        self.meter = SimulatedMeter(system)
+        # every IAudioClient activated, latest last
+        self.audio_clients = []
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} id='{self.id}'/>"
+
+    @property
+    def sessions(self):
+        return list(self.session_manager._sessions)
+
+    @property
+    def device_format(self):
+        """
+        WAVEFORMATEXTENSIBLE bytes of PKEY_AudioEngine_DeviceFormat,
+        see SimulatedAudioSystem.set_device_format()
+        """
+        value = self.properties.get(PKEY_AudioEngine_DeviceFormat)
+        return simulated_device_format() if value is None else value
+
+    @property
+    def mix_format(self):
+        """WAVEFORMATEXTENSIBLE bytes, float32 in the device format layout"""
+        channels, sample_rate = struct.unpack_from("<HI", self.device_format, 2)
+        return simulated_mix_format(channels, sample_rate)
+
+    @_com_method
+    def Activate(self, iid, clsctx, activation_params):
+        key = _iid_key(iid)
+        if key == IID_IAudioClient:
+            client = SimulatedAudioClient(self._system, self)
+            self.audio_clients.append(client)
+            return client
+        for interface in (self.session_manager, self.endpoint_volume, self.meter):
+            if key in interface._supported_:
+                return interface
+        raise COMError(E_NOINTERFACE, "No such interface supported", None)
+
+    @_com_method
+    def OpenPropertyStore(self, stgm_access):
+        return SimulatedPropertyStore(self._system, self.properties)
+
+    @_com_method
+    def GetId(self):
+        return self.id
+
+    @_com_method
+    def GetState(self):
+        return self.state
+
+    @_com_method
+    def GetDataFlow(self):
+        return self.flow
+
+
+class SimulatedDeviceCollection(_SimulatedUnknown):
+    def __init__(self, system, devices):
+        self._system = system
+        self._devices = devices
+
+    @_com_method
+    def GetCount(self):
+        return len(self._devices)
+
+    @_com_method
+    def Item(self, index):
+        return self._devices[index]
+
+
+class SimulatedDeviceEnumerator(_SimulatedUnknown):
+    """IMMDeviceEnumerator of a SimulatedAudioSystem."""
+
+    def __init__(self, system):
+        self._system = system
+        self._service_generation = system._service_generation
+
+    @_com_method
+    def EnumAudioEndpoints(self, flow, state_mask):
+        devices = [
+            device
+            for device in self._system.devices.values()
+            if (flow == E_ALL or device.flow == flow) and device.state & state_mask
+        ]
+        return SimulatedDeviceCollection(self._system, devices)
+
+    @_com_method
+    def GetDefaultAudioEndpoint(self, flow, role):
+        device_id = self._system.defaults.get((flow, role))
+        if device_id is None:
+            raise COMError(E_NOTFOUND, "Element not found.", None)
+        return self._system.devices[device_id]
+
+    @_com_method
+    def GetDevice(self, device_id):
+        try:
+            return self._system.devices[device_id]
+        except KeyError:
+            raise COMError(E_NOTFOUND, "Element not found.", None)
+
+    @_com_method
+    def RegisterEndpointNotificationCallback(self, client):
+        self._system._notification_clients.append(client)
+
+    @_com_method
+    def UnregisterEndpointNotificationCallback(self, client):
+        self._system._notification_clients.remove(client)
+
+
+class SimulatedAudioSystem:
+    """
+    Holds the simulated devices, sessions and processes.
+
+    Every call on a simulated COM object is counted in 'calls',
+    by method name.
+    """
+
+    def __init__(self):
+        self.devices = {}
+        # (flow, role) -> device id
+        self.defaults = {}
+        # pid -> executable name
+        self.processes = {}
+        # pid -> creation time, a counter
+        self.process_create_times = {}
+        # pid -> full executable path, parent pid, top level window classes
+        self.process_exes = {}
+        self.process_parents = {}
+        self.window_classes = {}
+        self.calls = Counter()
+        self._notification_clients = []
+        self._next_pid = 1000
+        self._process_clock = 0
+        self._next_session = 0
+        self._service_generation = 0
+        # address of a PROPVARIANT -> memory it points to, see
+        # SimulatedPropertyStore.GetValueInto()
+        self._propvariant_memory = {}
+        self._lock = RLock()
+
+    def __repr__(self):
+        sessions = sum(len(d.session_manager._sessions) for d in self.devices.values())
+        return (
+            f"<{self.__class__.__name__} devices='{len(self.devices)}' "
+            f"sessions='{sessions}'/>"
+        )
+
+    def _notify(self, name, *args):
+        for client in list(self._notification_clients):
+            getattr(client, name)(*args)
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    # ____ devices ____
+
+    def add_device(
+        self,
+        name=None,
+        flow=E_RENDER,
+        state=DEVICE_STATE_ACTIVE,
+        device_id=None,
+        properties=None,
+    ):
+        """
+        Adds an endpoint and fires OnDeviceAdded.
+        The first active device of a flow becomes its default device.
+        """
+        with self._lock:
+            if device_id is None:
+                device_id = "{0.0.%d.00000000}.{%08x-0000-0000-0000-000000000000}" % (
+                    flow,
+                    len(self.devices),
+                )
+            if name is None:
+                name = "Simulated Device %d" % len(self.devices)
+            props = {
+                PKEY_Device_FriendlyName: name,
+                PKEY_Device_DeviceDesc: name.split(" (")[0],
+                PKEY_DeviceInterface_FriendlyName: "Simulated Audio",
+                PKEY_AudioEndpoint_FormFactor: 1 if flow == E_RENDER else 4,
+            }
+            props.update(properties or {})
+            device = SimulatedDevice(self, device_id, flow, state, props)
+            self.devices[device_id] = device
+        self._notify("OnDeviceAdded", device_id)
+        if state == DEVICE_STATE_ACTIVE and not any(
+            self.defaults.get((flow, role)) for role in ROLES
+        ):
+            self.set_default_device(device_id)
+        return device
+
+    def spawn_devices(self, count, flow=E_RENDER, properties=0):
+        """Adds count devices, each with 'properties' extra filler properties."""
+        devices = []
+        for i in range(count):
+            fmtid = "{%08X-0000-0000-0000-000000000000}" % (i % 16)
+            extra = {
+                PropertyKey(fmtid, pid): "value %d" % pid
+                for pid in range(100, 100 + properties)
+            }
+            devices.append(self.add_device(flow=flow, properties=extra))
+        return devices
+
+    def remove_device(self, device_id):
+        """Removes an endpoint, its sessions get disconnected."""
+        with self._lock:
+            device = self.devices.pop(device_id)
+            for key, default_id in list(self.defaults.items()):
+                if default_id == device_id:
+                    del self.defaults[key]
+        for session in device.sessions:
+            session.disconnect(0)
+        self._notify("OnDeviceRemoved", device_id)
+        return device
+
+    def set_device_state(self, device_id, state):
+        self.devices[device_id].state = state
+        self._notify("OnDeviceStateChanged", device_id, state)
+
+    def set_default_device(self, device_id, roles=ROLES):
+        device = self.devices[device_id]
+        for role in roles:
+            self.defaults[(device.flow, role)] = device_id
+            self._notify("OnDefaultDeviceChanged", device.flow, role, device_id)
+
+    def set_device_property(self, device_id, key, value):
+        """Changes a property and fires OnPropertyValueChanged."""
+        self.devices[device_id].properties[key] = value
+        self._notify("OnPropertyValueChanged", device_id, key)
+
+    def set_device_format(
+        self, device_id, channels=2, sample_rate=48000, bits_per_sample=16
+    ):
+        """
+        Changes the format of an endpoint (like in the sound control
+        panel), and so its mix format, fires OnPropertyValueChanged.
+        """
+        self.set_device_property(
+            device_id,
+            PKEY_AudioEngine_DeviceFormat,
+            simulated_device_format(channels, sample_rate, bits_per_sample),
+        )
+
+    def restart_service(self):
+        """
+        Simulates an audio service restart: all sessions get disconnected
+        (DisconnectReasonServerShutdown), then the existing sessions,
+        session managers and device enumerators fail with RPC_E_DISCONNECTED.
+        The devices get new session managers, without sessions.
+        """
+        for device in self.devices.values():
+            for session in device.sessions:
+                session.disconnect(1)
+        self._service_generation += 1
+        for device in self.devices.values():
+            device.session_manager = SimulatedSessionManager(self, device)
+
+    def default_device(self, flow=E_RENDER, role=1):
+        device_id = self.defaults.get((flow, role))
+        return self.devices.get(device_id)
+
+    # ____ sessions ____
+
+    def add_process(
+        self, app_exec, pid=None, exe=None, parent_pid=None, window_classes=()
+    ):
+        """
+        Adds a process, exe is its full path (default under C:\\Program Files),
+        parent_pid its parent process (default none).
+        """
+        with self._lock:
+            if pid is None:
+                pid = self._next_pid
+                self._next_pid += 1
+            self.processes[pid] = app_exec
+            # a new process, even when reusing a pid
+            self._process_clock += 1
+            self.process_create_times[pid] = float(self._process_clock)
+            if exe is None:
+                exe = "C:\\Program Files\\" + app_exec
+            self.process_exes[pid] = exe
+            self.process_parents[pid] = parent_pid
+            self.window_classes[pid] = list(window_classes)
+        return pid
+
+    def remove_process(self, pid):
+        with self._lock:
+            self.processes.pop(pid, None)
+            self.process_create_times.pop(pid, None)
+            self.process_exes.pop(pid, None)
+            self.process_parents.pop(pid, None)
+            self.window_classes.pop(pid, None)
+
+    def add_session(self, app_exec="app.exe", pid=None, device=None):
+        """
+        Adds a session for app_exec to device (default render device)
+        and fires OnSessionCreated.
+        """
+        if device is None:
+            device = self.default_device()
+            if device is None:
+                device = self.add_device()
+        if pid is None:
+            pid = self.add_process(app_exec)
+        with self._lock:
+            session = SimulatedSession(self, device, pid, app_exec, self._next_session)
+            self._next_session += 1
+        device.session_manager._add(session)
+        return session
+
+    def add_system_sounds_session(self, device=None):
+        return self.add_session("SndVol.exe", pid=0, device=device)
+
+    def spawn_sessions(self, count, device=None, app_execs=None):
+        """
+        Adds count sessions, the executable names cycle through app_execs
+        (default 'app0.exe', 'app1.exe', ...).
+        """
+        sessions = []
+        for i in range(count):
+            if app_execs:
+                app_exec = app_execs[i % len(app_execs)]
+            else:
+                app_exec = "app%d.exe" % i
+            sessions.append(self.add_session(app_exec, device=device))
+        return sessions
+
+    @property
+    def sessions(self):
+        return [s for device in self.devices.values() for s in device.sessions]
+
+
+class SimulatedBackend:
+    """pycaw backend, see pycaw.backend.set_backend(), on a SimulatedAudioSystem."""
+
+    def __init__(self, system=None):
+        self.system = SimulatedAudioSystem() if system is None else system
+
+    def CreateDeviceEnumerator(self):
+        self.system.calls["CoCreateInstance"] += 1
+        return SimulatedDeviceEnumerator(self.system)
+
+    def InitializeThread(self):
+        pass
+
+    def UninitializeThread(self):
+        pass
+
+    def CreateEvent(self):
+        return Event()
+
+    def WaitForEvent(self, handle, timeout):
+        # auto-reset
+        signaled = handle.wait(timeout)
+        handle.clear()
+        return signaled
+
+    def CloseEvent(self, handle):
+        pass
+
+    def FreeMemory(self, memory):
+        pass
+
+    def ClearPropVariant(self, pv):
+        self.system._propvariant_memory.pop(addressof(pv), None)
+        memset(addressof(pv), 0, sizeof(pv))
+
+    def GetProcessName(self, pid):
+        self.system.calls["GetProcessName"] += 1
+        try:
+            return self.system.processes[pid]
+        except KeyError:
+            raise psutil.NoSuchProcess(pid)
+
+    def GetProcessCreateTime(self, pid):
+        self.system.calls["GetProcessCreateTime"] += 1
+        try:
+            return self.system.process_create_times[pid]
+        except KeyError:
+            raise psutil.NoSuchProcess(pid)
+
+    def GetProcessExe(self, pid):
+        self.system.calls["GetProcessExe"] += 1
+        try:
+            return self.system.process_exes[pid]
+        except KeyError:
+            raise psutil.NoSuchProcess(pid)
+
+    def GetParentProcessId(self, pid):
+        self.system.calls["GetParentProcessId"] += 1
+        if pid not in self.system.processes:
+            raise psutil.NoSuchProcess(pid)
+        return self.system.process_parents.get(pid)
+
+    def GetWindowClasses(self, pid):
+        self.system.calls["GetWindowClasses"] += 1
+        return list(self.system.window_classes.get(pid, ()))
+
+    def IterProcesses(self):
+        self.system.calls["IterProcesses"] += 1
+        with self.system._lock:
+            processes = [
+                (pid, name, self.system.process_create_times[pid])
+                for pid, name in self.system.processes.items()
+            ]
+        return iter(processes)
+
+
+__all__ = (
+    "COMError",
+    "SimulatedAudioClient",
+    "SimulatedCaptureClient",
+    "SimulatedRenderClient",
+    "SimulatedAudioSystem",
+    "SimulatedBackend",
+    "SimulatedDevice",
+    "SimulatedSession",
+    "SIMULATED_VOLUME_NOTIFICATION_DATA",
+)
@@ -0,0 +1,576 @@
+"""
+WASAPI audio streams of endpoints, see AudioCaptureStream and AudioRenderStream.
+
+Packets are views over the Core Audio buffers rather than copies,
+NumPy is optional and only needed for AudioPacket.array.
+"""
+
+import threading
+import time
+from ctypes import c_ubyte, c_void_p, cast
+
+from pycaw.api.audioclient import IAudioCaptureClient, IAudioRenderClient
+from pycaw.backend import get_backend
+from pycaw.callbacks import MMNotificationClient
+from pycaw.compat import COMError
+from pycaw.constants import (
+    AUDCLNT_BUFFERFLAGS,
+    AUDCLNT_E_UNSUPPORTED_FORMAT,
+    AUDCLNT_SHAREMODE,
+    AUDCLNT_STREAMFLAGS,
+    REFTIMES_PER_SEC,
+)
+from pycaw.formats import AudioFormat
+from pycaw.propkeys import PKEY_AudioEngine_DeviceFormat, PropertyKey
+from pycaw.utils import AudioDevice, AudioUtilities
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# longest wait for the stream event, loopback streams aren't signaled
+# while nothing is playing, so packets are also polled in between
+_WAIT_SLICE = 0.1
+
+
+class AudioPacket:
+    """
+    Frames of audio of a stream.
+
+    Captured packets are views over the IAudioCaptureClient buffer, only
+    valid until the stream moves on to the next packet: data then raises
+    ValueError, NumPy arrays got from array would silently see reused memory.
+    copy() the packets to keep.
+    """
+
+    __slots__ = (
+        "format",
+        "frames",
+        "flags",
+        "device_position",
+        "qpc_position",
+        "_buffer",
+        "_view",
+    )
+
+    def __init__(
+        self, format, buffer, frames, flags=0, device_position=0, qpc_position=0
+    ):
+        self.format = format
+        self.frames = frames
+        self.flags = AUDCLNT_BUFFERFLAGS(flags)
+        self.device_position = device_position
+        self.qpc_position = qpc_position
+        self._buffer = buffer
+        self._view = None
+
+    def __repr__(self):
+        return "<%s frames=%d flags=%r>" % (
+            self.__class__.__name__,
+            self.frames,
+            self.flags,
+        )
+
+    @property
+    def silent(self):
+        """The data is to be treated as silence, whatever its content"""
+        return bool(self.flags & AUDCLNT_BUFFERFLAGS.SILENT)
+
+    @property
+    def discontinuity(self):
+        """Frames were lost before this packet (glitch)"""
+        return bool(self.flags & AUDCLNT_BUFFERFLAGS.DATA_DISCONTINUITY)
+
+    @property
+    def data(self):
+        """memoryview of the frames bytes"""
+        if self._buffer is None:
+            raise ValueError("released packet, copy() the packets to keep")
+        if self._view is None:
+            self._view = memoryview(self._buffer).cast("B")
+        return self._view
+
+    @property
+    def array(self):
+        """(frames, channels) NumPy view of the samples"""
+        if self._buffer is None:
+            raise ValueError("released packet, copy() the packets to keep")
+        dtype = self.format.dtype
+        if numpy is None or dtype is None:
+            raise ValueError("no NumPy dtype for %r" % self.format)
+        array = numpy.frombuffer(self._buffer, dtype=dtype)
+        return array.reshape(self.frames, self.format.channels)
+
+    def copy(self):
+        """Returns a packet owning a copy of the frames."""
+        return AudioPacket(
+            self.format,
+            bytearray(self.data),
+            self.frames,
+            self.flags,
+            self.device_position,
+            self.qpc_position,
+        )
+
+    def _release(self):
+        self._buffer = None
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                # still exported, e.g. by a NumPy array made from it
+                pass
+            self._view = None
+
+
+class _FormatCacheNotification(MMNotificationClient):
+    def __init__(self, cache):
+        super().__init__()
+        self._cache = cache
+
+    def on_device_removed(self, removed_device_id):
+        self._cache.invalidate(removed_device_id)
+
+    def on_device_state_changed(self, device_id, new_state, new_state_id):
+        self._cache.invalidate(device_id)
+
+    def on_property_value_changed(self, device_id, property_struct, fmtid, pid):
+        if PropertyKey.from_struct(property_struct) == PKEY_AudioEngine_DeviceFormat:
+            self._cache.invalidate(device_id)
+
+
+class FormatCache:
+    """
+    Format negotiation answers by endpoint id: the mix formats and the
+    IsFormatSupported answers, so that opening streams doesn't probe
+    the endpoints again.
+
+    The entries of an endpoint are dropped when its device format
+    (PKEY_AudioEngine_DeviceFormat) changes, when it's removed or when its
+    state changes, followed by an MMNotificationClient registered on first
+    use. Same as for the other notifications, COM needs to be in MTA
+    (sys.coinit_flags = 0) for them to be delivered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backend = None
+        self._enumerator = None
+        self._notification = None
+        # bumped by invalidate(), answers probed meanwhile aren't stored
+        self._generation = 0
+        # endpoint id -> AudioFormat
+        self._mix_formats = {}
+        # endpoint id -> {(share mode, format bytes): (supported, closest)}
+        self._supported = {}
+
+    def _watch(self):
+        backend = get_backend()
+        if backend is self._backend:
+            return
+        # entries and notifications of another backend are meaningless
+        self.close()
+        enumerator = AudioUtilities.GetDeviceEnumerator()
+        notification = _FormatCacheNotification(self)
+        enumerator.RegisterEndpointNotificationCallback(notification)
+        self._backend = backend
+        self._enumerator = enumerator
+        self._notification = notification
+
+    def close(self):
+        """Stops following the endpoints, and drops all the entries."""
+        if self._notification is not None:
+            try:
+                self._enumerator.UnregisterEndpointNotificationCallback(
+                    self._notification
+                )
+            except COMError:
+                # e.g. the audio service restarted
+                pass
+        self._backend = self._enumerator = self._notification = None
+        self.invalidate()
+
+    def invalidate(self, device_id=None):
+        """Drops the entries of the endpoint device_id, of all by default."""
+        with self._lock:
+            self._generation += 1
+            if device_id is None:
+                self._mix_formats.clear()
+                self._supported.clear()
+            else:
+                self._mix_formats.pop(device_id, None)
+                self._supported.pop(device_id, None)
+
+    def mix_format(self, dev, client=None):
+        """
+        The AudioFormat of IAudioClient.GetMixFormat of dev (an IMMDevice).
+        client is an IAudioClient of dev to ask, if not cached yet.
+        """
+        self._watch()
+        device_id = dev.GetId()
+        wave_format = self._mix_formats.get(device_id)
+        if wave_format is not None:
+            return wave_format
+        generation = self._generation
+        if client is None:
+            client = AudioUtilities.GetAudioClient(dev)
+        pointer = client.GetMixFormat()
+        try:
+            wave_format = AudioFormat.from_pointer(pointer)
+        finally:
+            get_backend().FreeMemory(pointer)
+        with self._lock:
+            if generation == self._generation:
+                self._mix_formats[device_id] = wave_format
+        return wave_format
+
+    def is_format_supported(
+        self,
+        dev,
+        wave_format,
+        share_mode=AUDCLNT_SHAREMODE.AUDCLNT_SHAREMODE_SHARED,
+        client=None,
+    ):
+        """
+        IsFormatSupported of dev (an IMMDevice) for wave_format (an AudioFormat),
+        returns (supported, closest): closest is the AudioFormat suggested
+        instead in shared mode, None if supported or if there is none.
+        """
+        self._watch()
+        device_id = dev.GetId()
+        key = (share_mode, wave_format.raw)
+        answer = self._supported.get(device_id, {}).get(key)
+        if answer is not None:
+            return answer
+        generation = self._generation
+        if client is None:
+            client = AudioUtilities.GetAudioClient(dev)
+        try:
+            closest = client.IsFormatSupported(share_mode.value, wave_format.pointer())
+        except COMError as exc:
+            if (exc.hresult & 0xFFFFFFFF) != AUDCLNT_E_UNSUPPORTED_FORMAT:
+                raise
+            answer = (False, None)
+        else:
+            if closest:
+                # S_FALSE
+                try:
+                    answer = (False, AudioFormat.from_pointer(closest))
+                finally:
+                    get_backend().FreeMemory(closest)
+            else:
+                answer = (True, None)
+        with self._lock:
+            if generation == self._generation:
+                self._supported.setdefault(device_id, {})[key] = answer
+        return answer
+
+
+_format_cache = FormatCache()
+
+
+def get_format_cache():
+    """Returns the FormatCache shared by the streams."""
+    return _format_cache
+
+
+class _AudioStream:
+    """Shared mode, event driven IAudioClient in the mix format of device."""
+
+    # render streams start once their buffer is filled
+    _autostart = True
+
+    def __init__(self, device, buffer_duration):
+        if isinstance(device, AudioDevice):
+            device = device._dev
+        self._dev = device
+        self.buffer_duration = buffer_duration
+        self.format = None
+        self.buffer_frames = 0
+        self._client = None
+        self._event = None
+        self._running = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def AudioClient(self):
+        """The IAudioClient of the stream, once opened"""
+        return self._client
+
+    def _stream_flags(self):
+        return AUDCLNT_STREAMFLAGS.EVENTCALLBACK
+
+    def _get_services(self, client):
+        pass
+
+    def _initialize(self, cache):
+        client = AudioUtilities.GetAudioClient(self._dev)
+        self.format = cache.mix_format(self._dev, client)
+        client.Initialize(
+            AUDCLNT_SHAREMODE.AUDCLNT_SHAREMODE_SHARED.value,
+            int(self._stream_flags()),
+            int(self.buffer_duration * REFTIMES_PER_SEC),
+            0,
+            self.format.pointer(),
+            None,
+        )
+        return client
+
+    def open(self):
+        """Initializes and starts the stream."""
+        if self._client is not None:
+            return self
+        backend = get_backend()
+        cache = get_format_cache()
+        try:
+            client = self._initialize(cache)
+        except COMError as exc:
+            if (exc.hresult & 0xFFFFFFFF) != AUDCLNT_E_UNSUPPORTED_FORMAT:
+                raise
+            # the device format changed unnoticed, the cached one is stale
+            cache.invalidate(self._dev.GetId())
+            client = self._initialize(cache)
+        event = backend.CreateEvent()
+        try:
+            client.SetEventHandle(event)
+            self._get_services(client)
+            self.buffer_frames = client.GetBufferSize()
+            if self._autostart:
+                client.Start()
+        except Exception:
+            backend.CloseEvent(event)
+            raise
+        self._event = event
+        self._client = client
+        self._running = self._autostart
+        return self
+
+    def close(self):
+        if self._client is None:
+            return
+        client, self._client = self._client, None
+        self._running = False
+        try:
+            client.Stop()
+        finally:
+            get_backend().CloseEvent(self._event)
+            self._event = None
+
+    def _wait(self, deadline):
+        """Waits for the stream event, False past deadline."""
+        wait = _WAIT_SLICE
+        if deadline is not None:
+            wait = min(wait, deadline - time.monotonic())
+            if wait <= 0:
+                return False
+        get_backend().WaitForEvent(self._event, wait)
+        return True
+
+
+class AudioCaptureStream(_AudioStream):
+    """
+    Event driven WASAPI capture of an endpoint, in shared mode and in the
+    mix format of the endpoint (see format).
+    loopback=True captures what a render endpoint is playing.
+
+        speakers = AudioUtilities.GetSpeakers()
+        with AudioCaptureStream(speakers, loopback=True) as stream:
+            for packet in stream.packets(timeout=1.0):
+                level = abs(packet.array).max()
+
+    No copy is made of the captured frames, see AudioPacket.
+    """
+
+    def __init__(self, device, loopback=False, buffer_duration=0.1):
+        super().__init__(device, buffer_duration)
+        self.loopback = loopback
+        self._capture = None
+        self.frames_captured = 0
+        # packets flagged with a discontinuity, i.e. glitches
+        self.discontinuities = 0
+
+    def _stream_flags(self):
+        flags = AUDCLNT_STREAMFLAGS.EVENTCALLBACK
+        if self.loopback:
+            flags |= AUDCLNT_STREAMFLAGS.LOOPBACK
+        return flags
+
+    def _get_services(self, client):
+        self._capture = AudioUtilities.GetService(client, IAudioCaptureClient)
+
+    def packets(self, timeout=None):
+        """
+        Yields the AudioPacket as they are captured, each one is released
+        back to the capture buffer when the next one is requested.
+        Stops after timeout seconds without any packet, or once closed.
+        """
+        self.open()
+        capture = self._capture
+        block_align = self.format.block_align
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._client is not None:
+            if not capture.GetNextPacketSize():
+                if not self._wait(deadline):
+                    return
+                continue
+            data, frames, flags, device_position, qpc_position = capture.GetBuffer()
+            address = cast(data, c_void_p).value
+            buffer = (c_ubyte * (frames * block_align)).from_address(address)
+            packet = AudioPacket(
+                self.format, buffer, frames, flags, device_position, qpc_position
+            )
+            self.frames_captured += frames
+            if packet.discontinuity:
+                self.discontinuities += 1
+            try:
+                yield packet
+            finally:
+                packet._release()
+                if self._client is not None:
+                    capture.ReleaseBuffer(frames)
+            if deadline is not None:
+                deadline = time.monotonic() + timeout
+
+
+class AudioRenderStream(_AudioStream):
+    """
+    Event driven WASAPI playback on an endpoint, in shared mode and in the
+    mix format of the endpoint (see format), there is no resampling.
+
+        speakers = AudioUtilities.GetSpeakers()
+        with AudioRenderStream(speakers) as stream:
+            rate = stream.format.sample_rate
+            tone = 0.2 * numpy.sin(2 * numpy.pi * 880 * numpy.arange(rate) / rate)
+            stream.play(numpy.repeat(tone[:, None], stream.format.channels, axis=1))
+
+    play() takes (frames, channels) NumPy arrays or bytes-like objects in
+    the format of the stream, or an iterable of them, e.g. a generator.
+    """
+
+    _autostart = False
+
+    def __init__(self, device, buffer_duration=0.05):
+        super().__init__(device, buffer_duration)
+        self._render = None
+        self.frames_written = 0
+        # times the device buffer ran dry while play() still had frames
+        self.underruns = 0
+        # seconds, from GetStreamLatency and GetDevicePeriod
+        self.stream_latency = None
+        self.default_period = None
+        self.minimum_period = None
+
+    def _get_services(self, client):
+        self._render = AudioUtilities.GetService(client, IAudioRenderClient)
+        self.stream_latency = client.GetStreamLatency() / REFTIMES_PER_SEC
+        default_period, minimum_period = client.GetDevicePeriod()
+        self.default_period = default_period / REFTIMES_PER_SEC
+        self.minimum_period = minimum_period / REFTIMES_PER_SEC
+
+    @property
+    def latency(self):
+        """
+        Seconds from play() queuing a frame to the endpoint playing it,
+        at most: a full device buffer plus the stream latency.
+        """
+        if self.format is None:
+            return None
+        return self.buffer_frames / self.format.sample_rate + self.stream_latency
+
+    def _as_bytes(self, block):
+        if numpy is not None and isinstance(block, numpy.ndarray):
+            dtype = self.format.dtype
+            if dtype is not None and block.dtype != dtype:
+                block = block.astype(dtype)
+            block = numpy.ascontiguousarray(block)
+        data = memoryview(block).cast("B")
+        if len(data) % self.format.block_align:
+            raise ValueError(
+                "partial frame, frames are %d bytes" % self.format.block_align
+            )
+        return data
+
+    def _blocks(self, source):
+        if isinstance(source, (bytes, bytearray, memoryview)) or (
+            numpy is not None and isinstance(source, numpy.ndarray)
+        ):
+            source = (source,)
+        for block in source:
+            yield self._as_bytes(block)
+
+    def _start(self):
+        if not self._running:
+            self._client.Start()
+            self._running = True
+
+    def play(self, source, timeout=None, wait=True):
+        """
+        Writes source to the device buffer as it frees up, then waits for
+        the end of the playback (see drain()) unless wait is False.
+        The stream starts once the device buffer is prefilled, or once
+        source ended if it's shorter, not to underrun on the first blocks.
+        Raises TimeoutError if the device takes no frame for timeout seconds.
+        """
+        self.open()
+        client = self._client
+        render = self._render
+        block_align = self.format.block_align
+        blocks = self._blocks(source)
+        pending = None
+        written = False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if pending is None or not len(pending):
+                # written as soon as they come, for live generators
+                pending = next(blocks, None)
+                if pending is None:
+                    break
+                continue
+            padding = client.GetCurrentPadding()
+            if written and not padding:
+                self.underruns += 1
+            frames = min(self.buffer_frames - padding, len(pending) // block_align)
+            if frames:
+                size = frames * block_align
+                address = cast(render.GetBuffer(frames), c_void_p).value
+                buffer = (c_ubyte * size).from_address(address)
+                memoryview(buffer).cast("B")[:] = pending[:size]
+                render.ReleaseBuffer(frames, 0)
+                pending = pending[size:]
+                self.frames_written += frames
+                written = True
+                if deadline is not None:
+                    deadline = time.monotonic() + timeout
+                continue
+            # full buffer, waits for the device to play a period
+            self._start()
+            if not self._wait(deadline):
+                raise TimeoutError("no frame played for %s seconds" % timeout)
+        if written:
+            self._start()
+        if wait:
+            self.drain(timeout)
+
+    def drain(self, timeout=None):
+        """
+        Waits until all the written frames are played.
+        Raises TimeoutError if the device plays no frame for timeout seconds.
+        """
+        if self._client is None:
+            return
+        self._start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        padding = self._client.GetCurrentPadding()
+        while padding:
+            if not self._wait(deadline):
+                raise TimeoutError("no frame played for %s seconds" % timeout)
+            remaining = self._client.GetCurrentPadding()
+            if remaining < padding and deadline is not None:
+                deadline = time.monotonic() + timeout
+            padding = remaining
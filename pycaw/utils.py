@@ -1,27 +1,218 @@
+import threading
 import warnings
+from collections.abc import Mapping
 
-import comtypes
 import psutil
-from _ctypes import COMError
 
-from pycaw.api.audioclient import IChannelAudioVolume, ISimpleAudioVolume
+from pycaw import propkeys
+from pycaw.api.audioclient import (
+    IAudioClient,
+    IChannelAudioVolume,
+    ISimpleAudioVolume,
+)
 from pycaw.api.audiopolicy import IAudioSessionControl2, IAudioSessionManager2
-from pycaw.api.endpointvolume import IAudioEndpointVolume
-from pycaw.api.mmdeviceapi import IMMDeviceEnumerator, IMMEndpoint
+from pycaw.api.endpointvolume import IAudioEndpointVolume, IAudioMeterInformation
+from pycaw.api.mmdeviceapi import IMMEndpoint
+from pycaw.api.mmdeviceapi.depend.structures import PROPERTYKEY, PROPVARIANT
+from pycaw.backend import get_backend
+from pycaw.compat import CLSCTX_ALL, GUID, COMError
 from pycaw.constants import (
     DEVICE_STATE,
+    SERVICE_GONE_HRESULTS,
     STGM,
     AudioDeviceState,
-    CLSID_MMDeviceEnumerator,
     EDataFlow,
+    EndpointFormFactor,
     ERole,
     IID_Empty,
 )
+from pycaw.formats import AudioFormat
+from pycaw.meter import AudioMeter
+from pycaw.processes import get_process_name_cache
+from pycaw.propkeys import PropertyKey
+
+# per thread (apartment) cache of AudioUtilities.GetDeviceEnumerator(),
+# and of the ISimpleAudioVolume of the sessions seen by the last
+# AudioUtilities.ApplySessionChanges() enumeration of the thread
+_enumerators = threading.local()
+# bumped to invalidate the enumerators of all threads
+_enumerators_generation = 0
+# see AudioUtilities.EnableSessionRegistry()
+_session_registry = None
+# keys of the AudioUtilities.ApplySessionChanges() changes
+_SESSION_CHANGE_KEYS = frozenset({"volume", "mute"})
+# volumes closer than that are considered equal, they are float32
+_VOLUME_EPSILON = 1e-6
+
+
+def _session_volumes():
+    """
+    ISimpleAudioVolume of the sessions of the current thread, keyed by their
+    IAudioSessionControl2 (COM pointers compare and hash by address),
+    dropped with the enumerator, see AudioUtilities.GetDeviceEnumerator().
+    """
+    backend = get_backend()
+    cached = getattr(_enumerators, "session_volumes", None)
+    if (
+        cached is None
+        or cached[0] != _enumerators_generation
+        or cached[1] is not backend
+    ):
+        cached = (_enumerators_generation, backend, {})
+        _enumerators.session_volumes = cached
+    return cached[2]
+
+
+def _process_name(pid):
+    """Returns the executable name of pid, None for system sounds or on error."""
+    if pid == 0:
+        return None
+    try:
+        return get_process_name_cache().get(pid)
+    except psutil.Error:
+        # the process already exited or can't be accessed
+        return None
+
+
+class AudioDeviceProperties(Mapping):
+    """
+    Read only mapping of the properties of an IMMDevice.
+
+    Keys are PropertyKey tuples (see pycaw.propkeys) or their str() format,
+    e.g. "{A45C254E-DF1C-4EFD-8020-67D146A850E0} 14", iterating yields the
+    latter.
+
+    Nothing is read upfront: the property store is opened on first access
+    and each property is fetched when it is first looked up.
+    Only iterating (or len(), dict(), ...) reads every property of the store.
+    An optional 'keys' whitelist restricts the mapping to those keys.
+    """
+
+    def __init__(self, dev, keys=None):
+        self._dev = dev
+        self._store = None
+        self._whitelist = None
+        if keys is not None:
+            self._whitelist = frozenset(self._property_key(key) for key in keys)
+        # PropertyKey -> PROPERTYKEY of the store, once enumerated
+        self._keys = None
+        self._values = {}
+        self._missing = set()
+        # single PROPVARIANT reused for every GetValue of the store
+        self._buffer = None
+
+    def __repr__(self):
+        return "<%s loaded=%r>" % (self.__class__.__name__, self._values)
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = self._dev.OpenPropertyStore(STGM.STGM_READ.value)
+        return self._store
+
+    @staticmethod
+    def _property_key(key):
+        if isinstance(key, PropertyKey):
+            return key
+        return PropertyKey.from_string(key)
+
+    def _load(self, key):
+        if self._keys is not None and key not in self._keys:
+            self._missing.add(key)
+            return
+        store = self.store
+        if store is None:
+            self._missing.add(key)
+            return
+        pk = self._keys[key] if self._keys is not None else _property_key_struct(key)
+        if self._buffer is None:
+            self._buffer = PROPVARIANT()
+        try:
+            value = store.GetValueInto(pk, self._buffer)
+            # copies blobs, the buffer is cleared right after
+            v = value.GetValue(copy=True)
+        except COMError as exc:
+            warnings.warn(
+                "COMError attempting to get property %r "
+                "from device %r: %r" % (str(key), self._dev, exc)
+            )
+            self._missing.add(key)
+            return
+        value.clear()
+        if v is None:
+            # VT_EMPTY, the store doesn't know the key
+            self._missing.add(key)
+        else:
+            self._values[key] = v
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        try:
+            key = self._property_key(key)
+        except (AttributeError, ValueError):
+            # not a "{fmtid} pid" string, no such property
+            raise KeyError(key) from None
+        if key not in self._values:
+            if key in self._missing or (
+                self._whitelist is not None and key not in self._whitelist
+            ):
+                raise KeyError(key)
+            self._load(key)
+            if key in self._missing:
+                raise KeyError(key)
+        return self._values[key]
+
+    def _enumerate_keys(self):
+        if self._keys is None:
+            keys = {}
+            store = self.store
+            count = 0 if store is None else store.GetCount()
+            for j in range(count):
+                try:
+                    pk = store.GetAt(j)
+                except COMError as exc:
+                    warnings.warn(
+                        "COMError attempting to get property %r "
+                        "from device %r: %r" % (j, self._dev, exc)
+                    )
+                    continue
+                keys[PropertyKey.from_struct(pk)] = pk
+            self._keys = keys
+        return self._keys
+
+    def __iter__(self):
+        for key in self._enumerate_keys():
+            # skips the properties failing to load
+            if key in self:
+                yield str(key)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+# PropertyKey -> PROPERTYKEY, see AudioDeviceProperties
+_property_key_structs = {}
+
+
+def _property_key_struct(key):
+    pk = _property_key_structs.get(key)
+    if pk is None:
+        pk = PROPERTYKEY()
+        pk.fmtid = GUID(key.fmtid)
+        pk.pid = key.pid
+        _property_key_structs[key] = pk
+    return pk
 
 
 class AudioDevice:
     """
     https://stackoverflow.com/a/20982715/185510
+
+    The typed properties below each read a single key of the property store
+    (on first access), None if the device doesn't have it.
     """
 
     def __init__(self, id, state, properties, dev):
@@ -30,27 +221,80 @@ class AudioDevice:
         self.properties = properties
         self._dev = dev
         self._volume = None
+        self._meter = None
 
     def __str__(self):
         return "AudioDevice: %s" % (self.FriendlyName)
 
     @property
     def FriendlyName(self):
-        DEVPKEY_Device_FriendlyName = (
-            "{a45c254e-df1c-4efd-8020-67d146a850e0} 14".upper()
-        )
-        value = self.properties.get(DEVPKEY_Device_FriendlyName)
-        return value
+        """e.g. "Speakers (Realtek High Definition Audio)" """
+        return self.properties.get(propkeys.PKEY_Device_FriendlyName)
+
+    @property
+    def DeviceDescription(self):
+        """e.g. "Speakers" """
+        return self.properties.get(propkeys.PKEY_Device_DeviceDesc)
+
+    @property
+    def InterfaceFriendlyName(self):
+        """e.g. "Realtek High Definition Audio" """
+        return self.properties.get(propkeys.PKEY_DeviceInterface_FriendlyName)
+
+    @property
+    def EnumeratorName(self):
+        """e.g. "HDAUDIO", "USB" or "BTHENUM" """
+        return self.properties.get(propkeys.PKEY_Device_EnumeratorName)
+
+    @property
+    def IconPath(self):
+        return self.properties.get(propkeys.PKEY_DeviceClass_IconPath)
+
+    @property
+    def FormFactor(self):
+        """EndpointFormFactor"""
+        value = self.properties.get(propkeys.PKEY_AudioEndpoint_FormFactor)
+        if value is None:
+            return None
+        try:
+            return EndpointFormFactor(value)
+        except ValueError:
+            return EndpointFormFactor.UnknownFormFactor
+
+    @property
+    def PhysicalSpeakers(self):
+        """Speaker configuration bit mask (KSAUDIO_SPEAKER_xxx)"""
+        return self.properties.get(propkeys.PKEY_AudioEndpoint_PhysicalSpeakers)
+
+    @property
+    def EndpointGuid(self):
+        return self.properties.get(propkeys.PKEY_AudioEndpoint_GUID)
+
+    @property
+    def ContainerId(self):
+        """GUID shared by the endpoints of the same physical device"""
+        return self.properties.get(propkeys.PKEY_Device_ContainerId)
+
+    @property
+    def DeviceFormat(self):
+        """pycaw.formats.AudioFormat the audio engine uses with the endpoint"""
+        value = self.properties.get(propkeys.PKEY_AudioEngine_DeviceFormat)
+        return None if value is None else AudioFormat(value)
 
     @property
     def EndpointVolume(self):
         if self._volume is None:
-            iface = self._dev.Activate(
-                IAudioEndpointVolume._iid_, comtypes.CLSCTX_ALL, None
-            )
+            iface = self._dev.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
             self._volume = iface.QueryInterface(IAudioEndpointVolume)
         return self._volume
 
+    @property
+    def Meter(self):
+        """pycaw.meter.AudioMeter of the endpoint"""
+        if self._meter is None:
+            self._meter = AudioMeter.from_device(self._dev)
+        return self._meter
+
 
 class AudioSession:
     """
@@ -62,19 +306,29 @@ class AudioSession:
         self._process = None
         self._volume = None
         self._channelVolume = None
+        self._meter = None
         self._callback = None
 
     def __str__(self):
         s = self.DisplayName
         if s:
             return "DisplayName: " + s
-        if self.Process is not None:
-            return "Process: " + self.Process.name()
+        name = self.ProcessName
+        if name is not None:
+            return "Process: " + name
         return "Pid: %s" % (self.ProcessId)
 
+    @property
+    def ProcessName(self):
+        """Executable name, from the shared pycaw.processes cache"""
+        return _process_name(self.ProcessId)
+
     @property
     def Process(self):
         if self._process is None and self.ProcessId != 0:
+            if self.ProcessName is None:
+                # known to be gone, see pycaw.processes
+                return None
             try:
                 self._process = psutil.Process(self.ProcessId)
             except psutil.NoSuchProcess:
@@ -151,6 +405,14 @@ class AudioSession:
             self._channelVolume = self._ctl.QueryInterface(IChannelAudioVolume)
         return self._channelVolume
 
+    @property
+    def Meter(self):
+        """pycaw.meter.AudioMeter of the session"""
+        if self._meter is None:
+            meter = self._ctl.QueryInterface(IAudioMeterInformation)
+            self._meter = AudioMeter(meter)
+        return self._meter
+
     def register_notification(self, callback):
         if self._callback is None:
             self._callback = callback
@@ -171,11 +433,8 @@ class AudioUtilities:
         """
         get the speakers (1st render + multimedia) device
         """
-        deviceEnumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, comtypes.CLSCTX_INPROC_SERVER
-        )
-        speakers = deviceEnumerator.GetDefaultAudioEndpoint(
-            EDataFlow.eRender.value, ERole.eMultimedia.value
+        speakers = AudioUtilities._CallDeviceEnumerator(
+            "GetDefaultAudioEndpoint", EDataFlow.eRender.value, ERole.eMultimedia.value
         )
         return speakers
 
@@ -184,11 +443,8 @@ class AudioUtilities:
         """
         get the microphone (1st capture + multimedia) device
         """
-        deviceEnumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, comtypes.CLSCTX_INPROC_SERVER
-        )
-        microphone = deviceEnumerator.GetDefaultAudioEndpoint(
-            EDataFlow.eCapture.value, ERole.eMultimedia.value
+        microphone = AudioUtilities._CallDeviceEnumerator(
+            "GetDefaultAudioEndpoint", EDataFlow.eCapture.value, ERole.eMultimedia.value
         )
         return microphone
 
@@ -197,10 +453,28 @@ class AudioUtilities:
         speakers = AudioUtilities.GetSpeakers()
         if speakers is None:
             return None
+        return AudioUtilities.GetSessionManager(speakers)
+
+    @staticmethod
+    def GetSessionManager(dev):
+        """Activates the IAudioSessionManager2 of the IMMDevice dev."""
         # win7+ only
-        o = speakers.Activate(IAudioSessionManager2._iid_, comtypes.CLSCTX_ALL, None)
-        mgr = o.QueryInterface(IAudioSessionManager2)
-        return mgr
+        o = dev.Activate(IAudioSessionManager2._iid_, CLSCTX_ALL, None)
+        return o.QueryInterface(IAudioSessionManager2)
+
+    @staticmethod
+    def GetAudioClient(dev):
+        """Activates a new IAudioClient of the IMMDevice dev."""
+        o = dev.Activate(IAudioClient._iid_, CLSCTX_ALL, None)
+        return o.QueryInterface(IAudioClient)
+
+    @staticmethod
+    def GetService(audio_client, interface):
+        """
+        IAudioClient.GetService, returns the service of an initialized
+        audio_client as interface, e.g. IAudioCaptureClient.
+        """
+        return audio_client.GetService(interface._iid_).QueryInterface(interface)
 
     @staticmethod
     def GetAllSessions():
@@ -222,6 +496,10 @@ class AudioUtilities:
 
     @staticmethod
     def GetProcessSession(id):
+        registry = _session_registry
+        if registry is not None and registry.started:
+            sessions = registry.get_by_pid(id)
+            return sessions[0] if sessions else None
         for session in AudioUtilities.GetAllSessions():
             if session.ProcessId == id:
                 return session
@@ -229,43 +507,148 @@ class AudioUtilities:
         return None
 
     @staticmethod
-    def CreateDevice(dev):
+    def ApplySessionChanges(changes, skip_unchanged=True):
+        """
+        Applies many session volume/mute changes in a single pass, e.g.
+
+            AudioUtilities.ApplySessionChanges({
+                "chrome.exe": {"volume": 0.5},
+                1234: {"volume": 0.2, "mute": False},
+            })
+
+        Targets are pids (int) or executable names (str), changes have an
+        optional "volume" (0.0 to 1.0) and an optional "mute" key.
+        The sessions are enumerated once, or not at all when the session
+        registry is enabled. Their ISimpleAudioVolume is kept between calls
+        of the same thread either way.
+        With skip_unchanged (the default) the values are read first and only
+        written when they differ, which saves notifications to the other
+        clients at the cost of a read per session. skip_unchanged=False
+        writes them blindly.
+
+        Returns a report per target:
+        {"sessions": matched, "changed": writes, "unchanged": skipped writes,
+        "errors": [COMError, ...]}
+        """
+        for change in changes.values():
+            unknown = set(change) - _SESSION_CHANGE_KEYS
+            if unknown:
+                raise ValueError("unknown session changes %r" % sorted(unknown))
+        registry = _session_registry
+        if registry is None or not registry.started:
+            registry = None
+            by_pid, by_exe = {}, {}
+            names = any(isinstance(target, str) for target in changes)
+            sessions = AudioUtilities.GetAllSessions()
+            if names:
+                get_process_name_cache().prefetch(len(sessions))
+            volumes = _session_volumes()
+            for session in sessions:
+                session._volume = volumes.get(session._ctl)
+                pid = session.ProcessId
+                by_pid.setdefault(pid, []).append(session)
+                exe = _process_name(pid) if names else None
+                if exe is not None:
+                    by_exe.setdefault(exe, []).append(session)
+        report = {}
+        for target, change in changes.items():
+            if registry is not None:
+                if isinstance(target, str):
+                    sessions = registry.get_by_exe(target)
+                else:
+                    sessions = registry.get_by_pid(target)
+            else:
+                sessions = (by_exe if isinstance(target, str) else by_pid).get(
+                    target, []
+                )
+            report[target] = AudioUtilities._ApplySessionChange(
+                sessions, change, skip_unchanged
+            )
+        if registry is None:
+            # only the current sessions, the expired ones are released
+            volumes.clear()
+            volumes.update(
+                (session._ctl, session._volume)
+                for sessions in by_pid.values()
+                for session in sessions
+                if session._volume is not None
+            )
+        return report
+
+    @staticmethod
+    def _ApplySessionChange(sessions, change, skip_unchanged):
+        volume = change.get("volume")
+        mute = change.get("mute")
+        result = {"sessions": len(sessions), "changed": 0, "unchanged": 0, "errors": []}
+        for session in sessions:
+            try:
+                sav = session.SimpleAudioVolume
+                if volume is not None:
+                    if (
+                        skip_unchanged
+                        and abs(sav.GetMasterVolume() - volume) <= _VOLUME_EPSILON
+                    ):
+                        result["unchanged"] += 1
+                    else:
+                        sav.SetMasterVolume(volume, None)
+                        result["changed"] += 1
+                if mute is not None:
+                    if skip_unchanged and bool(sav.GetMute()) == bool(mute):
+                        result["unchanged"] += 1
+                    else:
+                        sav.SetMute(mute, None)
+                        result["changed"] += 1
+            except COMError as exc:
+                # e.g. the session expired in between, don't keep its interface
+                session._volume = None
+                result["errors"].append(exc)
+        return result
+
+    @staticmethod
+    def EnableSessionRegistry():
+        """
+        Opt-in, starts a live pycaw.registry.AudioSessionRegistry of the
+        speakers sessions and returns it.
+        GetProcessSession() then looks sessions up in it rather than
+        enumerating them all on every call.
+        """
+        global _session_registry
+        if _session_registry is None:
+            from pycaw.registry import AudioSessionRegistry
+
+            _session_registry = AudioSessionRegistry().start()
+        return _session_registry
+
+    @staticmethod
+    def DisableSessionRegistry():
+        global _session_registry
+        registry, _session_registry = _session_registry, None
+        if registry is not None:
+            registry.stop()
+
+    @staticmethod
+    def CreateDevice(dev, properties=None):
+        """
+        Wraps dev in an AudioDevice, its properties are loaded on demand,
+        see AudioDeviceProperties.
+        'properties' optionally restricts them to a list of keys.
+        """
         if dev is None:
             return None
         id = dev.GetId()
         state = dev.GetState()
-        properties = {}
-        store = dev.OpenPropertyStore(STGM.STGM_READ.value)
-        if store is not None:
-            propCount = store.GetCount()
-            for j in range(propCount):
-                try:
-                    pk = store.GetAt(j)
-                    value = store.GetValue(pk)
-                    v = value.GetValue()
-                except COMError as exc:
-                    warnings.warn(
-                        "COMError attempting to get property %r "
-                        "from device %r: %r" % (j, dev, exc)
-                    )
-                    continue
-                value.clear()
-                name = str(pk)
-                properties[name] = v
         audioState = AudioDeviceState(state)
-        return AudioDevice(id, audioState, properties, dev)
+        return AudioDevice(id, audioState, AudioDeviceProperties(dev, properties), dev)
 
     @staticmethod
-    def GetAllDevices():
+    def GetAllDevices(properties=None):
+        """
+        Get all audio endpoints, whatever their state.
+        'properties' optionally restricts their properties to a list of keys.
+        """
         devices = []
-        deviceEnumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, comtypes.CLSCTX_INPROC_SERVER
-        )
-        if deviceEnumerator is None:
-            return devices
-
-        collection = deviceEnumerator.EnumAudioEndpoints(
-            EDataFlow.eAll.value, DEVICE_STATE.MASK_ALL.value
+        collection = AudioUtilities._CallDeviceEnumerator(
+            "EnumAudioEndpoints", EDataFlow.eAll.value, DEVICE_STATE.MASK_ALL.value
         )
         if collection is None:
             return devices
@@ -274,18 +657,56 @@ class AudioUtilities:
         for i in range(count):
             dev = collection.Item(i)
             if dev is not None:
-                devices.append(AudioUtilities.CreateDevice(dev))
+                devices.append(AudioUtilities.CreateDevice(dev, properties))
         return devices
 
     @staticmethod
     def GetDeviceEnumerator():
         """
-        Get an instance of IMMDeviceEnumerator.
+        Get an instance of IMMDeviceEnumerator from the current backend,
+        see pycaw.backend.
+        The instance is created once per thread (COM apartment) and reused,
+        until InvalidateDeviceEnumerator() is called.
         """
-        device_enumerator = comtypes.CoCreateInstance(
-            CLSID_MMDeviceEnumerator, IMMDeviceEnumerator, comtypes.CLSCTX_INPROC_SERVER
-        )
-        return device_enumerator
+        backend = get_backend()
+        cached = getattr(_enumerators, "cached", None)
+        if (
+            cached is None
+            or cached[0] != _enumerators_generation
+            or cached[1] is not backend
+        ):
+            device_enumerator = backend.CreateDeviceEnumerator()
+            cached = (_enumerators_generation, backend, device_enumerator)
+            _enumerators.cached = cached
+        return cached[2]
+
+    @staticmethod
+    def InvalidateDeviceEnumerator():
+        """
+        Drops the cached IMMDeviceEnumerator of all threads, and the
+        session interfaces kept by ApplySessionChanges(),
+        the next GetDeviceEnumerator() call creates a new one.
+        Happens automatically when the audio service was restarted.
+        Threads calling CoUninitialize should call it before.
+        """
+        global _enumerators_generation
+        _enumerators_generation += 1
+        _enumerators.cached = None
+        _enumerators.session_volumes = None
+
+    @staticmethod
+    def _CallDeviceEnumerator(method, *args):
+        """
+        Calls method on the cached IMMDeviceEnumerator, retries once with a
+        new enumerator if the audio service went away in the meantime.
+        """
+        try:
+            return getattr(AudioUtilities.GetDeviceEnumerator(), method)(*args)
+        except COMError as exc:
+            if (exc.hresult & 0xFFFFFFFF) not in SERVICE_GONE_HRESULTS:
+                raise
+            AudioUtilities.InvalidateDeviceEnumerator()
+        return getattr(AudioUtilities.GetDeviceEnumerator(), method)(*args)
 
     @staticmethod
     def GetEndpointDataFlow(devId, outputType=0):
@@ -296,8 +717,7 @@ class AudioUtilities:
             - outputType: 0 (default) for text, 1 for code.
         """
         DataFlow = ["eRender", "eCapture", "eAll", "EDataFlow_enum_count"]
-        devEnum = AudioUtilities.GetDeviceEnumerator()
-        dev = devEnum.GetDevice(devId)
+        dev = AudioUtilities._CallDeviceEnumerator("GetDevice", devId)
         value = dev.QueryInterface(IMMEndpoint).GetDataFlow()
         if outputType:
             return value
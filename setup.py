@@ -9,7 +9,11 @@ def read(fname):
         return f.read()
 
 
-install_requires = ["comtypes", "psutil"]
+install_requires = ['comtypes; sys_platform == "win32"', "psutil"]
+extras_require = {
+    # NumPy views of the peak meters
+    "numpy": ["numpy"],
+}
 setup(
     name="pycaw",
     version="20240210",
@@ -18,6 +22,7 @@ setup(
     long_description_content_type="text/markdown",
     author="Andre Miras",
     url="https://github.com/AndreMiras/pycaw",
-    packages=find_packages(exclude=("tests", "examples")),
+    packages=find_packages(exclude=("tests", "examples", "benchmarks")),
     install_requires=install_requires,
+    extras_require=extras_require,
 )
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from pycaw import compat
+from pycaw.backend import use_backend
+from pycaw.simulation import SimulatedAudioSystem, SimulatedBackend
+from pycaw.utils import AudioUtilities
+
+# the examples talk to the Windows audio service
+collect_ignore = ["test_examples.py"] if compat.comtypes is None else []
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "windows: needs the Windows audio service (skipped elsewhere)"
+    )
+
+
+def pytest_runtest_setup(item):
+    if item.get_closest_marker("windows") and compat.comtypes is None:
+        pytest.skip("needs the Windows audio service")
+
+
+@pytest.fixture
+def system():
+    """Runs the test against a new simulated audio system."""
+    system = SimulatedAudioSystem()
+    with use_backend(SimulatedBackend(system)):
+        yield system
+
+
+@pytest.fixture
+def device(system):
+    """The simulated default render endpoint."""
+    return system.add_device()
+
+
+@pytest.fixture
+def speakers(device):
+    """The pycaw AudioDevice of the simulated device."""
+    return AudioUtilities.GetAllDevices()[0]
+
+
+@pytest.fixture
+def volume_callback(speakers):
+    """
+    Registers an AudioEndpointVolumeCallback on the speakers,
+    unregistered after the test.
+    """
+    volume = speakers.EndpointVolume
+    callbacks = []
+
+    def register(callback):
+        volume.RegisterControlChangeNotify(callback)
+        callbacks.append(callback)
+        return callback
+
+    yield register
+    for callback in callbacks:
+        volume.UnregisterControlChangeNotify(callback)
+
+
+@pytest.fixture
+def wait_for():
+    """Waits until predicate() is true, fails after timeout seconds."""
+
+    def wait(predicate, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            assert time.monotonic() < deadline
+            time.sleep(0.005)
+
+    return wait
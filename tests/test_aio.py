@@ -0,0 +1,94 @@
+"""
+Verifies the async iterators over the callbacks.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from pycaw import aio
+from pycaw.compat import GUID
+from pycaw.pycaw import AudioUtilities
+
+
+class TestAio:
+    def test_session_events(self, system):
+        session = system.add_session("app.exe")
+        audio_session = AudioUtilities.GetAllSessions()[0]
+
+        def changes():
+            session.SetMasterVolume(0.5, None)
+            session.SetMute(1, None)
+            session.expire()
+
+        async def main():
+            async with aio.session_events(audio_session) as events:
+                # from a COM notification thread
+                thread = threading.Thread(target=changes)
+                thread.start()
+                received = []
+                async for event in events:
+                    received.append(event)
+                    if event.type == "state_changed":
+                        break
+                thread.join()
+            return received
+
+        received = asyncio.run(main())
+        assert [event.type for event in received] == [
+            "simple_volume_changed",
+            "simple_volume_changed",
+            "state_changed",
+        ]
+        assert received[0].new_volume == 0.5
+        assert received[1].new_mute == 1
+        assert isinstance(received[0].event_context, GUID)
+        assert received[2].new_state == "Expired"
+        # unregistered
+        assert session._callbacks == []
+
+    @pytest.mark.parametrize(
+        "overflow, volumes",
+        [
+            (aio.DROP_OLDEST, [0.3, 0.4]),
+            (aio.DROP_NEWEST, [0.0, 0.1]),
+            (aio.RAISE, [0.0, 0.1]),
+        ],
+    )
+    def test_overflow(self, system, overflow, volumes):
+        session = system.add_session("app.exe")
+        audio_session = AudioUtilities.GetAllSessions()[0]
+
+        async def main():
+            events = aio.session_events(audio_session, maxsize=2, overflow=overflow)
+            for i in range(5):
+                session.SetMasterVolume(i / 10, None)
+            events.close()
+            if overflow == aio.RAISE:
+                with pytest.raises(asyncio.QueueFull):
+                    await events.__anext__()
+            return [event.new_volume async for event in events], events.dropped
+
+        received, dropped = asyncio.run(main())
+        assert received == pytest.approx(volumes)
+        assert dropped == 3
+
+    def test_endpoint_events(self, system, device, speakers):
+
+        async def main():
+            async with aio.endpoint_volume_events(speakers) as volume_events:
+                async with aio.device_events() as device_events:
+                    device.endpoint_volume.SetMasterVolumeLevelScalar(0.25, None)
+                    system.add_device("Headphones")
+                    return await volume_events.__anext__(), [
+                        await device_events.__anext__()
+                    ]
+
+        volume_event, device_events = asyncio.run(main())
+        assert volume_event.type == "notify"
+        assert volume_event.new_volume == 0.25
+        assert volume_event.channels == 2
+        assert [event.type for event in device_events] == ["device_added"]
+        assert system._notification_clients == []
+        assert device.endpoint_volume._callbacks == []
@@ -0,0 +1,58 @@
+"""
+Verifies the coalescing of notification storms.
+"""
+
+from pycaw.callbacks import AudioEndpointVolumeCallback
+from pycaw.coalesce import Coalescer
+from pycaw.compat import GUID
+
+
+class TestCoalescer:
+    def test_leading_and_trailing_edges(self, wait_for):
+        coalescer = Coalescer(window=0.05)
+        got = []
+        for i in range(10):
+            coalescer.submit("a", got.append, i)
+        coalescer.submit("b", got.append, "b")
+        # the leading edges right away
+        assert got == [0, "b"]
+        wait_for(lambda: got[-1] == 9)
+        assert got == [0, "b", 9]
+        assert coalescer.stats() == {
+            "received": 11,
+            "delivered": 3,
+            "merged": 8,
+            "pending": 0,
+        }
+        # quiet windows close, the next event is a leading edge again
+        wait_for(lambda: not len(coalescer))
+        coalescer.submit("a", got.append, 10)
+        assert got[-1] == 10
+        coalescer.close()
+
+    def test_close_flushes(self):
+        coalescer = Coalescer(window=60)
+        got = []
+        coalescer.submit("a", got.append, 1)
+        coalescer.submit("a", got.append, 2)
+        coalescer.close()
+        assert got == [1, 2]
+        assert not len(coalescer)
+
+    def test_endpoint_volume_callback(self, device, volume_callback, wait_for):
+        got = []
+
+        class Callback(AudioEndpointVolumeCallback):
+            def on_notify(self, new_volume, new_mute, event_context, *args):
+                got.append((new_volume, event_context.contents))
+
+        coalescer = Coalescer(window=0.05)
+        volume_callback(Callback(coalescer=coalescer))
+        for i in range(1, 5):
+            device.endpoint_volume.SetMasterVolumeLevelScalar(i / 4, None)
+        wait_for(lambda: len(got) == 2)
+        assert [volume for volume, _ in got] == [0.25, 1.0]
+        # the event contexts were copied
+        assert all(isinstance(context, GUID) for _, context in got)
+        assert coalescer.merged == 2
+        coalescer.close()
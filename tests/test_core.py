@@ -3,17 +3,39 @@ Verifies core features run as expected.
 """
 
 import sys
+import threading
 import warnings
-from contextlib import contextmanager
+from ctypes import POINTER, c_ubyte, c_uint32, c_void_p, c_wchar_p, cast, pointer
+from datetime import datetime, timezone
 from io import StringIO
 from unittest import mock
 
-import _ctypes
+import pytest
 
+from pycaw.api.mmdeviceapi.depend.structures import PROPVARIANT
+from pycaw.compat import (
+    GUID,
+    VT_BLOB,
+    VT_BOOL,
+    VT_CLSID,
+    VT_EMPTY,
+    VT_FILETIME,
+    VT_LPWSTR,
+    VT_UI4,
+    VT_UI8,
+    VT_VECTOR,
+    COMError,
+)
+from pycaw.constants import EndpointFormFactor
+from pycaw.propkeys import (
+    PKEY_AudioEndpoint_FormFactor,
+    PKEY_Device_FriendlyName,
+    PropertyKey,
+)
 from pycaw.pycaw import AudioDeviceState, AudioUtilities
+from pycaw.simulation import SimulatedPropertyStore
 
 
-@contextmanager
 def captured_output():
     new_out, new_err = StringIO(), StringIO()
     old_out, old_err = sys.stdout, sys.stderr
@@ -25,6 +47,7 @@ def captured_output():
 
 
 class TestCore:
+    @pytest.mark.windows
     def test_session_unicode(self):
         """Makes sure printing a session doesn't crash."""
         with captured_output() as (out, err):
@@ -34,6 +57,7 @@ class TestCore:
                 print("session: %s" % session)
                 print("session.Process: %s" % session.Process)
 
+    @pytest.mark.windows
     def test_device_unicode(self):
         """Makes sure printing a device doesn't crash."""
         with captured_output() as (out, err):
@@ -49,14 +73,19 @@ class TestCore:
         dev.GetState = mock.Mock(return_value=AudioDeviceState.Active)
         store = mock.Mock()
         store.GetCount = mock.Mock(return_value=1)
-        store.GetAt = mock.Mock(return_value="pk")
-        store.GetValue = mock.Mock(side_effect=_ctypes.COMError(None, None, None))
+        store.GetAt = mock.Mock(return_value=PKEY_Device_FriendlyName)
+        store.GetValueInto = mock.Mock(side_effect=COMError(None, None, None))
         dev.OpenPropertyStore = mock.Mock(return_value=store)
+        device = AudioUtilities.CreateDevice(dev)
         with warnings.catch_warnings(record=True) as w:
-            AudioUtilities.CreateDevice(dev)
+            assert dict(device.properties) == {}
         assert len(w) == 1
-        assert "COMError attempting to get property 0 from device" in str(w[0].message)
+        assert (
+            "COMError attempting to get property "
+            f"'{PKEY_Device_FriendlyName}' from device"
+        ) in str(w[0].message)
 
+    @pytest.mark.windows
     def test_getallsessions_reliability(self):
         """
         Verifies AudioUtilities.GetAllSessions() is reliable
@@ -66,3 +95,301 @@ class TestCore:
         for _ in range(100):
             sessions = AudioUtilities.GetAllSessions()
             assert len(sessions) > 0
+
+
+class TestDeviceEnumeratorCache:
+    def test_reused(self, system):
+        system.add_device()
+        AudioUtilities.GetSpeakers()
+        AudioUtilities.GetAllDevices()
+        AudioUtilities.GetAllSessions()
+        assert system.calls["CoCreateInstance"] == 1
+        assert AudioUtilities.GetDeviceEnumerator() is (
+            AudioUtilities.GetDeviceEnumerator()
+        )
+
+    def test_per_thread(self, system):
+        enumerators = []
+        thread = threading.Thread(
+            target=lambda: enumerators.append(AudioUtilities.GetDeviceEnumerator())
+        )
+        thread.start()
+        thread.join()
+        assert enumerators[0] is not AudioUtilities.GetDeviceEnumerator()
+        assert system.calls["CoCreateInstance"] == 2
+
+    def test_service_restart(self, system):
+        device = system.add_device()
+        enumerator = AudioUtilities.GetDeviceEnumerator()
+        system.restart_service()
+        assert AudioUtilities.GetSpeakers() is device
+        assert AudioUtilities.GetDeviceEnumerator() is not enumerator
+        assert system.calls["CoCreateInstance"] == 2
+
+    def test_invalidate(self, system):
+        enumerator = AudioUtilities.GetDeviceEnumerator()
+        AudioUtilities.InvalidateDeviceEnumerator()
+        assert AudioUtilities.GetDeviceEnumerator() is not enumerator
+
+
+class TestDeviceProperties:
+    friendly_name = "{A45C254E-DF1C-4EFD-8020-67D146A850E0} 14"
+
+    def test_lazy(self, system):
+        system.spawn_devices(40, properties=30)
+        devices = AudioUtilities.GetAllDevices()
+        assert system.calls["OpenPropertyStore"] == 0
+        assert system.calls["GetValue"] == 0
+        assert devices[0].FriendlyName == "Simulated Device 0"
+        assert devices[0].FriendlyName == "Simulated Device 0"
+        assert system.calls["OpenPropertyStore"] == 1
+        assert system.calls["GetValue"] == 1
+        assert system.calls["GetAt"] == 0
+
+    def test_mapping(self, system):
+        system.add_device("Speakers", properties={})
+        properties = AudioUtilities.GetAllDevices()[0].properties
+        assert len(properties) == 4
+        assert properties[self.friendly_name] == "Speakers"
+        assert "{00000000-0000-0000-0000-000000000000} 1" not in properties
+        assert dict(properties)[self.friendly_name] == "Speakers"
+
+    def test_whitelist(self, system):
+        system.add_device("Speakers")
+        devices = AudioUtilities.GetAllDevices(properties=[self.friendly_name])
+        assert list(devices[0].properties) == [self.friendly_name]
+        assert devices[0].FriendlyName == "Speakers"
+        assert (
+            devices[0].properties.get("{1DA5D803-D492-4EDD-8C23-E0C0FFEE7F0E} 0")
+            is None
+        )
+        assert system.calls["GetValue"] == 1
+
+    def test_property_keys(self, system):
+        system.add_device("Speakers (Simulated)")
+        device = AudioUtilities.GetAllDevices()[0]
+        assert device.properties[PKEY_Device_FriendlyName] == "Speakers (Simulated)"
+        assert device.properties[self.friendly_name] == "Speakers (Simulated)"
+        assert PropertyKey.from_string(self.friendly_name) == PKEY_Device_FriendlyName
+        assert str(PKEY_Device_FriendlyName) == self.friendly_name
+
+    def test_malformed_keys(self, system):
+        system.add_device("Speakers")
+        properties = AudioUtilities.GetAllDevices()[0].properties
+        for key in ("foo", "{foo} 1", self.friendly_name[:-3] + " x", 14):
+            assert properties.get(key) is None
+            assert key not in properties
+            with pytest.raises(KeyError):
+                properties[key]
+        assert system.calls["GetValue"] == 0
+        with pytest.raises(ValueError):
+            PropertyKey.from_string("{foo} 1")
+
+    def test_buffer_reused(self, system):
+        fmtid = "{00000000-0000-0000-0000-000000000001}"
+        values = [
+            "Speakers",
+            b"\x01\x00\x02",
+            7,
+            -7,
+            2**40,
+            -(2**40),
+            0.5,
+            True,
+            GUID("{A45C254E-DF1C-4EFD-8020-67D146A850E0}"),
+        ]
+        keys = [PropertyKey(fmtid, pid) for pid in range(len(values))]
+        system.add_device("Speakers", properties=dict(zip(keys, values)))
+        store = SimulatedPropertyStore
+        with mock.patch.object(
+            store, "GetValueInto", autospec=True, side_effect=store.GetValueInto
+        ) as get_value_into:
+            properties = AudioUtilities.GetAllDevices()[0].properties
+            assert [properties[str(key)] for key in keys] == values
+        buffers = {id(call.args[2]) for call in get_value_into.call_args_list}
+        assert buffers == {id(properties._buffer)}
+        assert get_value_into.call_count == len(values)
+        # cleared after each value, its memory released
+        assert properties._buffer.vt == VT_EMPTY
+        assert not system._propvariant_memory
+
+    def test_typed_properties(self, system):
+        system.add_device("Speakers (Simulated)")
+        system.add_device(
+            "Headset (Simulated)",
+            flow=1,
+            properties={PKEY_AudioEndpoint_FormFactor: 5},
+        )
+        speakers, headset = AudioUtilities.GetAllDevices()
+        system.reset_calls()
+        assert speakers.DeviceDescription == "Speakers"
+        assert speakers.InterfaceFriendlyName == "Simulated Audio"
+        assert speakers.FormFactor == EndpointFormFactor.Speakers
+        assert speakers.IconPath is None
+        assert headset.FormFactor == EndpointFormFactor.Headset
+        assert system.calls["GetValue"] == 5
+
+    def test_blob_property(self, system):
+        device_format = PropertyKey("{F19F064D-082C-4E27-BC73-6882A1BB8E4C}", 0)
+        system.add_device("Speakers", properties={device_format: b"\x01\x00\x02"})
+        device = AudioUtilities.GetAllDevices()[0]
+        # copied, the PROPVARIANT buffer is cleared right after
+        assert device.properties[device_format] == b"\x01\x00\x02"
+        assert isinstance(device.properties[device_format], bytes)
+
+
+class TestApplySessionChanges:
+    def test_apply(self, system):
+        system.add_device()
+        sessions = system.spawn_sessions(6, app_execs=["app0.exe", "app1.exe"])
+        sessions[1].volume = 0.5
+        system.reset_calls()
+        report = AudioUtilities.ApplySessionChanges(
+            {
+                "app1.exe": {"volume": 0.5, "mute": True},
+                sessions[0].pid: {"volume": 0.2},
+                "missing.exe": {"mute": True},
+            },
+            skip_unchanged=False,
+        )
+        assert system.calls["GetSessionEnumerator"] == 1
+        assert report["app1.exe"]["sessions"] == 3
+        assert report["app1.exe"]["changed"] == 6
+        assert report["app1.exe"]["unchanged"] == 0
+        assert report[sessions[0].pid]["changed"] == 1
+        assert report["missing.exe"]["sessions"] == 0
+        # written blindly
+        assert system.calls["GetMasterVolume"] == 0
+        assert system.calls["SetMasterVolume"] == 4
+        assert [s.mute for s in sessions] == [False, True] * 3
+        assert sessions[0].volume == 0.2
+
+    def test_skip_unchanged(self, system):
+        system.add_device()
+        sessions = system.spawn_sessions(6, app_execs=["app0.exe", "app1.exe"])
+        sessions[1].volume = 0.5
+        system.reset_calls()
+        report = AudioUtilities.ApplySessionChanges(
+            {"app1.exe": {"volume": 0.5, "mute": True}}
+        )
+        # sessions[1] already had the volume, the default
+        assert report["app1.exe"]["changed"] == 5
+        assert report["app1.exe"]["unchanged"] == 1
+        assert system.calls["GetMasterVolume"] == 3
+        assert system.calls["SetMasterVolume"] == 2
+        assert [s.mute for s in sessions] == [False, True] * 3
+
+    def test_volume_reuse(self, system):
+        system.add_device()
+        sessions = system.spawn_sessions(4, app_execs=["app0.exe", "app1.exe"])
+        AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.3}})
+        system.reset_calls()
+        report = AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.4}})
+        assert report["app0.exe"]["changed"] == 2
+        # only the session manager and the IAudioSessionControl2
+        assert system.calls["QueryInterface"] == 1 + 4
+        assert sessions[2].volume == 0.4
+        # an expired session is forgotten
+        sessions[0].expire()
+        system.reset_calls()
+        AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.5}})
+        assert system.calls["QueryInterface"] == 1 + 3
+        assert sessions[2].volume == 0.5
+        # per thread, COM interfaces don't cross apartments
+        system.reset_calls()
+        thread = threading.Thread(
+            target=AudioUtilities.ApplySessionChanges,
+            args=({"app0.exe": {"volume": 0.6}},),
+        )
+        thread.start()
+        thread.join()
+        assert system.calls["QueryInterface"] == 1 + 3 + 1
+        assert sessions[2].volume == 0.6
+        # dropped with the enumerator
+        AudioUtilities.InvalidateDeviceEnumerator()
+        system.reset_calls()
+        AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.7}})
+        assert system.calls["QueryInterface"] == 1 + 3 + 1
+
+    def test_registry(self, system):
+        system.add_device()
+        sessions = system.spawn_sessions(4, app_execs=["app0.exe", "app1.exe"])
+        AudioUtilities.EnableSessionRegistry()
+        try:
+            AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.3}})
+            system.reset_calls()
+            report = AudioUtilities.ApplySessionChanges({"app0.exe": {"volume": 0.4}})
+        finally:
+            AudioUtilities.DisableSessionRegistry()
+        assert report["app0.exe"]["changed"] == 2
+        # no enumeration and the ISimpleAudioVolume were reused
+        assert system.calls["GetSessionEnumerator"] == 0
+        assert system.calls["QueryInterface"] == 0
+        assert sessions[2].volume == 0.4
+
+    def test_unknown_change(self, system):
+        with pytest.raises(ValueError):
+            AudioUtilities.ApplySessionChanges({"app0.exe": {"volumes": 0.3}})
+
+
+class TestPropVariant:
+    def test_scalars(self):
+        pv = PROPVARIANT()
+        pv.vt = VT_UI8
+        pv.union.uhVal = 2**40 + 1
+        assert pv.GetValue() == 2**40 + 1
+        pv.vt = VT_BOOL
+        pv.union.boolVal = -1
+        assert pv.GetValue() is True
+        pv.vt = VT_EMPTY
+        assert pv.GetValue() is None
+
+    def test_filetime(self):
+        pv = PROPVARIANT()
+        pv.vt = VT_FILETIME
+        # 2000-01-01 00:00:00 UTC
+        ticks = 125911584000000000
+        pv.union.filetime.dwLowDateTime = ticks & 0xFFFFFFFF
+        pv.union.filetime.dwHighDateTime = ticks >> 32
+        assert pv.GetValue() == datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+    def test_clsid(self):
+        guid = GUID("{A45C254E-DF1C-4EFD-8020-67D146A850E0}")
+        pv = PROPVARIANT()
+        pv.vt = VT_CLSID
+        pv.union.puuid = pointer(guid)
+        value = pv.GetValue()
+        assert value == guid
+        # a copy, not the PROPVARIANT memory
+        guid.Data1 = 0
+        assert value != guid
+
+    def test_blob(self):
+        data = (c_ubyte * 4)(1, 2, 3, 4)
+        pv = PROPVARIANT()
+        pv.vt = VT_BLOB
+        pv.union.blob.cbSize = 4
+        pv.union.blob.pBlobData = cast(data, POINTER(c_ubyte))
+        view = pv.GetValue()
+        assert isinstance(view, memoryview)
+        assert view.tobytes() == b"\x01\x02\x03\x04"
+        data[0] = 9
+        # zero-copy
+        assert view[0] == 9
+        assert pv.GetValue(copy=True) == b"\x09\x02\x03\x04"
+
+    def test_string_vector(self):
+        strings = (c_wchar_p * 2)("Speakers", "Headphones")
+        pv = PROPVARIANT()
+        pv.vt = VT_VECTOR | VT_LPWSTR
+        pv.union.calpwstr.cElems = 2
+        pv.union.calpwstr.pElems = cast(strings, POINTER(c_wchar_p))
+        assert pv.GetValue() == ["Speakers", "Headphones"]
+
+    def test_numeric_vector(self):
+        values = (c_uint32 * 3)(1, 2, 3)
+        pv = PROPVARIANT()
+        pv.vt = VT_VECTOR | VT_UI4
+        pv.union.ca.cElems = 3
+        pv.union.ca.pElems = cast(values, c_void_p)
+        assert pv.GetValue() == [1, 2, 3]
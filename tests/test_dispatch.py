@@ -0,0 +1,154 @@
+"""
+Verifies the off-thread callback dispatcher.
+"""
+
+import operator
+import threading
+import time
+
+import pytest
+
+from pycaw.callbacks import AudioEndpointVolumeCallback
+from pycaw.compat import GUID
+from pycaw.dispatch import BLOCK, CallbackDispatcher
+
+
+class TestCallbackDispatcher:
+    def test_per_source_order(self):
+        dispatcher = CallbackDispatcher(workers=4)
+        got = {"a": [], "b": []}
+
+        def append(source, i):
+            # a slow callback, the other sources don't wait for it
+            time.sleep(0.001)
+            got[source].append(i)
+
+        for i in range(20):
+            dispatcher.submit("a", append, "a", i)
+            dispatcher.submit("b", append, "b", i)
+        assert dispatcher.join(timeout=5)
+        assert got == {"a": list(range(20)), "b": list(range(20))}
+        metrics = dispatcher.metrics()
+        assert metrics["submitted"] == metrics["completed"] == 40
+        assert metrics["depth"] == metrics["dropped"] == metrics["sources"] == 0
+        assert 0 < metrics["workers"] <= 4
+        dispatcher.close()
+
+    def test_drop_oldest(self, wait_for):
+        dispatcher = CallbackDispatcher(workers=1, maxsize=2)
+        release = threading.Event()
+        got = []
+        dispatcher.submit("a", release.wait)
+        wait_for(lambda: dispatcher.depth == 0)
+        for i in range(5):
+            dispatcher.submit("a", got.append, i)
+        assert dispatcher.metrics()["max_depth"] == 2
+        release.set()
+        dispatcher.close()
+        assert got == [3, 4]
+        assert dispatcher.dropped == 3
+
+    def test_drop_emptying_a_source(self, wait_for):
+        dispatcher = CallbackDispatcher(workers=1, maxsize=2)
+        release = threading.Event()
+        got = []
+        dispatcher.submit("x", release.wait)
+        wait_for(lambda: dispatcher.depth == 0)
+        # each drop empties the queue of a source
+        for source in "STSTS":
+            dispatcher.submit(source, got.append, source)
+        release.set()
+        assert dispatcher.join(timeout=5)
+        assert sorted(got) == ["S", "T"]
+        metrics = dispatcher.metrics()
+        assert metrics["dropped"] == 3
+        assert metrics["errors"] == 0
+        assert not dispatcher._ready
+        assert metrics["sources"] == 0
+        # the worker is still alive
+        dispatcher.submit("S", got.append, "S")
+        assert dispatcher.join(timeout=5)
+        assert got[-1] == "S"
+        dispatcher.close()
+
+    def test_block(self, wait_for):
+        dispatcher = CallbackDispatcher(workers=1, maxsize=1, overflow=BLOCK)
+        release = threading.Event()
+        got = []
+        dispatcher.submit("a", release.wait)
+        wait_for(lambda: dispatcher.depth == 0)
+        dispatcher.submit("a", got.append, 1)
+        submitter = threading.Thread(
+            target=dispatcher.submit, args=("b", got.append, 2)
+        )
+        submitter.start()
+        submitter.join(0.05)
+        # waiting for room
+        assert submitter.is_alive()
+        release.set()
+        submitter.join()
+        dispatcher.close()
+        assert sorted(got) == [1, 2]
+        assert dispatcher.dropped == 0
+        with pytest.raises(RuntimeError):
+            dispatcher.submit("a", got.append, 3)
+
+    def test_block_closed_while_waiting(self, wait_for):
+        dispatcher = CallbackDispatcher(workers=1, maxsize=1, overflow=BLOCK)
+        release = threading.Event()
+        got = []
+        errors = []
+        dispatcher.submit("a", release.wait)
+        wait_for(lambda: dispatcher.depth == 0)
+        dispatcher.submit("a", got.append, 1)
+
+        def submit():
+            try:
+                dispatcher.submit("b", got.append, 2)
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        submitter = threading.Thread(target=submit)
+        submitter.start()
+        submitter.join(0.05)
+        assert submitter.is_alive()
+        closer = threading.Thread(target=dispatcher.close)
+        closer.start()
+        # rejected, as after close()
+        submitter.join(5)
+        assert not submitter.is_alive()
+        assert len(errors) == 1
+        release.set()
+        closer.join()
+        assert got == [1]
+
+    def test_errors(self):
+        dispatcher = CallbackDispatcher()
+        dispatcher.submit("a", operator.truediv, 1, 0)
+        dispatcher.close()
+        assert dispatcher.errors == 1
+        with pytest.raises(ValueError):
+            CallbackDispatcher(overflow="nope")
+        with pytest.raises(ValueError):
+            CallbackDispatcher(maxsize=0)
+
+    def test_endpoint_volume_callback(self, device, volume_callback):
+        got = []
+        release = threading.Event()
+
+        class Callback(AudioEndpointVolumeCallback):
+            def on_notify(self, new_volume, new_mute, event_context, *args):
+                release.wait()
+                got.append((new_volume, event_context.contents))
+
+        dispatcher = CallbackDispatcher()
+        volume_callback(Callback(dispatcher=dispatcher))
+        for i in range(1, 5):
+            # returns while the callback is waiting
+            device.endpoint_volume.SetMasterVolumeLevelScalar(i / 4, None)
+        release.set()
+        assert dispatcher.join(timeout=5)
+        assert [volume for volume, _ in got] == [0.25, 0.5, 0.75, 1.0]
+        # the event contexts were copied
+        assert all(isinstance(context, GUID) for _, context in got)
+        dispatcher.close()
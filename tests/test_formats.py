@@ -0,0 +1,40 @@
+"""
+Verifies the wave formats.
+"""
+
+from ctypes import sizeof
+
+from pycaw.api.audioclient.depend import WAVEFORMATEX, WAVEFORMATEXTENSIBLE
+from pycaw.formats import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM, AudioFormat
+from pycaw.simulation import simulated_mix_format
+
+
+class TestAudioFormat:
+    def test_structures(self):
+        assert sizeof(WAVEFORMATEX) == 18
+        assert sizeof(WAVEFORMATEXTENSIBLE) == 40
+        wave_format = AudioFormat.create(2, 44100)
+        # used to be truncated to WORD
+        assert wave_format.sample_rate == 44100
+        assert wave_format.waveformat.nAvgBytesPerSec == 176400
+        assert wave_format.block_align == 4
+        assert wave_format.dtype == "<i2"
+        assert wave_format.extensible is None
+
+    def test_extensible(self):
+        wave_format = AudioFormat(simulated_mix_format(channels=6))
+        assert wave_format.waveformat.wFormatTag == 0xFFFE
+        assert wave_format.format_tag == WAVE_FORMAT_IEEE_FLOAT
+        assert wave_format.channel_mask == 0x3F
+        assert wave_format.valid_bits_per_sample == 32
+        assert wave_format.dtype == "<f4"
+        assert wave_format == AudioFormat(simulated_mix_format(channels=6))
+
+    def test_device_format(self, system, device, speakers):
+        system.set_device_format(device.id, sample_rate=44100, bits_per_sample=24)
+        wave_format = speakers.DeviceFormat
+        assert wave_format.format_tag == WAVE_FORMAT_PCM
+        assert wave_format.sample_rate == 44100
+        assert wave_format.valid_bits_per_sample == 24
+        # no NumPy dtype for packed 24 bits
+        assert wave_format.dtype is None
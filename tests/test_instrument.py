@@ -0,0 +1,89 @@
+"""
+Verifies the instrumentation of the callbacks.
+"""
+
+import operator
+import time
+
+import pytest
+
+import pycaw
+from pycaw import instrument
+from pycaw.callbacks import AudioEndpointVolumeCallback, AudioSessionEvents
+from pycaw.dispatch import CallbackDispatcher
+
+
+class TestInstrument:
+    @pytest.fixture(autouse=True)
+    def reset(self):
+        instrument.reset()
+        yield
+        instrument.disable()
+        instrument.reset()
+
+    def test_histogram(self):
+        histogram = instrument.Histogram()
+        for seconds in (0, 1.5e-6, 3e-6, 3.5e-6, 100):
+            histogram.add(seconds)
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 5
+        assert snapshot["max"] == 100
+        assert snapshot["buckets"] == {1: 1, 2: 1, 4: 2, float("inf"): 1}
+
+    def test_stats(self, system, device, volume_callback):
+        session = system.add_session("app.exe")
+        event = "IAudioEndpointVolumeCallback.OnNotify"
+
+        class Callback(AudioEndpointVolumeCallback):
+            def on_notify(self, *args):
+                time.sleep(0.01)
+
+        class Events(AudioSessionEvents):
+            stats_session = "app.exe"
+
+        volume_callback(Callback())
+        events = Events()
+        session.RegisterAudioSessionNotification(events)
+        # disabled, nothing is counted
+        device.endpoint_volume.SetMasterVolumeLevelScalar(0.5, None)
+        assert pycaw.stats() == {"enabled": False, "events": {}, "sessions": {}}
+        instrument.enable()
+        device.endpoint_volume.SetMasterVolumeLevelScalar(0.6, None)
+        device.endpoint_volume.SetMute(1, None)
+        session.SetMasterVolume(0.5, None)
+        stats = pycaw.stats()
+        assert stats["enabled"]
+        assert stats["events"][event]["count"] == 2
+        user = stats["events"][event]["user"]
+        assert user["count"] == 2
+        assert user["total"] >= 0.02
+        # pycaw's share excludes the user code
+        assert stats["events"][event]["pycaw"]["total"] < user["total"]
+        assert stats["sessions"] == {
+            "app.exe": {"IAudioSessionEvents.OnSimpleVolumeChanged": 1}
+        }
+        session.UnregisterAudioSessionNotification(events)
+
+    def test_direct_user_code(self):
+        instrument.enable()
+        instrument.user_code(operator.add)(1, 2)
+        stats = pycaw.stats()
+        assert None not in stats["events"]
+        direct = stats["events"][instrument.DIRECT]
+        assert direct["count"] == 0
+        assert direct["user"]["count"] == 1
+
+    def test_dispatched_user_code(self, device, volume_callback):
+        event = "IAudioEndpointVolumeCallback.OnNotify"
+
+        class Callback(AudioEndpointVolumeCallback):
+            def on_notify(self, *args):
+                pass
+
+        instrument.enable()
+        dispatcher = CallbackDispatcher()
+        volume_callback(Callback(dispatcher=dispatcher))
+        device.endpoint_volume.SetMasterVolumeLevelScalar(0.5, None)
+        dispatcher.close()
+        # the user code ran on a worker, still counted for the event
+        assert pycaw.stats()["events"][event]["user"]["count"] == 1
@@ -1,7 +1,16 @@
+import sys
+import threading
 import warnings
 from unittest import mock
 
+import pytest
+
+import pycaw
+from pycaw import instrument
+from pycaw.compat import COMError
+from pycaw.constants import AudioSessionState
 from pycaw.magic import MagicApp, MagicManager, MagicSession
+from pycaw.matchers import Glob, Parent
 
 
 def patch_atexit_register():
@@ -10,6 +19,7 @@ def patch_atexit_register():
 
 
 class TestMagic:
+    @pytest.mark.windows
     def test_init(self):
         app_execs = {"msedge.exe"}
         with patch_atexit_register() as m_register:
@@ -19,11 +29,13 @@ class TestMagic:
 
 
 class TestMagicManager:
+    @pytest.mark.windows
     def test_magic_session(self):
         assert MagicManager.MagicSessionConfigured is None
         MagicManager.magic_session(MagicSession)
         assert MagicManager.MagicSessionConfigured == (MagicSession, (), {})
 
+    @pytest.mark.windows
     def test_unregister_all(self):
         assert MagicManager.magic_apps is not None
         assert MagicManager.str() == (
@@ -36,6 +48,7 @@ class TestMagicManager:
         assert hasattr(MagicManager, "magic_sessions") is False
         assert MagicManager.magic_activated is None
 
+    @pytest.mark.windows
     def test_clean_up(self):
         app_execs = {"msedge.exe"}
         with patch_atexit_register(), warnings.catch_warnings(record=True):
@@ -46,6 +59,7 @@ class TestMagicManager:
         assert hasattr(MagicManager, "magic_apps") is False
         assert hasattr(MagicManager, "magic_sessions") is False
 
+    @pytest.mark.windows
     def test_activate_magic(self):
         MagicManager.magic_activated = None
         app_execs = {"msedge.exe"}
@@ -68,3 +82,512 @@ class TestMagicManager:
             w[-1].message
         )
         assert MagicManager.magic_activated is True
+
+
+def settle():
+    """Waits for the endpoint worker of the MagicManager, if active."""
+    dispatcher = getattr(MagicManager, "_endpoint_dispatcher", None)
+    if dispatcher is not None:
+        assert dispatcher.join(timeout=5)
+
+
+def add_session(system, *args, **kwargs):
+    """Adds a session, the MagicManager picks it up on its endpoint worker."""
+    session = system.add_session(*args, **kwargs)
+    settle()
+    return session
+
+
+@pytest.fixture
+def magic(system):
+    """MagicManager over a simulated audio system, deactivated afterwards."""
+    if MagicManager.magic_activated:
+        MagicManager.unregister_all()
+    MagicManager.magic_activated = False
+    system.add_device()
+    yield system
+    if MagicManager.magic_activated:
+        MagicManager.unregister_all()
+    MagicManager.magic_activated = False
+
+
+class TestMagicCoalescing:
+    def test_volume_storm(self, magic, wait_for):
+        session = add_session(magic, "app.exe")
+        volumes = []
+        mutes = []
+        with patch_atexit_register():
+            app = MagicApp(
+                {"app.exe"}, volume_callback=volumes.append, mute_callback=mutes.append
+            )
+        coalescer = MagicManager.enable_coalescing(window=0.05)
+        for i in range(1, 11):
+            session.SetMasterVolume(i / 10, None)
+        session.SetMute(1, None)
+        # the getters don't wait
+        assert app.volume == 1.0
+        assert app.mute == 1
+        assert volumes == [0.1]
+        assert mutes == [1]
+        wait_for(lambda: volumes[-1] == 1.0)
+        assert volumes == [0.1, 1.0]
+        assert coalescer.merged == 8
+        MagicManager.disable_coalescing()
+        session.SetMasterVolume(0.5, None)
+        session.SetMasterVolume(0.6, None)
+        assert volumes == [0.1, 1.0, 0.5, 0.6]
+
+
+class TestMagicDispatcher:
+    def test_callbacks_off_thread(self, magic):
+        session = add_session(magic, "app.exe")
+        release = threading.Event()
+        got = []
+
+        def volume_callback(volume):
+            release.wait()
+            got.append((volume, threading.current_thread()))
+
+        def state_callback(state):
+            got.append((state, threading.current_thread()))
+
+        dispatcher = MagicManager.enable_dispatcher(workers=2)
+        with patch_atexit_register():
+            app = MagicApp(
+                {"app.exe"},
+                volume_callback=volume_callback,
+                state_callback=state_callback,
+                session_callback=lambda session: got.append((session, None)),
+            )
+        for i in range(1, 4):
+            # returns while the callback is waiting
+            session.SetMasterVolume(i / 10, None)
+        assert app.volume == 0.3
+        session.set_state(1)
+        release.set()
+        assert dispatcher.join(timeout=5)
+        # in order for the session
+        assert [value for value, _ in got[1:]] == [0.1, 0.2, 0.3, app.state]
+        assert threading.current_thread() not in {thread for _, thread in got}
+        assert dispatcher.metrics()["completed"] == 5
+        MagicManager.unregister_all()
+        assert MagicManager.dispatcher is None
+
+
+class TestMagicStats:
+    def test_per_session(self, magic):
+        session = add_session(magic, "app.exe")
+        volumes = []
+        with patch_atexit_register():
+            MagicApp({"app.exe"}, volume_callback=volumes.append)
+        (iid,) = MagicManager.magic_root_sessions
+        instrument.reset()
+        instrument.enable()
+        try:
+            session.SetMasterVolume(0.5, None)
+            stats = pycaw.stats()
+        finally:
+            instrument.disable()
+            instrument.reset()
+        event = "IAudioSessionEvents.OnSimpleVolumeChanged"
+        assert volumes == [0.5]
+        assert stats["sessions"] == {f"app.exe#{iid}": {event: 1}}
+        assert stats["events"][event]["user"]["count"] == 1
+
+
+class TestMagicIndexes:
+    def test_exec_indexes(self, magic):
+        add_session(magic, "a.exe")
+        add_session(magic, "b.exe")
+        with patch_atexit_register():
+            app = MagicApp({"a.exe", "c.exe"})
+            other = MagicApp({"a.exe"})
+        assert MagicManager.magic_apps_by_exec == {
+            "a.exe": [app, other],
+            "c.exe": [app],
+        }
+        assert len(app.magic_root_sessions) == len(other.magic_root_sessions) == 1
+        add_session(magic, "c.exe")
+        add_session(magic, "a.exe")
+        assert len(app.magic_root_sessions) == 3
+        assert {
+            app_exec: len(iids) for app_exec, iids in MagicManager.iids_by_exec.items()
+        } == {"a.exe": 2, "b.exe": 1, "c.exe": 1}
+        session = add_session(magic, "c.exe")
+        session.expire()
+        assert len(MagicManager.iids_by_exec["c.exe"]) == 1
+        MagicManager.unregister_all()
+        assert not MagicManager.iids_by_exec
+
+    def test_concurrent_sessions(self, magic):
+        headset = magic.add_device("Headset")
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        # sessions created on several COM threads at once
+        threads = [
+            threading.Thread(
+                target=lambda device: [
+                    magic.add_session("app.exe", device=device) for _ in range(20)
+                ],
+                args=(device,),
+            )
+            for device in (magic.default_device(), headset) * 2
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        settle()
+        assert len(app.magic_root_sessions) == 80
+        assert sorted(MagicManager.magic_root_sessions) == list(range(80))
+        assert len(MagicManager.iids_by_device[headset.id]) == 40
+        # an Expired state change after the endpoint was dropped
+        iid, *_ = MagicManager.iids_by_device[headset.id]
+        session = MagicManager.magic_root_sessions[iid]
+        MagicManager._close_endpoint(headset.id)
+        session.OnStateChanged(AudioSessionState.Expired.value)
+        assert headset.id not in MagicManager.iids_by_device
+        assert len(app.magic_root_sessions) == 40
+
+
+class TestMagicSubscribers:
+    def test_multiple_magic_apps(self, magic):
+        session = add_session(magic, "app.exe")
+        ui, logger, states = [], [], []
+        with patch_atexit_register():
+            ui_app = MagicApp({"app.exe"}, volume_callback=ui.append)
+            logger_app = MagicApp(
+                {"app.exe"},
+                advanced_volume_callback=lambda volume, compare: logger.append(
+                    (volume, bool(compare))
+                ),
+            )
+        (magic_root_session,) = MagicManager.magic_root_sessions.values()
+        assert magic_root_session.magic_apps == [ui_app, logger_app]
+        assert magic_root_session.magic_app is ui_app
+        subscribers = magic_root_session._subscribers
+        assert len(subscribers["volume_callback"]) == 2
+        assert not subscribers["mute_callback"]
+        assert not subscribers["state_callback"]
+        session.SetMasterVolume(0.5, None)
+        # changes made by a MagicApp are filtered out of its simple callbacks
+        ui_app.volume = 0.25
+        assert ui == [0.5]
+        assert logger == [(0.5, True), (0.25, False)]
+        # the precomputed subscribers follow the callbacks
+        logger_app.state_callback = states.append
+        session.expire()
+        assert states == [AudioSessionState.Expired]
+        assert not ui_app.magic_root_sessions
+        assert not logger_app.magic_root_sessions
+        assert magic_root_session.magic_apps == []
+
+
+class TestMagicAggregate:
+    def test_incremental(self, magic):
+        sessions = [add_session(magic, "app.exe") for _ in range(3)]
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        assert app.volume == 1.0
+        assert app.mute == 0
+        for session, volume in zip(sessions, (0.2, 0.4, 0.6)):
+            session.SetMasterVolume(volume, None)
+        assert app.volume == 0.6
+        # the loudest session got quieter
+        sessions[2].SetMasterVolume(0.1, None)
+        assert app.volume == 0.4
+        sessions[0].SetMute(1, None)
+        assert app.mute == 1
+        states = {session.state for session in sessions}
+        assert app.state == max(states)
+        sessions[1].set_state(0)
+        sessions[0].set_state(0)
+        sessions[2].set_state(0)
+        assert app.state == AudioSessionState.Inactive
+        sessions[1].set_state(1)
+        assert app.state == AudioSessionState.Active
+        # the loudest and the muted sessions leave
+        sessions[1].expire()
+        sessions[0].expire()
+        assert app.volume == 0.1
+        assert app.mute == 0
+        assert app.state == AudioSessionState.Inactive
+        sessions[2].expire()
+        assert app.volume is app.mute is app.state is None
+
+    def test_concurrent_events(self, magic):
+        sessions = [add_session(magic, "app.exe") for _ in range(8)]
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+
+        def storm(session, index):
+            for i in range(300):
+                session.SetMute(i % 2, None)
+                session.set_state(i % 2)
+                session.SetMasterVolume((i % 10) / 10, None)
+            session.SetMute(index % 2, None)
+            session.SetMasterVolume(index / 10, None)
+
+        threads = [
+            threading.Thread(target=storm, args=(session, index))
+            for index, session in enumerate(sessions)
+        ]
+        # switch threads as often as possible
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        # no update lost
+        assert app._muted == 4
+        assert app._states[AudioSessionState.Active] == 8
+        assert app.state == AudioSessionState.Active
+        assert app.volume == 0.7
+        assert app.mute == 1
+        for session in sessions[1:]:
+            session.expire()
+        assert app.volume == 0.0
+        assert app.mute == 0
+
+    def test_aggregate_callbacks(self, magic):
+        sessions = [add_session(magic, "browser.exe") for _ in range(3)]
+        volumes, mutes, states = [], [], []
+        with patch_atexit_register():
+            app = MagicApp(
+                {"browser.exe"},
+                volume_callback=volumes.append,
+                mute_callback=mutes.append,
+                state_callback=states.append,
+                aggregate_callbacks=True,
+            )
+        for session in sessions[1:]:
+            session.SetMasterVolume(0.5, None)
+        # the loudest session didn't change
+        assert volumes == []
+        sessions[0].SetMasterVolume(0.25, None)
+        assert volumes == [0.5]
+        sessions[0].SetMute(1, None)
+        sessions[1].SetMute(1, None)
+        sessions[0].SetMute(0, None)
+        assert mutes == [1]
+        for session in sessions:
+            session.set_state(0)
+        assert states == [AudioSessionState.Inactive]
+        # sessions coming and going
+        add_session(magic, "browser.exe")
+        assert volumes == [0.5, 1.0]
+        assert states[-1] == AudioSessionState.Active
+        sessions[0].expire()
+        # expired, then gone
+        assert states[-2:] == [AudioSessionState.Expired, AudioSessionState.Active]
+        assert app.state == AudioSessionState.Active
+        assert len(app.magic_root_sessions) == 3
+
+
+class TestMagicPatterns:
+    def test_patterns(self, magic):
+        add_session(magic, "chrome.exe")
+        steam = magic.add_process("steam.exe")
+        with patch_atexit_register():
+            browsers = MagicApp({"firefox.exe", Glob("chrome*.exe")})
+            games = MagicApp(Parent("steam.exe"))
+        assert len(browsers.magic_root_sessions) == 1
+        add_session(magic, "chrome_beta.exe")
+        add_session(magic, "firefox.exe")
+        add_session(
+            magic, "game_v2.exe", pid=magic.add_process("game_v2.exe", parent_pid=steam)
+        )
+        add_session(magic, "vlc.exe")
+        assert sorted(
+            mrs.app_exec for mrs in browsers.magic_root_sessions.values()
+        ) == ["chrome.exe", "chrome_beta.exe", "firefox.exe"]
+        assert [mrs.app_exec for mrs in games.magic_root_sessions.values()] == [
+            "game_v2.exe"
+        ]
+
+
+class TestMagicEndpoints:
+    def test_all_render_endpoints(self, magic):
+        speakers = magic.default_device()
+        headset = magic.add_device("Headset")
+        magic.add_device("Microphone", flow=1)
+        add_session(magic, "app.exe", device=headset)
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        assert set(MagicManager.endpoints) == {speakers.id, headset.id}
+        assert len(app.magic_root_sessions) == 1
+        add_session(magic, "app.exe", device=speakers)
+        (iid,) = MagicManager.iids_by_device[speakers.id]
+        assert MagicManager.magic_root_sessions[iid].device_id == speakers.id
+        # devices coming and going, followed on a worker
+        hdmi = magic.add_device("HDMI")
+        MagicManager._endpoint_dispatcher.join(timeout=5)
+        add_session(magic, "app.exe", device=hdmi)
+        assert len(app.magic_root_sessions) == 3
+        magic.set_device_state(headset.id, 8)
+        MagicManager._endpoint_dispatcher.join(timeout=5)
+        assert headset.id not in MagicManager.endpoints
+        assert headset.id not in MagicManager.iids_by_device
+        assert len(app.magic_root_sessions) == 2
+        MagicManager.unregister_all()
+        assert not MagicManager.endpoints
+        assert not speakers.session_manager._callbacks
+        assert not magic._notification_clients
+
+    def test_capture(self, magic):
+        microphone = magic.add_device("Microphone", flow=1)
+        add_session(magic, "recorder.exe", device=microphone)
+        MagicManager.capture = True
+        try:
+            with patch_atexit_register():
+                app = MagicApp({"recorder.exe"})
+        finally:
+            MagicManager.capture = False
+        assert microphone.id in MagicManager.endpoints
+        assert len(app.magic_root_sessions) == 1
+
+
+class TestMagicRebind:
+    def rebind(self):
+        assert MagicManager._endpoint_dispatcher.join(timeout=5)
+
+    def test_session_disconnected(self, magic):
+        speakers = magic.default_device()
+        headset = magic.add_device("Headset")
+        sessions = [add_session(magic, "app.exe") for _ in range(3)]
+        add_session(magic, "app.exe", device=headset)
+        volumes = []
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"}, volume_callback=volumes.append)
+        old_iids = set(MagicManager.iids_by_device[speakers.id])
+        # e.g. the format of the speakers changed
+        for session in sessions:
+            session.disconnect(2)
+        self.rebind()
+        # torn down at once and enumerated again, only the speakers
+        assert MagicManager.reconnect_stats()["count"] == 1
+        assert not old_iids & set(MagicManager.iids_by_device[speakers.id])
+        assert len(MagicManager.iids_by_device[speakers.id]) == 3
+        assert len(app.magic_root_sessions) == 4
+        sessions[0].SetMasterVolume(0.5, None)
+        assert volumes == [0.5]
+        app.volume = 0.25
+        assert {session.volume for session in speakers.sessions} == {0.25}
+        # unplugged, nothing to enumerate again
+        magic.remove_device(headset.id)
+        self.rebind()
+        assert headset.id not in MagicManager.endpoints
+        assert len(app.magic_root_sessions) == 3
+        assert MagicManager.reconnect_stats()["count"] == 1
+
+    def test_single_session_disconnected(self, magic):
+        sessions = [add_session(magic, "app.exe") for _ in range(3)]
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        iids = set(app.magic_root_sessions)
+        # ExclusiveModeOverride, only this session
+        sessions[0].disconnect(5)
+        self.rebind()
+        assert len(app.magic_root_sessions) == 2
+        assert set(app.magic_root_sessions) < iids
+        assert MagicManager.reconnect_stats()["count"] == 0
+
+    def test_default_device_changed(self, magic):
+        speakers = magic.default_device()
+        hdmi = magic.add_device("HDMI")
+        add_session(magic, "app.exe", device=hdmi)
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        self.rebind()
+        # already watched
+        magic.set_default_device(hdmi.id)
+        self.rebind()
+        assert MagicManager.reconnect_stats()["count"] == 0
+        MagicManager._close_endpoint(hdmi.id)
+        assert not app.magic_root_sessions
+        magic.set_default_device(speakers.id)
+        magic.set_default_device(hdmi.id)
+        self.rebind()
+        # only the new default endpoint is enumerated again
+        assert MagicManager.reconnect_stats()["count"] == 1
+        assert len(app.magic_root_sessions) == 1
+
+    def test_service_restart(self, magic):
+        speakers = magic.default_device()
+        headset = magic.add_device("Headset")
+        old_session = add_session(magic, "app.exe")
+        add_session(magic, "app.exe", device=headset)
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        assert len(app.magic_root_sessions) == 2
+        # the service is down until restart_service() returns
+        gate = threading.Event()
+        MagicManager._endpoint_dispatcher.submit(None, gate.wait)
+        magic.restart_service()
+        # the old sessions and managers are gone with the service
+        with pytest.raises(COMError):
+            old_session.GetMasterVolume()
+        gate.set()
+        self.rebind()
+        assert not app.magic_root_sessions
+        assert set(MagicManager.endpoints) == {speakers.id, headset.id}
+        assert MagicManager.reconnect_stats()["count"] == 2
+        session = add_session(magic, "app.exe", device=headset)
+        app.volume = 0.5
+        assert session.volume == 0.5
+
+    def test_reconnect_retried(self, magic, wait_for, monkeypatch):
+        speakers = magic.default_device()
+        add_session(magic, "app.exe")
+        with patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        # the new service isn't up for the first two attempts
+        register = MagicManager._register_endpoints.__func__
+        failures = [COMError(-0x7FFEFEF8, "disconnected", None)] * 2
+
+        def _register_endpoints(cls, since=None):
+            if failures:
+                raise failures.pop()
+            register(cls, since)
+
+        monkeypatch.setattr(
+            MagicManager, "_register_endpoints", classmethod(_register_endpoints)
+        )
+        monkeypatch.setattr(MagicManager, "reconnect_delay", 0.5)
+        magic.restart_service()
+        # the endpoint worker doesn't wait for the next attempt
+        self.rebind()
+        assert len(failures) == 1
+        assert not MagicManager.endpoints
+        wait_for(lambda: MagicManager.endpoints)
+        assert set(MagicManager.endpoints) == {speakers.id}
+        assert not failures
+        add_session(magic, "app.exe")
+        assert len(app.magic_root_sessions) == 1
+
+    def test_open_endpoint_dedup(self, magic):
+        speakers = magic.default_device()
+        manager = speakers.session_manager
+        get_session_enumerator = manager.GetSessionEnumerator
+
+        def notified_and_enumerated():
+            # created between the registration and the enumeration
+            magic.add_session("app.exe", device=speakers)
+            return get_session_enumerator()
+
+        with mock.patch.object(
+            manager, "GetSessionEnumerator", notified_and_enumerated
+        ), patch_atexit_register():
+            app = MagicApp({"app.exe"})
+        settle()
+        assert len(app.magic_root_sessions) == 1
+        assert len(MagicManager.iid_by_instance) == 1
+        (session,) = speakers.sessions
+        MagicManager.OnSessionCreated(session, speakers.id)
+        assert len(MagicManager.magic_root_sessions) == 1
+        session.expire()
+        assert not MagicManager.iid_by_instance
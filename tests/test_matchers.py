@@ -0,0 +1,93 @@
+"""
+Verifies the session patterns and matcher.
+"""
+
+from pycaw.matchers import (
+    ExePath,
+    Glob,
+    Parent,
+    Regex,
+    SessionMatcher,
+    SessionProcess,
+    WindowClass,
+)
+
+
+class TestMatchers:
+    def test_patterns(self, system):
+        parent = system.add_process("steam.exe")
+        pid = system.add_process(
+            "Game_v2.exe",
+            exe="D:\\Games\\Game\\Game_v2.exe",
+            parent_pid=parent,
+            window_classes=["UnrealWindow"],
+        )
+        process = SessionProcess(pid, "Game_v2.exe")
+        assert Glob("game_*.EXE").matches(process)
+        assert Regex(r"Game_v\d+\.exe").matches(process)
+        assert not Regex(r"game_v\d+\.exe").matches(process)
+        assert ExePath("d:\\games\\*").matches(process)
+        assert Parent("steam.exe").matches(process)
+        assert WindowClass("Unreal*").matches(process)
+        assert not WindowClass("Chrome_WidgetWin_1").matches(process)
+        # gone processes match nothing
+        system.remove_process(pid)
+        assert not Parent("*").matches(SessionProcess(pid, "Game_v2.exe"))
+        assert Glob("a*") == Glob("a*") != Regex("a*")
+
+    def test_session_matcher(self, system):
+        matcher = SessionMatcher()
+        matcher.add(Glob("chrome*.exe"), "chrome")
+        matcher.add(Regex(r"(?:chrome|msedge)\.exe"), "browsers")
+        matcher.add(WindowClass("Chrome_WidgetWin_*"), "widgets")
+        assert len(matcher) == 3
+        pid = system.add_process("chrome.exe", window_classes=["Chrome_WidgetWin_1"])
+        process = SessionProcess(pid, "chrome.exe")
+        assert matcher.match(process) == ["chrome", "browsers", "widgets"]
+        assert matcher.match(SessionProcess(None, "msedge.exe")) == ["browsers"]
+        # the kinds without pattern aren't looked up
+        system.reset_calls()
+        pid = system.add_process("vlc.exe")
+        assert matcher.match(SessionProcess(pid, "vlc.exe")) == []
+        assert system.calls["GetWindowClasses"] == 1
+        assert not system.calls["GetProcessExe"]
+        # patterns which don't combine still match
+        matcher.add(Regex("(?i)VLC.exe"), "vlc")
+        assert matcher.match(SessionProcess(pid, "vlc.exe")) == ["vlc"]
+
+    def test_group_references(self):
+        matcher = SessionMatcher()
+        matcher.add(Regex(r"(game)_\d+\.exe"), "games")
+        # group 1 would be the one of the first pattern once combined
+        matcher.add(Regex(r"(a+)_\1\.exe"), "echo")
+        matcher.add(Regex(r"(?P<x>b)_(?P=x)\.exe"), "named")
+        assert matcher.match(SessionProcess(None, "aa_aa.exe")) == ["echo"]
+        assert matcher.match(SessionProcess(None, "b_b.exe")) == ["named"]
+        assert matcher.match(SessionProcess(None, "game_1.exe")) == ["games"]
+        assert matcher.match(SessionProcess(None, "aa_a.exe")) == []
+
+    def test_overlapping_patterns(self):
+        matcher = SessionMatcher()
+        matcher.add(Glob("*.exe"), "all")
+        matcher.add(Regex(r"(g)\1\.exe"), "echo")
+        matcher.add(Regex(r"g+\.exe"), "g")
+        matcher.add(Glob("gg.*"), "gg")
+        # one match of the combined regex, every pattern which matches
+        # in the order they were added
+        assert matcher.match(SessionProcess(None, "gg.exe")) == [
+            "all",
+            "echo",
+            "g",
+            "gg",
+        ]
+        assert matcher.match(SessionProcess(None, "g.exe")) == ["all", "g"]
+        assert matcher.match(SessionProcess(None, "gg.dll")) == ["gg"]
+        # clashing group names, tested one by one
+        matcher.add(Regex(r"(?P<_0>x)\.exe"), "x")
+        assert matcher.match(SessionProcess(None, "x.exe")) == ["all", "x"]
+        assert matcher.match(SessionProcess(None, "gg.exe")) == [
+            "all",
+            "echo",
+            "g",
+            "gg",
+        ]
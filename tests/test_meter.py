@@ -0,0 +1,133 @@
+"""
+Verifies the peak meters and their sampler.
+"""
+
+import threading
+from unittest import mock
+
+import pytest
+
+from pycaw.compat import COMError
+from pycaw.constants import ENDPOINT_HARDWARE_SUPPORT
+from pycaw.meter import PeakMeterSampler
+from pycaw.pycaw import AudioUtilities
+
+
+class TestAudioMeter:
+    def test_device_meter(self, system, device, speakers):
+        pytest.importorskip("numpy")
+        device.meter.peaks = [0.25, 0.5]
+        meter = speakers.Meter
+        assert meter.channels == 2
+        system.reset_calls()
+        peaks = meter.read()
+        assert peaks.tolist() == [0.25, 0.5]
+        assert system.calls["GetChannelsPeakValues"] == 1
+        device.meter.peaks = [1.0, 0.0]
+        # the same preallocated buffer
+        assert meter.read() is peaks
+        assert peaks.tolist() == [1.0, 0.0]
+        assert meter.peak == 1.0
+        assert meter.hardware_support == ENDPOINT_HARDWARE_SUPPORT(0)
+
+    def test_session_meter(self, system):
+        pytest.importorskip("numpy")
+        session = system.add_session("app.exe")
+        session.meter.peaks = [0.5, 0.25]
+        meter = AudioUtilities.GetAllSessions()[0].Meter
+        assert meter.read().tolist() == [0.5, 0.25]
+
+    def test_without_numpy(self, device, speakers):
+        device.meter.peaks = [0.5, 0.25]
+        with mock.patch("pycaw.meter.numpy", None):
+            meter = speakers.Meter
+            assert list(meter.read()) == [0.5, 0.25]
+            assert meter.read() is meter.buffer
+
+
+class TestPeakMeterSampler:
+    @pytest.fixture(autouse=True)
+    def numpy(self):
+        return pytest.importorskip("numpy")
+
+    def test_ring_buffer(self, system):
+        sessions = system.spawn_sessions(3)
+        sampler = PeakMeterSampler(rate=10, history=0.4)
+        for session in AudioUtilities.GetAllSessions():
+            sampler.add(session.InstanceIdentifier, session.Meter)
+        key = sessions[0].instance_identifier
+        assert sampler.summary(key) is None
+        assert sampler.latest(key) is None
+        for peak in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6):
+            sessions[0].meter.peaks = [peak, peak / 2]
+            sampler.sample()
+        # 4 samples of history
+        assert sampler.window(key).shape == (4, 2)
+        assert sampler.window(key)[:, 0].tolist() == pytest.approx([0.3, 0.4, 0.5, 0.6])
+        assert sampler.latest(key).tolist() == pytest.approx([0.6, 0.3])
+        summary = sampler.summary(key, seconds=0.2)
+        assert summary["min"].tolist() == pytest.approx([0.5, 0.25])
+        assert summary["max"].tolist() == pytest.approx([0.6, 0.3])
+        assert summary["rms"][0] == pytest.approx(((0.25 + 0.36) / 2) ** 0.5)
+        assert len(sampler.summaries()) == 3
+
+    def test_expired_source(self, system):
+        session = system.add_session("app.exe")
+        sampler = PeakMeterSampler()
+        sampler.add("app", AudioUtilities.GetAllSessions()[0].Meter)
+        with mock.patch.object(
+            session.meter,
+            "GetChannelsPeakValues",
+            side_effect=COMError(-0x7776FFFC, "expired", None),
+        ):
+            sampler.sample()
+            sampler.sample()
+        assert list(sampler.errors()) == ["app"]
+        assert sampler.summary("app") is None
+        assert sampler.latest("app") is None
+
+    def test_concurrent_reads(self, numpy):
+        class Counter:
+            """A meter whose peaks count the reads."""
+
+            channels = 2
+
+            def __init__(self):
+                self.reads = 0
+
+            def read(self):
+                self.reads += 1
+                return numpy.full(2, self.reads, dtype=numpy.float32)
+
+        sampler = PeakMeterSampler(rate=100, history=0.05)
+        sampler.add("counter", Counter())
+        stop = threading.Event()
+
+        def sample():
+            while not stop.is_set():
+                sampler.sample()
+
+        writer = threading.Thread(target=sample)
+        writer.start()
+        try:
+            for _ in range(2000):
+                # consecutive rows, none overwritten while being read
+                window = sampler.window("counter")
+                if len(window):
+                    first = window[0, 0]
+                    assert window[:, 0].tolist() == [
+                        first + i for i in range(len(window))
+                    ]
+                    assert (window[:, 0] == window[:, 1]).all()
+        finally:
+            stop.set()
+            writer.join()
+
+    def test_thread(self, device, speakers, wait_for):
+        device.meter.peaks = [0.5, 0.5]
+        with PeakMeterSampler(rate=200) as sampler:
+            sampler.add("speakers", speakers.Meter)
+            assert sampler.running
+            wait_for(lambda: len(sampler.window("speakers")) >= 5)
+        assert not sampler.running
+        assert sampler.summary("speakers")["max"].tolist() == [0.5, 0.5]
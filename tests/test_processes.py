@@ -0,0 +1,58 @@
+"""
+Verifies the shared process name cache.
+"""
+
+from pycaw.processes import ProcessNameCache
+from pycaw.pycaw import AudioUtilities
+
+
+class TestProcessNameCache:
+    def test_warm(self, system):
+        pids = [system.add_process("app%d.exe" % i) for i in range(100)]
+        cache = ProcessNameCache()
+        cache.warm()
+        assert [cache.get(pid) for pid in pids] == ["app%d.exe" % i for i in range(100)]
+        assert system.calls["IterProcesses"] == 1
+        assert system.calls["GetProcessName"] == 0
+        assert system.calls["GetProcessCreateTime"] == 0
+
+    def test_pid_reuse(self, system):
+        pid = system.add_process("old.exe")
+        # always check the create time
+        cache = ProcessNameCache(max_age=0)
+        assert cache.get(pid) == "old.exe"
+        assert cache.get(pid) == "old.exe"
+        assert system.calls["GetProcessName"] == 1
+        system.add_process("new.exe", pid=pid)
+        assert cache.get(pid) == "new.exe"
+        assert system.calls["GetProcessName"] == 2
+
+    def test_no_such_process(self, system):
+        cache = ProcessNameCache()
+        assert cache.get(4242) is None
+        assert cache.get(4242) is None
+        assert system.calls["GetProcessCreateTime"] == 1
+        system.add_process("late.exe", pid=4242)
+        # the sweep is authoritative
+        cache.warm()
+        assert cache.get(4242) == "late.exe"
+
+    def test_bounded(self, system):
+        pids = [system.add_process("app%d.exe" % i) for i in range(10)]
+        cache = ProcessNameCache(maxsize=4)
+        cache.warm()
+        assert len(cache) == 4
+        assert cache.get(pids[0]) == "app0.exe"
+        assert len(cache) == 4
+
+    def test_session_str(self, system):
+        session = system.add_session("app.exe")
+        system.add_system_sounds_session()
+        system.remove_process(session.pid)
+        sessions = AudioUtilities.GetAllSessions()
+        system.reset_calls()
+        assert [str(s) for s in sessions] == ["Pid: %d" % session.pid, "Pid: 0"]
+        assert str(sessions[0]) == "Pid: %d" % session.pid
+        assert sessions[0].Process is None
+        # the missing process is only looked up once
+        assert system.calls["GetProcessCreateTime"] == 1
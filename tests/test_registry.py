@@ -0,0 +1,64 @@
+"""
+Verifies the live session registry.
+"""
+
+import pytest
+
+from pycaw.pycaw import AudioUtilities
+
+
+class TestSessionRegistry:
+    @pytest.fixture
+    def registry(self, system):
+        system.add_device()
+        system.spawn_sessions(10, app_execs=["app0.exe", "app1.exe"])
+        registry = AudioUtilities.EnableSessionRegistry()
+        yield registry
+        AudioUtilities.DisableSessionRegistry()
+
+    def test_lookups(self, system, registry):
+        assert len(registry) == 10
+        assert len(registry.get_by_exe("app0.exe")) == 5
+        session = system.sessions[3]
+        assert [s.ProcessId for s in registry.get_by_pid(session.pid)] == [session.pid]
+        (found,) = registry.get_by_instance_identifier(session.instance_identifier)
+        assert found.ProcessId == session.pid
+        assert registry.get_by_exe("other.exe") == []
+
+    def test_get_process_session(self, system, registry):
+        session = system.sessions[-1]
+        system.reset_calls()
+        assert AudioUtilities.GetProcessSession(session.pid).ProcessId == session.pid
+        assert AudioUtilities.GetProcessSession(12345) is None
+        # no enumeration at all
+        assert system.calls["GetSessionEnumerator"] == 0
+        assert system.calls["QueryInterface"] == 0
+
+    def test_created_and_expired(self, system, registry):
+        pid = system.add_process("app2.exe")
+        first = system.add_session("app2.exe", pid=pid)
+        system.add_session("app2.exe", pid=pid)
+        assert len(registry.get_by_pid(pid)) == 2
+        first.expire()
+        assert len(registry.get_by_pid(pid)) == 1
+        assert registry.get_by_instance_identifier(first.instance_identifier) == []
+        assert len(registry) == 11
+
+    def test_retired_bounded(self, system, registry):
+        expired = []
+        for _ in range(50):
+            session = system.add_session("app2.exe")
+            session.expire()
+            expired.append(session)
+            # unregistered by the next lookup, outside the notification
+            assert registry.get_by_exe("app2.exe") == []
+            assert len(registry._retired) == 0
+        assert len(registry) == 10
+        assert all(not session._callbacks for session in expired)
+
+    def test_stop(self, system, registry):
+        AudioUtilities.DisableSessionRegistry()
+        assert not registry.started
+        assert all(not session._callbacks for session in system.sessions)
+        system.add_session("app2.exe")
+        assert len(registry) == 0
@@ -0,0 +1,115 @@
+"""
+Verifies pycaw runs against the simulated backend.
+"""
+
+from pycaw.callbacks import (
+    AudioEndpointVolumeCallback,
+    AudioSessionEvents,
+    AudioSessionNotification,
+    MMNotificationClient,
+)
+from pycaw.constants import AudioDeviceState
+from pycaw.utils import AudioUtilities
+
+
+class TestSimulation:
+    def test_get_all_sessions(self, system):
+        system.spawn_sessions(1000)
+        system.reset_calls()
+        sessions = AudioUtilities.GetAllSessions()
+        assert len(sessions) == 1000
+        assert system.calls["CoCreateInstance"] == 1
+        assert system.calls["GetSession"] == 1000
+        assert sessions[0].ProcessId == system.sessions[0].pid
+
+    def test_get_all_devices(self, system):
+        system.add_device("Speakers (Simulated)")
+        system.add_device("Microphone (Simulated)", flow=1)
+        devices = AudioUtilities.GetAllDevices()
+        assert [device.FriendlyName for device in devices] == [
+            "Speakers (Simulated)",
+            "Microphone (Simulated)",
+        ]
+        assert devices[0].state == AudioDeviceState.Active
+        assert AudioUtilities.GetEndpointDataFlow(devices[1].id) == "eCapture"
+
+    def test_get_process_session(self, system):
+        system.spawn_sessions(10)
+        session = system.sessions[5]
+        assert AudioUtilities.GetProcessSession(session.pid).ProcessId == session.pid
+        assert AudioUtilities.GetProcessSession(1) is None
+
+    def test_session_events(self, system):
+        events = []
+
+        class Callback(AudioSessionEvents):
+            def on_simple_volume_changed(self, new_volume, new_mute, event_context):
+                events.append(("volume", new_volume, new_mute))
+
+            def on_state_changed(self, new_state, new_state_id):
+                events.append(("state", new_state))
+
+        simulated = system.add_session("app.exe")
+        session = AudioUtilities.GetAllSessions()[0]
+        session.register_notification(Callback())
+        session.SimpleAudioVolume.SetMasterVolume(0.5, None)
+        session.SimpleAudioVolume.SetMute(1, None)
+        simulated.expire()
+        session.unregister_notification()
+        assert events == [
+            ("volume", 0.5, 0),
+            ("volume", 0.5, 1),
+            ("state", "Expired"),
+        ]
+        assert AudioUtilities.GetAllSessions() == []
+
+    def test_session_created(self, system):
+        created = []
+
+        class Callback(AudioSessionNotification):
+            def on_session_created(self, new_session):
+                created.append(new_session.ProcessId)
+
+        callback = Callback()
+        system.add_device()
+        mgr = AudioUtilities.GetAudioSessionManager()
+        mgr.RegisterSessionNotification(callback)
+        session = system.add_session("app.exe")
+        mgr.UnregisterSessionNotification(callback)
+        system.add_session("app.exe")
+        assert created == [session.pid]
+
+    def test_endpoint_volume_callback(self, speakers, volume_callback):
+        notified = []
+
+        class Callback(AudioEndpointVolumeCallback):
+            def on_notify(self, new_volume, new_mute, event_context, *args):
+                notified.append((new_volume, new_mute))
+
+        volume_callback(Callback())
+        volume = speakers.EndpointVolume
+        volume.SetMasterVolumeLevelScalar(0.25, None)
+        assert notified == [(0.25, 0)]
+        assert volume.GetMasterVolumeLevelScalar() == 0.25
+
+    def test_notification_client(self, system):
+        events = []
+
+        class Callback(MMNotificationClient):
+            def on_device_added(self, added_device_id):
+                events.append(("added", added_device_id))
+
+            def on_default_device_changed(
+                self, flow, flow_id, role, role_id, default_device_id
+            ):
+                events.append(("default", flow, role))
+
+        enumerator = AudioUtilities.GetDeviceEnumerator()
+        enumerator.RegisterEndpointNotificationCallback(Callback())
+        device = system.add_device()
+        assert events == [
+            ("added", device.id),
+            ("default", "eRender", "eConsole"),
+            ("default", "eRender", "eMultimedia"),
+            ("default", "eRender", "eCommunications"),
+        ]
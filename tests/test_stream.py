@@ -0,0 +1,229 @@
+"""
+Verifies the capture and render streams.
+"""
+
+import threading
+import time
+
+import pytest
+
+from pycaw.compat import COMError
+from pycaw.constants import AUDCLNT_BUFFERFLAGS, AUDCLNT_SHAREMODE, AUDCLNT_STREAMFLAGS
+from pycaw.formats import AudioFormat
+from pycaw.propkeys import PKEY_AudioEngine_DeviceFormat
+from pycaw.pycaw import AudioUtilities
+from pycaw.simulation import simulated_device_format
+from pycaw.stream import AudioCaptureStream, AudioRenderStream, get_format_cache
+
+
+class TestCaptureStream:
+    def frames(self, start, count=4):
+        # stereo float32 frames
+        numpy = pytest.importorskip("numpy")
+        return numpy.arange(start, start + 2 * count, dtype=numpy.float32)
+
+    def test_loopback(self, device, speakers):
+        with AudioCaptureStream(speakers, loopback=True) as stream:
+            client = device.audio_clients[-1]
+            assert client.flags & AUDCLNT_STREAMFLAGS.LOOPBACK
+            assert client.flags & AUDCLNT_STREAMFLAGS.EVENTCALLBACK
+            assert stream.format.dtype == "<f4"
+            assert stream.format.channels == 2
+            assert stream.format.sample_rate == 48000
+            assert stream.buffer_frames == 4800
+            client.capture_client.push(self.frames(0))
+            client.capture_client.push(
+                self.frames(8), flags=AUDCLNT_BUFFERFLAGS.DATA_DISCONTINUITY
+            )
+            packets = []
+            kept = []
+            for packet in stream.packets(timeout=0):
+                assert packet.frames == 4
+                assert isinstance(packet.data, memoryview)
+                assert packet.array.shape == (4, 2)
+                packets.append(packet)
+                kept.append(packet.copy())
+        assert not client.started
+        assert [packet.array[0, 0] for packet in kept] == [0, 8]
+        assert kept[1].discontinuity and not kept[0].discontinuity
+        assert stream.discontinuities == 1
+        assert stream.frames_captured == 8
+        # the views were released back to the capture buffer
+        with pytest.raises(ValueError):
+            packets[0].data
+
+    def test_zero_copy(self, device, speakers):
+        stream = AudioCaptureStream(speakers, loopback=True)
+        stream.open()
+        capture_client = device.audio_clients[-1].capture_client
+        capture_client.push(self.frames(0))
+        packets = stream.packets(timeout=0)
+        packet = next(packets)
+        buffer = capture_client._current[0]
+        buffer[0] = 42
+        assert packet.data[0] == 42
+        stream.close()
+
+    def test_wait(self, device, speakers):
+        stream = AudioCaptureStream(speakers, loopback=True)
+        stream.open()
+        capture_client = device.audio_clients[-1].capture_client
+        timer = threading.Timer(0.05, capture_client.push, (self.frames(0),))
+        timer.start()
+        packets = [packet.copy() for packet in stream.packets(timeout=2)]
+        timer.join()
+        assert len(packets) == 1
+        stream.close()
+
+    def test_wrong_endpoint(self, system):
+        system.add_device()
+        system.add_device("Microphone", flow=1)
+        speakers, microphone = AudioUtilities.GetAllDevices()
+        # capturing a render endpoint requires loopback
+        with pytest.raises(COMError) as exc:
+            AudioCaptureStream(speakers).open()
+        # AUDCLNT_E_WRONG_ENDPOINT_TYPE
+        assert exc.value.hresult & 0xFFFFFFFF == 0x88890003
+        with pytest.raises(COMError) as exc:
+            AudioCaptureStream(microphone, loopback=True).open()
+        assert exc.value.hresult & 0xFFFFFFFF == 0x88890003
+        with AudioCaptureStream(microphone) as stream:
+            assert list(stream.packets(timeout=0)) == []
+
+
+class TestRenderStream:
+    @pytest.fixture
+    def engine(self, device):
+        """
+        Device whose render buffer is played by an audio engine thread,
+        the one of its latest audio client.
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.is_set():
+                client = device.audio_clients[-1] if device.audio_clients else None
+                if client is not None and client.started:
+                    client.process()
+                time.sleep(0.002)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        yield device
+        stop.set()
+        thread.join()
+
+    def tone(self, frames):
+        numpy = pytest.importorskip("numpy")
+        return numpy.linspace(-1, 1, 2 * frames, dtype=numpy.float32).reshape(-1, 2)
+
+    def test_play_array(self, engine, speakers):
+        tone = self.tone(6000)
+        with AudioRenderStream(speakers) as stream:
+            # larger than the device buffer
+            assert stream.buffer_frames == 2400
+            stream.play(tone, timeout=5)
+            client = engine.audio_clients[-1]
+            assert client.render_client.padding == 0
+        assert not client.started
+        assert stream.frames_written == 6000
+        assert bytes(client.render_client.rendered) == tone.tobytes()
+
+    def test_play_generator(self, engine, speakers):
+        # more than the device buffer
+        tone = self.tone(3000)
+        started = []
+
+        def blocks():
+            for start in range(0, 3000, 100):
+                end = start + 100
+                # the last blocks come late
+                time.sleep(0.002 if start < 2500 else 0.1)
+                started.append(engine.audio_clients[-1].started)
+                # float64, converted to the format of the stream
+                yield tone[start:end].astype("float64")
+
+        with AudioRenderStream(speakers) as stream:
+            stream.play(blocks(), timeout=5)
+            client = engine.audio_clients[-1]
+        assert bytes(client.render_client.rendered) == tone.tobytes()
+        # started once the 2400 frames of the buffer were written
+        assert started[:24] == [False] * 24
+        assert started[-1]
+        # the engine played faster than the blocks came
+        assert stream.underruns > 0
+
+    def test_short_play(self, engine, speakers):
+        tone = self.tone(100)
+        with AudioRenderStream(speakers) as stream:
+            stream.play(tone, timeout=5)
+            client = engine.audio_clients[-1]
+        assert bytes(client.render_client.rendered) == tone.tobytes()
+        assert stream.underruns == 0
+
+    def test_latency(self, speakers):
+        stream = AudioRenderStream(speakers)
+        assert stream.latency is None
+        with stream:
+            assert stream.stream_latency == 0.01
+            assert stream.default_period == 0.01
+            assert stream.minimum_period == 0.003
+            assert stream.latency == pytest.approx(2400 / 48000 + 0.01)
+
+    def test_timeout(self, device, speakers):
+        with AudioRenderStream(speakers) as stream:
+            # nothing plays the buffer
+            with pytest.raises(TimeoutError):
+                stream.play(self.tone(3000), timeout=0.05)
+            assert device.audio_clients[-1].render_client.padding == 2400
+            with pytest.raises(ValueError):
+                stream.play(b"\0" * 7)
+
+    def test_wrong_endpoint(self, system):
+        system.add_device("Microphone", flow=1)
+        with pytest.raises(COMError) as exc:
+            AudioRenderStream(AudioUtilities.GetAllDevices()[0]).open()
+        # AUDCLNT_E_WRONG_ENDPOINT_TYPE
+        assert exc.value.hresult & 0xFFFFFFFF == 0x88890003
+
+
+class TestFormatCache:
+    def test_mix_format(self, system, device, speakers):
+        for _ in range(3):
+            with AudioCaptureStream(speakers, loopback=True) as stream:
+                assert stream.format.sample_rate == 48000
+        assert system.calls["GetMixFormat"] == 1
+        # OnPropertyValueChanged invalidates the endpoint
+        system.set_device_format(device.id, sample_rate=44100)
+        with AudioCaptureStream(speakers, loopback=True) as stream:
+            assert stream.format.sample_rate == 44100
+        assert system.calls["GetMixFormat"] == 2
+
+    def test_stale_mix_format(self, device, speakers):
+        with AudioCaptureStream(speakers, loopback=True):
+            pass
+        # changed without notification
+        device.properties[PKEY_AudioEngine_DeviceFormat] = simulated_device_format(
+            sample_rate=44100
+        )
+        with AudioCaptureStream(speakers, loopback=True) as stream:
+            assert stream.format.sample_rate == 44100
+
+    def test_is_format_supported(self, system, device):
+        speakers = AudioUtilities.GetSpeakers()
+        cache = get_format_cache()
+        pcm = AudioFormat.create(2, 48000)
+        for _ in range(2):
+            supported, closest = cache.is_format_supported(speakers, pcm)
+            assert not supported
+            assert closest == cache.mix_format(speakers)
+        assert system.calls["IsFormatSupported"] == 1
+        mix_format = cache.mix_format(speakers)
+        assert cache.is_format_supported(speakers, mix_format) == (True, None)
+        exclusive = AUDCLNT_SHAREMODE.AUDCLNT_SHAREMODE_EXCLUSIVE
+        assert cache.is_format_supported(speakers, pcm, exclusive) == (False, None)
+        device_format = AudioFormat(simulated_device_format())
+        assert cache.is_format_supported(speakers, device_format, exclusive) == (
+            True,
+            None,
+        )